@@ -4,20 +4,41 @@ import json
 import time
 import asyncio
 from os import _exit
-import ccxt
+import ccxt.async as ccxt
 import psycopg2
+try:
+    from CryptoGoats.psql_helpers import BookRecorder
+    from CryptoGoats.tick_store import TickStore
+    from CryptoGoats.trading_functions import exchange_pool, fetch_order_books
+except ImportError:
+    from psql_helpers import BookRecorder
+    from tick_store import TickStore
+    from trading_functions import exchange_pool, fetch_order_books
 
 
 ########################################################################
 # Asynchronous database load
 ########################################################################
 
+period = 1.0 # seconds between two snapshots of all order books
+bookTimeout = 5 # seconds before an order book request is given up
+maxBookRequests = 2 # order book requests in flight per exchange
+binaryBooks = False # bids/ asks as book_codec bytes, needs bytea columns
+deltaBooks = False # binary books as changes since the previous book
+storePath = None # also append books to a local TickStore in this directory
+marketsCache = './CryptoGoats/Cache/markets' # markets shared with the scanner
+marketsCacheTTL = 86400 # seconds before cached markets are reloaded
+
 # Connect to PostgreSQL database
 with open('./PostgreSQL/config_psql.json') as f:
     config = json.load(f)
 
 conn = psycopg2.connect(**config)
 
+# Books are written in batches by a single COPY
+recorder = BookRecorder(conn, binary=binaryBooks, delta=deltaBooks)
+store = TickStore(storePath) if storePath is not None else None
+
 # Create and connect to all configured exchanges
 
 with open('./PostgreSQL/config_exchanges.json') as f:
@@ -25,43 +46,19 @@ with open('./PostgreSQL/config_exchanges.json') as f:
 
 ########################################################################
 
-async def insert_order_book(exchange, pair, conn):
-    """
-    Insert record into psql
-    pair = 'ETH/BTC'
-    TODO: move to helpers file
-    """
-    cur = conn.cursor()
-    orderbook = exchange.fetch_order_book(pair)
-    pair_base = pair.split('/')[0]
-    pair_quote = pair.split('/')[1]
-
-    try:
-        cur.execute(
-            """INSERT INTO prices (timestamp, exchange, pair_base, pair_quote, exchange_timestamp, bids, asks, volume)
-            VALUES(current_timestamp, %s, %s, %s, current_timestamp, %s, %s, %s)""",
-            (exchange.id, pair_base, pair_quote,
-             ';'.join(map(lambda x: "@".join([str(x[1]), str(x[0])]), orderbook['bids'][:5])), # format bids into string
-             ';'.join(map(lambda x: "@".join([str(x[1]), str(x[0])]), orderbook['asks'][:5])),
-             10000))
-        conn.commit()
-        print("Completed insertion for", pair, exchange.id)
-    except Exception as error:
-        print(error)
-        conn.rollback()
-
 # Example exchange initilization
 # exchange = ccxt.bittrex(config['bittrex'])
 
-exchanges = {}
-for id in ccxt.exchanges:  # list of exchanges id ['acx', bittrex'...]
-    if id in config:
-        exchange = getattr(ccxt, id) # exchange becomes function bittrex()
-        exchanges[id] = exchange(config[id])
+for id in config:
+    config[id].setdefault('enableRateLimit', True)
+    config[id].setdefault('marketsCache', marketsCache)
+    config[id].setdefault('marketsCacheTTL', marketsCacheTTL)
+exchange_pool.config.update(config)
 
 # Load all markets
-for id, exchange in exchanges.items(): # Py3: items() instead of iteritems()
-    _ = exchange.load_markets(reload=True)
+exchanges, notLoaded = asyncio.get_event_loop().\
+    run_until_complete(exchange_pool.load_all([id for id in ccxt.exchanges\
+                                               if id in config]))
 
 # Find arbitrable paris (in more than 1 exchange)
 allSymbols = [symbol for _, exchange in exchanges.items() for symbol in exchange.symbols]
@@ -83,10 +80,18 @@ for pair in arbitrableSymbols:
             except KeyError:
                 exchangesBySymbol[pair] = [id]
 
+async def record_pair(pair):
+    books = await fetch_order_books(exchanges, exchangesBySymbol[pair], pair,\
+                                    timeout=bookTimeout,\
+                                    max_concurrency=maxBookRequests)
+    for id, orderbook in books.items():
+        if store is not None:
+            store.append_book(id, pair, orderbook)
+        await recorder.record(id, pair, orderbook) # waits if the db lags
+
+
 async def load_arbitrableSymbols():
-    for pair in arbitrableSymbols:
-        for id in exchangesBySymbol[pair]:
-            asyncio.ensure_future(insert_order_book(exchanges[id], pair, conn))
+    await asyncio.gather(*[record_pair(pair) for pair in arbitrableSymbols])
 
 # Test
 # exchangesBySymbol
@@ -95,10 +100,25 @@ async def load_arbitrableSymbols():
 @asyncio.coroutine
 def periodic():
     starttime = time.time()
+    snapshot = None
     while True:
-        asyncio.ensure_future(load_arbitrableSymbols())
-        yield from asyncio.sleep(60.0 - ((time.time() - starttime) % 60.0))
+        if snapshot is None or snapshot.done():
+            snapshot = asyncio.ensure_future(load_arbitrableSymbols())
+        else:
+            print("Previous snapshot still loading, skipped")
+        yield from asyncio.sleep(period - ((time.time() - starttime) % period))
 
-task = asyncio.Task(periodic())
 loop = asyncio.get_event_loop()
-loop.run_until_complete(task)
+writer = asyncio.ensure_future(recorder.run())
+task = asyncio.Task(periodic())
+try:
+    loop.run_until_complete(task)
+except KeyboardInterrupt:
+    pass
+finally:
+    writer.cancel() # flushes the books still queued
+    loop.run_until_complete(asyncio.gather(writer, return_exceptions=True))
+    loop.run_until_complete(exchange_pool.close())
+    if store is not None:
+        store.close()
+    print("Recorded", recorder.recorded, "books,", recorder.failed, "failed")
@@ -0,0 +1,124 @@
+import asyncio
+import copy
+import time
+
+import logging
+logger = logging.getLogger(__name__)
+
+################################################################################
+# Balance cache
+################################################################################
+
+class BalanceCache:
+    """ Latest balance of each exchange, served without a request while
+    younger than ttl seconds and kept fresh by run() in the background
+    Orders reported with order_placed() adjust the cached balance at once
+    and trigger a refresh, so funds checks right after a trade don't count
+    the same funds twice; a fetch sent before the order doesn't overwrite
+    the adjusted balance
+    Concurrent fetches for an exchange wait on the same call
+    """
+
+    def __init__(self, ttl=30):
+        self.ttl = ttl
+        self.balances = dict() # {exchange id: (time, balance)}
+        self.pending = dict() # {exchange id: future}
+        self.placed = dict() # {exchange id: time of the last order}
+
+    async def fetch_balance(self, exchange, max_age=None):
+        """ Cached exchange.fetch_balance(), fetched if older than max_age
+        seconds (ttl by default)
+        Returns a copy the caller may modify
+        """
+        max_age = self.ttl if max_age is None else max_age
+        cached = self.balances.get(exchange.id)
+        if cached is None or time.time() - cached[0] >= max_age:
+            # a cancelled caller must not cancel the call others wait on
+            balance = await asyncio.shield(self.refresh(exchange))
+            cached = self.balances.get(exchange.id, (None, balance))
+        return(copy.deepcopy(cached[1]))
+
+    def refresh(self, exchange):
+        """ Future of the balance fetch of exchange in flight, started if
+        there is none
+        """
+        if exchange.id not in self.pending:
+            self.pending[exchange.id] =\
+                asyncio.ensure_future(self._fetch(exchange))
+        return(self.pending[exchange.id])
+
+    async def _fetch(self, exchange):
+        started = time.time()
+        try:
+            balance = await exchange.fetch_balance()
+        finally:
+            del self.pending[exchange.id]
+        if started >= self.placed.get(exchange.id, 0):
+            self.update(exchange.id, balance)
+        else:
+            # requested before an order, the adjusted balance is more recent
+            self.refresh(exchange)
+        return(balance)
+
+    def update(self, exchange_id, balance):
+        """ Store a balance fetched by other means
+        """
+        self.balances[exchange_id] = (time.time(), balance)
+
+    def invalidate(self, exchange_id=None):
+        """ Drop cached balances, all of them by default
+        """
+        for id in list(self.balances):
+            if exchange_id in (None, id):
+                del self.balances[id]
+
+    def order_placed(self, exchange, symbol, side, amount, price):
+        """ Apply an order to the cached balance of exchange, as if filled
+        at price net of the taker fee, and refresh it in the background
+        Takes the order parameters, exchanges mostly answer create_order
+        with the order id only
+        """
+        self.placed[exchange.id] = time.time()
+        cached = self.balances.get(exchange.id)
+        if cached is not None:
+            for currency, change in order_changes(exchange, symbol, side,\
+                                                  amount, price).items():
+                adjust(cached[1], currency, change)
+        self.refresh(exchange)
+
+    async def run(self, exchanges, interval=None):
+        """ Refresh the balances of exchanges ({id: exchange}) every
+        interval seconds (ttl by default) until cancelled
+        """
+        interval = self.ttl if interval is None else interval
+        while True:
+            results = await asyncio.gather(*[asyncio.shield(self.refresh(exchange))\
+                                             for exchange in exchanges.values()],\
+                                           return_exceptions=True)
+            for id, result in zip(exchanges, results):
+                if isinstance(result, Exception):
+                    logger.warning("%s balance not refreshed: %s", id, result)
+            await asyncio.sleep(interval)
+
+
+def order_changes(exchange, symbol, side, amount, price):
+    """ {currency: change} of the balance of exchange once an order of
+    symbol and side fills amount at price, net of the taker fee of its
+    market
+    """
+    fee = (exchange.markets or dict()).get(symbol, dict()).get('taker') or 0
+    base, quote = symbol.split('/')
+    if side == 'sell':
+        return({base: -amount, quote: amount * price * (1 - fee)})
+    return({base: amount * (1 - fee), quote: -amount * price})
+
+
+def adjust(balance, currency, change):
+    """ Add change to the free and total amounts of currency in a ccxt
+    balance structure
+    """
+    account = balance.setdefault(currency, {'free': 0., 'used': 0., 'total': 0.})
+    for key in ('free', 'total'):
+        account[key] = (account.get(key) or 0) + change
+        if isinstance(balance.get(key), dict):
+            balance[key][currency] = account[key]
@@ -0,0 +1,139 @@
+import struct
+import numpy as np
+try:
+    from CryptoGoats.depth import book_columns
+except ImportError:
+    from depth import book_columns
+
+################################################################################
+# Binary order book levels
+################################################################################
+
+# version, kind, level count, then count float64 prices and count float64
+# amounts (little endian), 8 byte header so the columns stay aligned
+HEADER = struct.Struct('<BBxxI')
+VERSION = 1
+FULL = 0 # all levels
+DELTA = 1 # levels changed since the previous snapshot, amount 0 if removed
+
+
+def encode_levels(levels, depth=None, kind=FULL):
+    """ Bytes of [price, amount] levels, only the first depth levels if
+    given, as two fixed width float64 columns
+    """
+    prices, amounts = book_columns(levels)
+    if depth is not None:
+        prices, amounts = prices[:depth], amounts[:depth]
+    return(encode_columns(prices, amounts, kind))
+
+
+def encode_columns(prices, amounts, kind=FULL):
+    return(HEADER.pack(VERSION, kind, len(prices))\
+           + np.ascontiguousarray(prices, dtype='<f8').tobytes()\
+           + np.ascontiguousarray(amounts, dtype='<f8').tobytes())
+
+
+def decode_levels(data):
+    """ (prices, amounts) float64 arrays reading data in place (bytes,
+    memoryview from a bytea column, mmap...), no copy
+    """
+    version, kind, count = HEADER.unpack_from(data)
+    if version != VERSION:
+        raise ValueError("Unknown order book encoding version %d" % version)
+    return(np.frombuffer(data, dtype='<f8', count=count, offset=HEADER.size),\
+           np.frombuffer(data, dtype='<f8', count=count,\
+                         offset=HEADER.size + 8 * count))
+
+
+def encoding_kind(data):
+    """ FULL or DELTA
+    """
+    return(HEADER.unpack_from(data)[1])
+
+
+################################################################################
+# Deltas
+################################################################################
+
+def diff_levels(previous, levels):
+    """ Levels of levels new or with another amount than in previous, and
+    levels of previous no longer there with amount 0, as (prices, amounts)
+    previous and levels are (prices, amounts) columns
+    """
+    previous_prices, previous_amounts = previous
+    prices, amounts = levels
+    common, i, j = np.intersect1d(previous_prices, prices,\
+                                  assume_unique=True, return_indices=True)
+    changed = np.ones(len(prices), dtype=bool)
+    changed[j[previous_amounts[i] == amounts[j]]] = False
+    removed = ~np.isin(previous_prices, prices, assume_unique=True)
+    return(np.concatenate((prices[changed], previous_prices[removed])),\
+           np.concatenate((amounts[changed], np.zeros(removed.sum()))))
+
+
+def apply_levels(previous, delta, descending=False):
+    """ Levels after applying delta (see diff_levels) to previous, sorted
+    by price, descending for bids
+    """
+    previous_prices, previous_amounts = previous
+    delta_prices, delta_amounts = delta
+    kept = ~np.isin(previous_prices, delta_prices, assume_unique=True)
+    added = delta_amounts > 0
+    prices = np.concatenate((previous_prices[kept], delta_prices[added]))
+    amounts = np.concatenate((previous_amounts[kept], delta_amounts[added]))
+    order = np.argsort(prices, kind='stable')
+    if descending:
+        order = order[::-1]
+    return(prices[order], amounts[order])
+
+
+class BookEncoder:
+    """ Encode successive snapshots of order book sides, as deltas against
+    the previous snapshot of the same key (e.g. (exchange, pair, 'bids'))
+    when delta, with a full snapshot every keyframe snapshots
+    """
+
+    def __init__(self, depth=None, delta=False, keyframe=100):
+        self.depth = depth
+        self.delta = delta
+        self.keyframe = keyframe
+        self.previous = dict() # {key: (columns, snapshots since keyframe)}
+
+    def encode(self, key, levels):
+        if not self.delta:
+            return(encode_levels(levels, self.depth))
+        prices, amounts = book_columns(levels)
+        if self.depth is not None:
+            prices, amounts = prices[:self.depth], amounts[:self.depth]
+        previous, count = self.previous.get(key, (None, 0))
+        if previous is None or count + 1 >= self.keyframe:
+            self.previous[key] = ((prices, amounts), 0)
+            return(encode_columns(prices, amounts))
+        self.previous[key] = ((prices, amounts), count + 1)
+        return(encode_columns(*diff_levels(previous, (prices, amounts)),\
+                              kind=DELTA))
+
+    def reset(self):
+        """ Forget previous snapshots: the next one of every key is full,
+        e.g. after encoded snapshots were lost
+        """
+        self.previous.clear()
+
+
+class BookDecoder:
+    """ Full levels from the output of BookEncoder, read in order
+    Full snapshots are returned without a copy
+    """
+
+    def __init__(self):
+        self.previous = dict() # {key: columns}
+
+    def decode(self, key, data, descending=False):
+        """ (prices, amounts) of the side of key, bids are descending
+        Raises KeyError for a delta before the first full snapshot of key
+        """
+        levels = decode_levels(data)
+        if encoding_kind(data) == DELTA:
+            levels = apply_levels(self.previous[key], levels, descending)
+        self.previous[key] = levels
+        return(levels)
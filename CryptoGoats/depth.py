@@ -0,0 +1,73 @@
+import numpy as np
+
+################################################################################
+# Order book depth
+################################################################################
+
+def book_columns(levels):
+    """ (prices, amounts) float arrays of [price, amount] levels, without a
+    copy for compact order books (compactOrderBooks exchange option)
+    """
+    if hasattr(levels, 'columns'):
+        prices, amounts = levels.columns()
+        return(np.asarray(prices, dtype=float), np.asarray(amounts, dtype=float))
+    levels = np.asarray([level[:2] for level in levels], dtype=float)
+    if len(levels) == 0:
+        return(np.zeros(0), np.zeros(0))
+    return(levels[:, 0], levels[:, 1])
+
+
+def cumulative_cost(levels):
+    """ Cumulative amounts and costs of levels, both starting at 0
+    cost of filling any amount q is np.interp(q, amounts, costs)
+    """
+    prices, amounts = book_columns(levels)
+    return(np.concatenate(([0.], np.cumsum(amounts))),\
+           np.concatenate(([0.], np.cumsum(prices * amounts))))
+
+
+def executable_amount(bids, asks, minSpread, sell_fee=0, buy_fee=0,\
+                      max_amount=None):
+    """ Largest amount that can be sold into bids and bought from asks with
+    the percent VWAP spread, net of taker fees, at least minSpread:
+        100 * (sell_vwap * (1 - sell_fee) - buy_vwap * (1 + buy_fee))
+            / sell_vwap >= minSpread
+    The condition is linear in the amount between two consecutive levels of
+    either book, so it is checked at every level boundary at once and the
+    exact amount is interpolated in the last profitable segment
+    Returns (amount, sell_vwap, buy_vwap), (0, None, None) if not even the
+    top of both books clears minSpread
+    """
+    bid_amounts, bid_costs = cumulative_cost(bids)
+    ask_amounts, ask_costs = cumulative_cost(asks)
+    available = min(bid_amounts[-1], ask_amounts[-1])
+    if max_amount is not None:
+        available = min(available, max_amount)
+    if available <= 0:
+        return(0., None, None)
+
+    # level boundaries of both books up to the available amount
+    amounts = np.union1d(bid_amounts, ask_amounts)
+    amounts = np.append(amounts[amounts < available], available)
+    sell_costs = np.interp(amounts, bid_amounts, bid_costs)
+    buy_costs = np.interp(amounts, ask_amounts, ask_costs)
+    # profit margin over minSpread, positive while the spread clears it
+    margins = sell_costs * (1 - sell_fee - minSpread / 100.)\
+        - buy_costs * (1 + buy_fee)
+
+    # margins start at 0 and are concave (sell costs concave, buy costs
+    # convex), so the amounts clearing minSpread are an interval from 0
+    if not margins[1] > 0:
+        return(0., None, None)
+    below = np.nonzero(margins < 0)[0]
+    if len(below) == 0:
+        amount = available
+    else:
+        i = below[0]
+        amount = amounts[i - 1] + (amounts[i] - amounts[i - 1])\
+            * margins[i - 1] / (margins[i - 1] - margins[i])
+
+    amount = float(amount)
+    sell_vwap = float(np.interp(amount, bid_amounts, bid_costs)) / amount
+    buy_vwap = float(np.interp(amount, ask_amounts, ask_costs)) / amount
+    return(amount, sell_vwap, buy_vwap)
@@ -0,0 +1,81 @@
+import asyncio
+import ccxt.async as ccxt
+
+import logging
+logger = logging.getLogger(__name__)
+
+################################################################################
+# Exchange pool
+################################################################################
+
+class ExchangePool:
+    """ One long-lived exchange instance per exchange id
+    Each instance is built once from its config, its markets are loaded once
+    and its aiohttp session (connection pool) stays open until close(), so
+    calls after the first skip construction, market loading and handshakes
+    """
+
+    def __init__(self, config=None):
+        self.config = config if config is not None else dict() # {id: config}
+        self.exchanges = dict()
+        self.locks = dict()
+
+    def __contains__(self, id):
+        return(id in self.exchanges)
+
+    def __getitem__(self, id):
+        return(self.get(id))
+
+    def get(self, id):
+        """ Instance for id, built from config[id] on first use
+        """
+        if id not in self.exchanges:
+            exchange = getattr(ccxt, id) # exchange becomes function bittrex()
+            self.exchanges[id] = exchange(self.config.get(id, dict()))
+        return(self.exchanges[id])
+
+    async def load(self, id, reload=False):
+        """ Instance for id with its markets loaded
+        Markets are loaded once, concurrent callers wait for the same load;
+        served from the exchange's marketsCache when set, unless reload
+        """
+        exchange = self.get(id)
+        if id not in self.locks:
+            self.locks[id] = asyncio.Lock()
+        async with self.locks[id]:
+            if reload or not exchange.markets:
+                await exchange.load_markets(reload=reload)
+        return(exchange)
+
+    async def load_all(self, ids, reload=False):
+        """ Load exchanges concurrently
+        Returns ({id: exchange} for loaded exchanges, [ids not loaded])
+        """
+        results = await asyncio.gather(*[self.load(id, reload) for id in ids],\
+                                       return_exceptions=True)
+        loaded = dict()
+        failed = list()
+        for id, result in zip(ids, results):
+            if isinstance(result, Exception):
+                logger.warning("%s markets not loaded: %s", id, result)
+                failed.append(id)
+            else:
+                loaded[id] = result
+        return(loaded, failed)
+
+    def reset(self):
+        """ Forget all instances without closing them, e.g. in a forked
+        process whose sessions belong to the parent's event loop
+        """
+        for exchange in self.exchanges.values():
+            exchange.own_session = False # not closed when collected
+        self.exchanges = dict()
+        self.locks = dict()
+
+    async def close(self):
+        """ Close the sessions of all instances
+        """
+        await asyncio.gather(*[exchange.close()\
+                               for exchange in self.exchanges.values()])
+        self.exchanges = dict()
+        self.locks = dict()
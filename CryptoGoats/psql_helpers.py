@@ -1,5 +1,14 @@
 import asyncio
 import ccxt
+import io
+import time
+import datetime
+import logging
+logger = logging.getLogger(__name__)
+try:
+    from CryptoGoats.book_codec import BookEncoder
+except ImportError:
+    from book_codec import BookEncoder
 
 
 async def psql_insert_order_book(exchange, pair, conn):
@@ -26,3 +35,137 @@ async def psql_insert_order_book(exchange, pair, conn):
     except Exception as error:
         print(error)
         conn.rollback()
+
+
+########################################################################
+# Order book recorder
+########################################################################
+
+def format_levels(levels, depth=5):
+    """ 'size@price;...' for the first depth levels, the format of the
+    prices table bids and asks columns
+    """
+    return(';'.join(['%r@%r' % (level[1], level[0]) for level in levels[:depth]]))
+
+
+def copy_timestamp(milliseconds):
+    """ UTC time in COPY text format, with an explicit offset so the server
+    time zone doesn't shift timestamptz values
+    """
+    return(datetime.datetime.utcfromtimestamp(milliseconds / 1000.).isoformat()\
+           + '+00')
+
+
+def copy_bytea(data):
+    """ bytea value in COPY text format
+    """
+    return('\\\\x' + data.hex())
+
+
+class BookRecorder:
+    """ Order books written to the prices table in batches
+    record() puts books on a bounded queue, waiting when it is full so
+    producers slow down to what the database takes, and run() writes them
+    with one COPY FROM STDIN per batch of batch_size books, or every
+    flush_interval seconds for a partial batch
+    psycopg2 calls block, they run in the loop's default executor
+    With binary, bids and asks are bytea columns of book_codec encoded
+    levels, as deltas against the previous book of the exchange and pair
+    if delta (decode with BookDecoder), instead of 'size@price;...' text
+    Books are encoded when their batch is written: after a failed batch the
+    encoder starts over, so the next book of every key is a full one and no
+    delta refers to a lost book
+    """
+
+    columns = ('timestamp', 'exchange', 'pair_base', 'pair_quote',
+               'exchange_timestamp', 'bids', 'asks', 'volume')
+
+    def __init__(self, conn, table='prices', batch_size=500,
+                 flush_interval=1.0, max_queue=10000, depth=5,
+                 binary=False, delta=False, keyframe=100):
+        self.conn = conn
+        self.table = table
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.depth = depth
+        self.encoder = BookEncoder(depth, delta, keyframe) if binary else None
+        self.queue = asyncio.Queue(maxsize=max_queue)
+        self.copy_sql = "COPY %s (%s) FROM STDIN" % (table, ', '.join(self.columns))
+        self.recorded = 0 # rows committed
+        self.failed = 0 # rows lost in failed batches
+
+    async def record(self, exchange_id, pair, orderbook):
+        """ Queue orderbook, waits while the queue is full
+        """
+        now = time.time() * 1000
+        await self.queue.put((now, exchange_id, pair,\
+                              orderbook.get('timestamp') or now,\
+                              orderbook['bids'][:self.depth],\
+                              orderbook['asks'][:self.depth]))
+
+    def format_row(self, now, exchange_id, pair, timestamp, bids, asks):
+        """ COPY columns of a queued book
+        """
+        pair_base, pair_quote = pair.split('/')
+        if self.encoder is None:
+            bids = format_levels(bids, self.depth)
+            asks = format_levels(asks, self.depth)
+        else:
+            bids = copy_bytea(self.encoder.encode((exchange_id, pair, 'bids'), bids))
+            asks = copy_bytea(self.encoder.encode((exchange_id, pair, 'asks'), asks))
+        return((copy_timestamp(now), exchange_id, pair_base, pair_quote,
+                copy_timestamp(timestamp), bids, asks,
+                '10000')) # volume placeholder, as in psql_insert_order_book
+
+    async def run(self):
+        """ Write queued books until cancelled, flushing the last batch
+        """
+        loop = asyncio.get_event_loop()
+        rows = []
+        try:
+            while True:
+                rows.append(await self.queue.get())
+                deadline = loop.time() + self.flush_interval
+                while len(rows) < self.batch_size:
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        rows.append(await asyncio.wait_for(self.queue.get(), timeout))
+                    except asyncio.TimeoutError:
+                        break
+                batch, rows = rows, []
+                copy = loop.run_in_executor(None, self.copy, batch)
+                try:
+                    await asyncio.shield(copy)
+                except asyncio.CancelledError:
+                    await copy # finish the batch in flight before the last one
+                    raise
+        finally:
+            while not self.queue.empty():
+                rows.append(self.queue.get_nowait())
+            if rows:
+                self.copy(rows)
+
+    def copy(self, rows):
+        """ Write queued rows with a single COPY and commit
+        """
+        cur = self.conn.cursor()
+        try:
+            data = io.StringIO()
+            for row in rows:
+                data.write('\t'.join(self.format_row(*row)))
+                data.write('\n')
+            data.seek(0)
+            cur.copy_expert(self.copy_sql, data)
+            self.conn.commit()
+            self.recorded += len(rows)
+            logger.debug("Copied %d books into %s", len(rows), self.table)
+        except Exception as error:
+            logger.warning("COPY of %d books failed: %s", len(rows), error)
+            self.conn.rollback()
+            self.failed += len(rows)
+            if self.encoder is not None:
+                self.encoder.reset() # keyframes next, deltas would refer to lost books
+        finally:
+            cur.close()
@@ -26,9 +26,13 @@ with open('./PostgreSQL/config_exchanges.json') as f:
     config = json.load(f)
 
 
+# markets are kept on disk, shared with the scanner
+marketsCache = './CryptoGoats/Cache/markets'
+
 exchanges = {}
 for id in ccxt.exchanges:  # list of exchanges id ['acx', bittrex'...]
     if id in config:
+        config[id].setdefault('marketsCache', marketsCache)
         exchange = getattr(ccxt, id) # exchange becomes function bittrex()
         exchanges[id] = exchange(config[id])
 
@@ -68,9 +72,9 @@ def insert_order_book(exchange, pair, conn):
 counter = 1
 starttime=time.time()
 while True:
-    # first reload all markets
+    # first reload markets older than the marketsCacheTTL
     for id, exchange in exchanges.iteritems():
-        _ = exchange.load_markets(reload=True)
+        _ = exchange.load_markets(reload=exchange.markets_cache_stale())
     # store order books
     for id, exchange in exchanges.iteritems():
         for pair in exchange.symbols:   # for pair, _ in exchange.load_markets().iteritems():
@@ -0,0 +1,378 @@
+import asyncio
+import selectors
+import numpy as np
+import ccxt.async as ccxt
+try:
+    from CryptoGoats.trading_functions import pair_arbitrage, SpreadTable,\
+        TickerCache, BalanceCache, decode_levels
+    from CryptoGoats.tick_store import book_dtype
+except ImportError:
+    from trading_functions import pair_arbitrage, SpreadTable,\
+        TickerCache, BalanceCache, decode_levels
+    from tick_store import book_dtype
+
+import logging
+logger = logging.getLogger(__name__)
+
+################################################################################
+# Recorded books
+################################################################################
+
+def store_history(store, exchanges, pairs, start=None, end=None):
+    """ {(exchange id, pair): book records} read from a TickStore
+    """
+    history = dict()
+    for id in exchanges:
+        for pair in pairs:
+            records = store.books(id, pair, start, end)
+            if len(records):
+                history[(id, pair)] = records
+    return(history)
+
+
+def parse_levels(levels):
+    """ (prices, amounts) of a prices table bids/ asks value, either
+    'size@price;...' text or book_codec bytes
+    """
+    if isinstance(levels, str):
+        levels = [level.split('@') for level in levels.split(';') if level]
+        return(np.array([float(price) for size, price in levels]),\
+               np.array([float(size) for size, price in levels]))
+    return(decode_levels(levels))
+
+
+def prices_history(conn, start, end, depth=20, table='prices'):
+    """ {(exchange id, pair): book records} from the prices table rows
+    recorded between start and end (datetimes)
+    Delta encoded binary books are not supported
+    """
+    cur = conn.cursor()
+    cur.execute("SELECT extract(epoch from timestamp), exchange, pair_base,"
+                " pair_quote, extract(epoch from exchange_timestamp), bids,"
+                " asks FROM " + table + " WHERE timestamp >= %s AND"
+                " timestamp < %s ORDER BY timestamp", (start, end))
+    rows = dict()
+    for timestamp, id, base, quote, exchange_timestamp, bids, asks in cur:
+        rows.setdefault((id, base + '/' + quote), []).append(\
+            (timestamp, exchange_timestamp, bids, asks))
+    cur.close()
+
+    history = dict()
+    for key, key_rows in rows.items():
+        records = np.zeros(len(key_rows), dtype=book_dtype(depth))
+        for i, (timestamp, exchange_timestamp, bids, asks) in enumerate(key_rows):
+            records['timestamp'][i] = timestamp
+            records['exchange_timestamp'][i] = 1000 * exchange_timestamp
+            for side, levels in (('bid', bids), ('ask', asks)):
+                prices, amounts = parse_levels(levels)
+                n = min(len(prices), depth)
+                records[side + '_price'][i] = np.nan
+                records[side + '_amount'][i] = np.nan
+                records[side + '_price'][i, :n] = prices[:n]
+                records[side + '_amount'][i, :n] = amounts[:n]
+        history[key] = records
+    return(history)
+
+
+################################################################################
+# Simulated exchange
+################################################################################
+
+class SimulatedExchange:
+    """ Exchange answering from recorded books at the replay time
+    Orders are filled at once against the current book, up to their limit
+    price, taking the taker fee; balances only change through orders
+    Books older than max_age seconds are treated as missing
+    """
+
+    rateLimit = 0
+
+    def __init__(self, id, replay, books, balance=None, taker=0.0025,\
+                 tickers=None, max_age=60):
+        self.id = id
+        self.replay = replay
+        self.books = books # {pair: book records}
+        self.max_age = max_age
+        self.fixed_tickers = tickers or dict() # {symbol: ticker}, e.g. BTC/USD
+        self.markets = dict()
+        for pair in list(books) + list(self.fixed_tickers):
+            base, quote = pair.split('/')
+            self.markets[pair] = {'id': pair, 'symbol': pair, 'base': base,\
+                                  'quote': quote, 'taker': taker, 'maker': taker}
+        self.symbols = sorted(self.markets)
+        self.has = {'fetchTickers': True}
+        self.balance = {currency: float(total)\
+                        for currency, total in (balance or dict()).items()}
+        self.orders = []
+
+    async def load_markets(self, reload=False):
+        return(self.markets)
+
+    def levels(self, pair):
+        """ (bids, asks) columns of the latest book of pair at replay time
+        """
+        if pair not in self.books:
+            raise ccxt.ExchangeError("%s has no market %s" % (self.id, pair))
+        records = self.books[pair]
+        i = np.searchsorted(records['timestamp'], self.replay.now, 'right') - 1
+        if i < 0 or self.replay.now - records['timestamp'][i] > self.max_age:
+            raise ccxt.ExchangeNotAvailable("%s has no %s book at %f"\
+                                            % (self.id, pair, self.replay.now))
+        record = records[i]
+        sides = []
+        for side in ('bid', 'ask'):
+            prices, amounts = record[side + '_price'], record[side + '_amount']
+            n = np.count_nonzero(~np.isnan(prices))
+            sides.append((prices[:n], amounts[:n]))
+        return(sides[0], sides[1], record['exchange_timestamp'])
+
+    async def fetch_order_book(self, symbol, params={}):
+        (bid_prices, bid_amounts), (ask_prices, ask_amounts), timestamp =\
+            self.levels(symbol)
+        return({'bids': np.column_stack((bid_prices, bid_amounts)).tolist(),\
+                'asks': np.column_stack((ask_prices, ask_amounts)).tolist(),\
+                'timestamp': None if np.isnan(timestamp) else int(timestamp)})
+
+    async def fetch_ticker(self, symbol, params={}):
+        if symbol in self.fixed_tickers:
+            return(dict(self.fixed_tickers[symbol], symbol=symbol))
+        (bid_prices, _), (ask_prices, _), timestamp = self.levels(symbol)
+        return({'symbol': symbol,\
+                'bid': float(bid_prices[0]) if len(bid_prices) else None,\
+                'ask': float(ask_prices[0]) if len(ask_prices) else None,\
+                'timestamp': self.replay.now * 1000})
+
+    async def fetch_tickers(self, symbols=None, params={}):
+        tickers = dict()
+        for symbol in symbols or self.symbols:
+            try:
+                tickers[symbol] = await self.fetch_ticker(symbol)
+            except ccxt.ExchangeError:
+                pass
+        return(tickers)
+
+    async def fetch_balance(self, params={}):
+        return({currency: {'free': total, 'used': 0.0, 'total': total}\
+                for currency, total in self.balance.items()})
+
+    async def create_order(self, symbol, type, side, amount, price=None, params={}):
+        bids, asks, _ = self.levels(symbol)
+        base, quote = symbol.split('/')
+        prices, amounts = bids if side == 'sell' else asks
+        if price is not None:
+            marketable = prices >= price if side == 'sell' else prices <= price
+            prices, amounts = prices[marketable], amounts[marketable]
+        # amount taken from each level, better priced levels first
+        before = np.concatenate(([0.], np.cumsum(amounts)[:-1]))
+        filled = np.clip(amount - before, 0, amounts)
+        filled_amount = float(filled.sum())
+        cost = float((filled * prices).sum())
+        fee = cost * self.markets[symbol]['taker']
+        if side == 'sell':
+            if self.balance.get(base, 0) < filled_amount:
+                raise ccxt.InsufficientFunds("%s %s balance too low" % (self.id, base))
+            self.balance[base] -= filled_amount
+            self.balance[quote] = self.balance.get(quote, 0) + cost - fee
+        else:
+            if self.balance.get(quote, 0) < cost + fee:
+                raise ccxt.InsufficientFunds("%s %s balance too low" % (self.id, quote))
+            self.balance[quote] -= cost + fee
+            self.balance[base] = self.balance.get(base, 0) + filled_amount
+        order = {'id': str(len(self.orders)), 'timestamp': self.replay.now * 1000,\
+                 'symbol': symbol, 'type': type, 'side': side, 'price': price,\
+                 'amount': amount, 'filled': filled_amount,\
+                 'remaining': amount - filled_amount, 'cost': cost,\
+                 'average': cost / filled_amount if filled_amount else None,\
+                 'fee': {'currency': quote, 'cost': fee},\
+                 'status': 'closed' if filled_amount >= amount else 'canceled'}
+        self.orders.append(order)
+        return(order)
+
+    async def create_limit_sell_order(self, symbol, amount, price, params={}):
+        return(await self.create_order(symbol, 'limit', 'sell', amount, price, params))
+
+    async def create_limit_buy_order(self, symbol, amount, price, params={}):
+        return(await self.create_order(symbol, 'limit', 'buy', amount, price, params))
+
+    async def fetch_order(self, id, symbol=None, params={}):
+        return(self.orders[int(id)])
+
+
+################################################################################
+# Replay
+################################################################################
+
+class VirtualSelector(selectors.DefaultSelector):
+    """ Selector that never blocks: the time it would wait is added to its
+    clock instead
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.now = 0.
+
+    def select(self, timeout=None):
+        if timeout:
+            self.now += timeout
+        return(super().select(0))
+
+
+class VirtualEventLoop(asyncio.SelectorEventLoop):
+    """ Event loop whose time jumps ahead whenever it would wait, so
+    asyncio.sleep and timeouts take no real time during a replay
+    """
+
+    def __init__(self):
+        self.clock = VirtualSelector()
+        super().__init__(self.clock)
+
+    def time(self):
+        return(self.clock.now)
+
+
+class Replay:
+    """ Replay recorded books through simulated exchanges
+    history is {(exchange id, pair): book records} (see store_history and
+    prices_history), balances {exchange id: {currency: total}}
+    usd_tickers are the BTC/USD, ETH/USD tickers of the usd exchange
+    (gemini) when it has no recorded books
+    pair_arbitrage takes base currency rates from bittrex or binance, pairs
+    recorded at neither are scanned but never traded
+    """
+
+    def __init__(self, history, balances, taker=0.0025, usd_tickers=None,\
+                 max_age=60):
+        self.history = history
+        self.now = 0.
+        books = dict()
+        for (id, pair), records in history.items():
+            books.setdefault(id, dict())[pair] = records
+        usd_tickers = usd_tickers or {'BTC/USD': {'bid': 10000., 'ask': 10000.},\
+                                      'ETH/USD': {'bid': 1000., 'ask': 1000.}}
+        ids = set(books) | set(balances)
+        self.exchanges = {id: SimulatedExchange(id, self, books.get(id, dict()),\
+                                                balances.get(id), taker,\
+                                                usd_tickers if id == 'gemini' else None,\
+                                                max_age)\
+                          for id in sorted(ids)}
+        self.usd_exchange = self.exchanges.get('gemini') or\
+            SimulatedExchange('gemini', self, dict(), tickers=usd_tickers)
+
+    def times(self, start=None, end=None):
+        """ Sorted times at which a book was recorded, in [start, end)
+        """
+        times = np.unique(np.concatenate([records['timestamp']\
+                                          for records in self.history.values()]))
+        if start is not None:
+            times = times[times >= start]
+        if end is not None:
+            times = times[times < end]
+        return(times)
+
+    def updated_pairs(self, now):
+        """ Pairs with a book recorded at now
+        """
+        return(sorted(set(pair for (id, pair), records in self.history.items()\
+                          if np.searchsorted(records['timestamp'], now, 'left')\
+                          < np.searchsorted(records['timestamp'], now, 'right'))))
+
+    def portfolio(self):
+        """ {currency: total at all exchanges}
+        """
+        totals = dict()
+        for exchange in self.exchanges.values():
+            for currency, total in exchange.balance.items():
+                totals[currency] = totals.get(currency, 0) + total
+        return(totals)
+
+    def value_BTC(self, portfolio):
+        """ Value of portfolio in BTC at the latest mid prices
+        """
+        value = 0
+        for currency, total in portfolio.items():
+            if currency == 'BTC':
+                value += total
+                continue
+            for exchange in self.exchanges.values():
+                try:
+                    (bids, _), (asks, _), _ = exchange.levels(currency + '/BTC')
+                    value += total * (bids[0] + asks[0]) / 2
+                    break
+                except (ccxt.ExchangeError, IndexError):
+                    continue
+        return(float(value))
+
+    async def run(self, params, start=None, end=None, pairs=None,\
+                  sellExchanges=None, buyExchanges=None):
+        """ Call pair_arbitrage(**params) for every pair whose book changed
+        at every recorded time, returns a summary of the run
+        Orders go to all exchanges unless sellExchanges/ buyExchanges
+        """
+        exchangesBySymbol = dict()
+        for (id, pair) in self.history:
+            exchangesBySymbol.setdefault(pair, []).append(id)
+        ids = sorted(self.exchanges)
+        sellExchanges = sellExchanges or ids
+        buyExchanges = buyExchanges or ids
+        prices = SpreadTable()
+        tickers = TickerCache(ttl=0) # quote prices change with the replay time
+        balances = BalanceCache(ttl=0) # fetched at every check, as live
+        times = self.times(start, end)
+        if len(times) == 0:
+            raise ValueError("No recorded book to replay")
+        self.now = times[0]
+        initial = self.portfolio()
+        initial_value = self.value_BTC(initial)
+        scans = 0
+        results = {1: 0, -1: 0}
+        for now in times:
+            self.now = now
+            for pair in self.updated_pairs(now):
+                if (pairs is not None and pair not in pairs)\
+                   or len(exchangesBySymbol[pair]) < 2:
+                    continue
+                result = await pair_arbitrage(prices, pair, self.exchanges,\
+                                              exchangesBySymbol,\
+                                              sellExchanges, buyExchanges,\
+                                              tickers=tickers,\
+                                              balances=balances,\
+                                              usd=self.usd_exchange, **params)
+                scans += 1
+                if result in results:
+                    results[result] += 1
+        final = self.portfolio()
+        orders = [order for exchange in self.exchanges.values()\
+                  for order in exchange.orders]
+        amount = sum(order['amount'] for order in orders)
+        return({'start': float(times[0]), 'end': float(times[-1]),\
+                'scans': scans,\
+                'arbitrages': results[1], 'failed': results[-1],\
+                'orders': len(orders),\
+                'fill_ratio': sum(order['filled'] for order in orders) / amount\
+                if amount else None,\
+                'initial': initial, 'final': final,\
+                'gain_BTC': self.value_BTC(final) - initial_value})
+
+
+def backtest(history, balances, params, start=None, end=None, pairs=None,\
+             taker=0.0025, usd_tickers=None, sellExchanges=None,\
+             buyExchanges=None):
+    """ Replay history with pair_arbitrage(**params), e.g. params =
+    {'arbitrage': True, 'minSpread': 1.5, 'min_arb_amount_BTC': .004,
+     'max_arb_amount_BTC': .07}, on a fresh event loop whose clock only
+    moves when it would wait, so the replay runs as fast as it computes
+    Returns the summary of Replay.run
+    """
+    replay = Replay(history, balances, taker, usd_tickers)
+    loop = VirtualEventLoop()
+    try:
+        previous_loop = asyncio.get_event_loop()
+    except RuntimeError: # no current loop, e.g. in a pool worker
+        previous_loop = None
+    asyncio.set_event_loop(loop)
+    try:
+        return(loop.run_until_complete(replay.run(params, start, end, pairs,\
+                                                  sellExchanges, buyExchanges)))
+    finally:
+        asyncio.set_event_loop(previous_loop)
+        loop.close()
@@ -54,6 +54,26 @@ exchanges_filepath = './CryptoGoats/Config/Exchanges/' + exchanges_file + '.json
 # Parameters
 ################################################################################
 
+# Defaults for parameters missing from older strategy files
+concurrentBooks = True # request a pair's order books at all exchanges at once
+bookTimeout = 5 # seconds before an order book request is given up
+maxBookRequests = 2 # order book requests in flight per exchange
+maxInFlightPairs = 10 # pairs scanned at once, 1 scans pairs one by one
+compactOrderBooks = True # parse order books into price/ size arrays
+tickerTTL = 10 # seconds quote prices are shared between pairs
+balanceTTL = 30 # seconds balances are served from the cache, refreshed in
+                # the background and after each order
+settlementTimeout = 250 # seconds orders are followed in the background
+                        # before the trade is reported as not settled
+prefilterSpread = 0 # only load order books of pairs whose ticker spread
+                    # is above prefilterSpread, null loads all pairs
+marketsCache = './CryptoGoats/Cache/markets' # markets kept on disk between
+                                            # runs, null fetches them on start
+marketsCacheTTL = 86400 # seconds cached markets are used, older ones are
+                        # served while reloaded in the background
+shards = 1 # worker processes scanning a share of the pairs each, with
+           # global rate limits per exchange, 1 scans in this process
+
 with open(strategy_filepath) as strategy_config:
     params = json.load(strategy_config)
 locals().update(params)
@@ -106,10 +126,14 @@ for key, value in params.items():
 
 # Pandas df
 pd.set_option('display.float_format', lambda x: '%.10f' % x) # display 10 digits
-prices = pd.DataFrame(columns=['timestamp', 'exchange', 'pair',
-                               'exchange_timestamp',
-                               'bids', 'high_bid', 'high_bid_size',
-                               'asks', 'low_ask', 'low_ask_size', 'volume'])
+# Latest order book by pair and exchange, prices.to_frame() for a dataframe
+prices = SpreadTable()
+# Quote prices shared by all pairs
+tickers = TickerCache(ttl=tickerTTL)
+# Balances for the pre-trade funds check
+balances = BalanceCache(ttl=balanceTTL)
+# Fills of the orders placed, followed while scanning goes on
+settlement = SettlementMonitor(timeout=settlementTimeout)
 
 # Create and connect to all configured exchanges
 rootLogger.info("...loading exchanges...")
@@ -120,24 +144,24 @@ if allowedExchanges == []:
     for id in config:
         allowedExchanges.append(id)
 
-exchanges = {}
+exchange_pool.config.update(config)
+exchangeIds = list()
 for id in ccxt.exchanges:  # list of exchanges id ['acx', bittrex'...]
     if id in allowedExchanges:
-        exchange = getattr(ccxt, id) # exchange becomes function bittrex()
-        exchanges[id] = exchange(config[id])
-
-
-# Remove exchanges that couldn't be loaded
-notLoaded = list()
-for id, exchange in exchanges.items(): # Py3: items() instead of iteritems()
-    try:
-        _ = asyncio.get_event_loop().run_until_complete(exchange.load_markets(reload=True))
-    except:
-        notLoaded.append(id)
+        # concurrent scans go through the exchange rate limiter
+        config[id].setdefault('enableRateLimit', maxInFlightPairs > 1)
+        config[id].setdefault('compactOrderBooks', compactOrderBooks)
+        config[id].setdefault('marketsCache', marketsCache)
+        config[id].setdefault('marketsCacheTTL', marketsCacheTTL)
+        exchangeIds.append(id)
+
+# Instances are built once and their markets loaded concurrently, exchanges
+# that couldn't be loaded are removed
+exchanges, notLoaded = asyncio.get_event_loop().\
+    run_until_complete(exchange_pool.load_all(exchangeIds))
 
 for id in notLoaded:
     rootLogger.info(style.FAIL + "Coundn't load %s" + style.END, id)
-    del exchanges[id]
 
 # Find arbitrable pairs (in more than 1 exchange)
 # allSymbols = [symbol for _, exchange in exchanges.items() for symbol in exchange.symbols]
@@ -204,36 +228,106 @@ rootLogger.info(style.OKGREEN + "Allowed exchanges for buy orders %s"\
 if displayPortolio:
     portfolio = asyncio.get_event_loop().\
         run_until_complete(portfolio_balance(exchanges, arbitrableSymbols,\
-                                             inBTC=inBTC))
+                                             inBTC=inBTC, balances=balances))
+
+
+async def scan_pair(pair):
+    if settlement.failed:
+        # a trade didn't settle with a gain
+        return(-1)
+    return(await pair_arbitrage(prices,\
+                                pair,\
+                                exchanges,\
+                                exchangesBySymbol,\
+                                sellExchanges,\
+                                buyExchanges,\
+                                arbitrage=arbitrage,\
+                                minSpread=minSpread,\
+                                min_arb_amount_BTC = min_arb_amount_BTC,\
+                                max_arb_amount_BTC = max_arb_amount_BTC,\
+                                concurrent=concurrentBooks,\
+                                book_timeout=bookTimeout,\
+                                max_book_requests=maxBookRequests,\
+                                tickers=tickers,\
+                                balances=balances,\
+                                settlement=settlement))
+
+
+def refresh_balances():
+    """ Background task keeping balances fresh, None unless trading
+    """
+    if not arbitrage:
+        return(None)
+    return(asyncio.ensure_future(balances.run(exchanges)))
+
+
+async def select_pairs(pairs):
+    """ Pairs of the next cycle, prefiltered on tickers unless prefilterSpread
+    is null, the best opportunities ranked from the latest books first
+    """
+    if prefilterSpread is not None:
+        pairs = await ticker_candidates(pairs, exchanges, exchangesBySymbol,\
+                                        sellExchanges, buyExchanges,\
+                                        minSpread=prefilterSpread,\
+                                        tickers=tickers)
+    return(ranked_pairs(prices, exchanges, pairs, sellExchanges, buyExchanges,\
+                        minSpread=minSpread))
+
+
+def scan_shard(shard, pairs, results):
+    """ Scan pairs in a forked worker process with its own event loop and
+    exchange instances, report each cycle's opportunities on results
+    """
+    global exchanges, prices, tickers, balances, settlement
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    exchanges = loop.run_until_complete(shard_exchanges(exchanges, rate_limits))
+    prices = SpreadTable()
+    tickers = TickerCache(ttl=tickerTTL)
+    balances = BalanceCache(ttl=balanceTTL)
+    settlement = SettlementMonitor(timeout=settlementTimeout)
+    rootLogger.info("Shard %d scanning %d pairs", shard, len(pairs))
+    refresher = refresh_balances()
+    try:
+        loop.run_until_complete(\
+            scan_pairs(pairs, scan_pair, cycles=cycles,\
+                       max_in_flight=maxInFlightPairs,\
+                       select_pairs=select_pairs,\
+                       after_cycle=lambda cycle:\
+                       results.put((shard, cycle,\
+                                    rank_opportunities(prices, exchanges, pairs,\
+                                                       sellExchanges,\
+                                                       buyExchanges)))))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if refresher is not None:
+            refresher.cancel()
+        loop.run_until_complete(settlement.close())
+        results.put((shard, None, None))
+        loop.run_until_complete(exchange_pool.close())
 
 
 @asyncio.coroutine
 def main():
-    # starttime = time.time()
-    counter = 1
-    pair_counter = 0
-    while True and counter <= cycles*len(arbitrableSymbols):
-        try:
-            pair = arbitrableSymbols[pair_counter]
-            result =\
-            yield from pair_arbitrage(prices,\
-                                     pair,\
-                                     exchanges,\
-                                     exchangesBySymbol,\
-                                     sellExchanges,\
-                                     buyExchanges,\
-                                     arbitrage=arbitrage,\
-                                     minSpread=minSpread,\
-                                     min_arb_amount_BTC = min_arb_amount_BTC,\
-                                     max_arb_amount_BTC = max_arb_amount_BTC)
-            if result == -1:
-                rootLogger.info(style.FAIL + "Interrupting" + style.END )
-                break
-            counter += 1
-            if result == 0: # stay on same pair if arbitrage was made
-                pair_counter = (pair_counter + 1) % (len(arbitrableSymbols))
-        except KeyboardInterrupt:
-            rootLogger.info("exiting program (print portfolio here)")
+    refresher = refresh_balances()
+    try:
+        yield from scan_pairs(arbitrableSymbols, scan_pair, cycles=cycles,\
+                              max_in_flight=maxInFlightPairs,\
+                              select_pairs=select_pairs,\
+                              after_cycle=lambda cycle:\
+                              log_opportunities(prices, exchanges,\
+                                                arbitrableSymbols,\
+                                                sellExchanges, buyExchanges))
+    except KeyboardInterrupt:
+        rootLogger.info("exiting program (print portfolio here)")
+    finally:
+        if refresher is not None:
+            refresher.cancel()
+
+
+@asyncio.coroutine
+def portfolio_summary():
     newPortfolio = yield from portfolio_balance(exchanges,
                                                 arbitrableSymbols)
     rootLogger.info(style.OKBLUE + "Portfolio Change summary" + style.END)
@@ -241,10 +335,23 @@ def main():
         rootLogger.info("%s %f", curr,\
                         newPortfolio[curr] - portfolio[curr])
 
-task = asyncio.Task(main())
 loop = asyncio.get_event_loop()
-loop.run_until_complete(task)
-
+if shards > 1:
+    # workers are forked from here, before the loop runs again
+    rate_limits = shared_rate_limits(exchanges)
+    try:
+        run_shards(shard_pairs(arbitrableSymbols, exchangesBySymbol, shards),\
+                   scan_shard,\
+                   on_cycle=lambda cycle, opportunities:\
+                   log_ranked(opportunities))
+    except KeyboardInterrupt:
+        rootLogger.info("exiting program (print portfolio here)")
+else:
+    task = asyncio.Task(main())
+    loop.run_until_complete(task)
+    loop.run_until_complete(settlement.close())
+loop.run_until_complete(portfolio_summary())
+loop.run_until_complete(exchange_pool.close())
 
 # Test transfer
 # transfer = asyncio.get_event_loop().\
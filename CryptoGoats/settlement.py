@@ -0,0 +1,169 @@
+import asyncio
+import time
+import ccxt.async as ccxt
+try:
+    from CryptoGoats.balance_cache import order_changes
+except ImportError:
+    from balance_cache import order_changes
+
+import logging
+logger = logging.getLogger(__name__)
+
+################################################################################
+# Settlement monitor
+################################################################################
+
+# order status once no more fills are expected
+SETTLED = ('closed', 'canceled', 'expired')
+
+
+def placed_order(order, pair, side, amount, price):
+    """ order as returned by create_order completed with the parameters it
+    was placed with, None stays None
+    """
+    if order is None:
+        return(None)
+    placed = {'symbol': pair, 'side': side, 'amount': amount, 'price': price}
+    placed.update((key, value) for key, value in order.items() if value is not None)
+    return(placed)
+
+
+class SettlementMonitor:
+    """ Follow the orders of arbitrages in background tasks until both legs
+    are settled, then log the trade PnL, so pair_arbitrage returns as soon
+    as its orders are placed
+    Orders are polled with fetch_order (fetch_open_orders when the exchange
+    doesn't support it) every delay seconds, doubled after every poll up to
+    max_delay, for at most timeout seconds
+    on_settled(trade) is called with every settled trade, see settle()
+    """
+
+    def __init__(self, delay=1, max_delay=30, timeout=250, on_settled=None):
+        self.delay = delay
+        self.max_delay = max_delay
+        self.timeout = timeout
+        self.on_settled = on_settled
+        self.tasks = set()
+        self.trades = [] # settled trades
+        self.failed = 0 # trades not settled or with a loss
+
+    def track(self, exchanges, pair, sell, buy, amount, rate=1, usd=None):
+        """ Settle in the background the arbitrage of amount of pair made of
+        sell and buy, (exchange id, order, limit price) each, order None if
+        it couldn't be placed
+        The order parameters are merged into the orders, as exchanges mostly
+        answer create_order with the order id only
+        rate converts the quote currency to BTC and usd BTC to USD
+        Returns the settlement task
+        """
+        sell, buy = [(id, placed_order(order, pair, side, amount, price))\
+                     for side, (id, order, price) in (('sell', sell), ('buy', buy))]
+        task = asyncio.ensure_future(self.settle(exchanges, pair, sell, buy,\
+                                                 rate, usd, amount))
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+        return(task)
+
+    async def settle(self, exchanges, pair, sell, buy, rate=1, usd=None,\
+                     amount=None):
+        """ Wait for both legs and return the trade: pair, legs (final
+        orders), base and quote changes, gain_BTC, gain_USD, seconds and
+        success (1 or -1, as pair_arbitrage)
+        A trade whose legs can't be followed is reported as failed, without
+        changes or gain
+        """
+        started = time.time()
+        legs = [sell[1], buy[1]]
+        base, quote = pair.split('/')
+        base_diff, quote_diff, gain_BTC = None, None, None
+        settled = False
+        try:
+            legs = await asyncio.gather(*[self.wait_order(exchanges[id], order)\
+                                          for id, order in (sell, buy)])
+            base_diff, quote_diff = 0, 0
+            for (id, order), final in zip((sell, buy), legs):
+                if final is None:
+                    continue
+                filled = final.get('filled')
+                changes = order_changes(exchanges[id], final['symbol'], final['side'],\
+                                        final['amount'] if filled is None else filled,\
+                                        final.get('average') or final['price'])
+                base_diff += changes[base]
+                quote_diff += changes[quote]
+            amount = amount or sell[1]['amount']
+            settled = all(final is not None and final.get('status') in SETTLED\
+                          for final in legs)
+            gain_BTC = base_diff * rate + quote_diff
+        except asyncio.CancelledError:
+            raise
+        except Exception as mess:
+            logger.warning("%s arbitrage not followed: %s", pair, mess)
+        success = gain_BTC is not None and settled\
+            and base_diff >= -amount / 100 and quote_diff > 0
+        trade = {'pair': pair, 'legs': legs,\
+                 'base_diff': base_diff, 'quote_diff': quote_diff,\
+                 'gain_BTC': gain_BTC,\
+                 'gain_USD': None if usd is None or gain_BTC is None\
+                 else gain_BTC * usd,\
+                 'seconds': time.time() - started,\
+                 'success': 1 if success else -1}
+        if gain_BTC is not None:
+            logger.info("%s settled in %.1f s: %f %s, %f %s, gain %f BTC",\
+                        pair, trade['seconds'], base_diff, base, quote_diff,\
+                        quote, gain_BTC)
+        if trade['success'] == -1:
+            self.failed += 1
+            logger.warning("%s arbitrage %s: %s", pair,\
+                           "made a loss" if settled else "not settled", legs)
+        self.trades.append(trade)
+        if self.on_settled is not None:
+            self.on_settled(trade)
+        return(trade)
+
+    async def wait_order(self, exchange, order):
+        """ Latest state of order, polled until settled or timeout seconds
+        None for a leg that wasn't placed
+        """
+        if order is None:
+            return(None)
+        delay = self.delay
+        deadline = time.time() + self.timeout
+        while order.get('status') not in SETTLED and time.time() < deadline:
+            await asyncio.sleep(min(delay, max(0, deadline - time.time())))
+            delay = min(2 * delay, self.max_delay)
+            try:
+                order = await self.fetch_order(exchange, order)
+            except Exception as mess:
+                logger.warning("%s order %s not fetched: %s",\
+                               exchange.id, order['id'], mess)
+        return(order)
+
+    async def fetch_order(self, exchange, order):
+        try:
+            fetched = await exchange.fetch_order(order['id'], order['symbol'])
+        except ccxt.NotSupported:
+            pass
+        else:
+            # fields the exchange leaves out keep their placed value
+            return(dict(order, **{key: value for key, value in fetched.items()\
+                                  if value is not None}))
+        # settled, at the order price, once no longer open
+        open_orders = await exchange.fetch_open_orders(order['symbol'])
+        for open_order in open_orders:
+            if open_order['id'] == order['id']:
+                return(dict(order, **open_order))
+        return(dict(order, status='closed', filled=order['amount'],\
+                    remaining=0))
+
+    async def close(self, timeout=None):
+        """ Wait up to timeout seconds (until all trades settle by default)
+        for the trades being settled, cancel the others
+        """
+        if not self.tasks:
+            return
+        done, pending = await asyncio.wait(list(self.tasks), timeout=timeout)
+        for task in pending:
+            task.cancel()
+        if pending:
+            logger.warning("%d trades left unsettled", len(pending))
+            await asyncio.wait(pending)
@@ -0,0 +1,120 @@
+import asyncio
+import multiprocessing
+import queue
+import time
+
+import logging
+logger = logging.getLogger(__name__)
+
+################################################################################
+# Shards
+################################################################################
+
+def shard_pairs(pairs, exchangesBySymbol, shards):
+    """ Split pairs into shards lists with about the same number of order
+    book requests per cycle (one per exchange listing the pair)
+    """
+    loads = [0] * shards
+    split = [list() for _ in range(shards)]
+    for pair in sorted(pairs, key=lambda pair: -len(exchangesBySymbol[pair])):
+        shard = loads.index(min(loads))
+        split[shard].append(pair)
+        loads[shard] += len(exchangesBySymbol[pair])
+    return([sorted(pairs) for pairs in split])
+
+
+################################################################################
+# Global rate limits
+################################################################################
+
+class SharedRateLimit:
+    """ Rate limit of one exchange shared by all worker processes
+    The time the next request may go is kept in shared memory: each request
+    books the next slot under a lock and sleeps until it, so requests from
+    all processes together stay cost / refillRate milliseconds apart
+    Used as exchange.throttle, which exchanges call with the request cost
+    (weight, see the exchange's weights)
+    """
+
+    def __init__(self, refillRate):
+        self.interval = 1. / refillRate / 1000. # seconds per unit of cost
+        self.next = multiprocessing.Value('d', 0.)
+
+    async def __call__(self, cost=None):
+        cost = 1 if cost is None else cost
+        with self.next.get_lock():
+            now = time.time()
+            start = max(now, self.next.value)
+            self.next.value = start + cost * self.interval
+        if start > now:
+            await asyncio.sleep(start - now)
+
+
+def shared_rate_limits(exchanges):
+    """ {id: SharedRateLimit}, to be created before workers are started
+    The limits refill as the exchanges' token buckets, one unit of cost per
+    rateLimit unless the exchange sets its tokenBucket (e.g. binance weights)
+    """
+    return({id: SharedRateLimit(exchange.tokenBucket['refillRate'])\
+            for id, exchange in exchanges.items()})
+
+
+################################################################################
+# Coordinator
+################################################################################
+
+def run_shards(shards, scan_shard, on_cycle=None, poll=1):
+    """ Run scan_shard(shard, pairs, results) in one process per list of
+    pairs in shards and merge what they report
+    Workers put (shard, cycle, opportunities) on results after each cycle
+    and (shard, None, None) when done. Once every running worker reported a
+    cycle, on_cycle(cycle, opportunities) is called with the opportunities
+    of all shards sorted by decreasing spread (last item)
+    Workers are forked so they inherit the scanner state (exchanges, rate
+    limits), returns when all workers are done
+    """
+    context = multiprocessing.get_context('fork')
+    results = context.Queue()
+    workers = [context.Process(target=scan_shard,\
+                               args=(shard, pairs, results),\
+                               name="shard-%d" % shard)\
+               for shard, pairs in enumerate(shards)]
+    for worker in workers:
+        worker.start()
+
+    running = set(range(len(workers)))
+    cycles = dict() # {cycle: {shard: opportunities}}
+
+    def merge_ready():
+        for cycle in sorted(cycles):
+            if not running.issubset(cycles[cycle]):
+                break
+            reported = cycles.pop(cycle)
+            opportunities = sorted([opportunity\
+                                    for shard_opportunities in reported.values()\
+                                    for opportunity in shard_opportunities],\
+                                   key=lambda opportunity: -opportunity[-1])
+            if on_cycle is not None:
+                on_cycle(cycle, opportunities)
+
+    try:
+        while running:
+            try:
+                shard, cycle, opportunities = results.get(timeout=poll)
+            except queue.Empty:
+                # a worker that died without reporting is done
+                for shard in list(running):
+                    if not workers[shard].is_alive():
+                        logger.warning("Shard %d exited with code %s",\
+                                       shard, workers[shard].exitcode)
+                        running.discard(shard)
+                merge_ready()
+                continue
+            if cycle is None:
+                running.discard(shard)
+            else:
+                cycles.setdefault(cycle, dict())[shard] = opportunities
+            merge_ready()
+    finally:
+        for worker in workers:
+            worker.join()
@@ -0,0 +1,192 @@
+import numpy as np
+import pandas as pd
+
+################################################################################
+# Spread table
+################################################################################
+
+class SpreadTable:
+    """ Latest order book row for each (pair, exchange)
+    Rows have the layout of the prices dataframe (see order_book_row).
+    A new row replaces the previous one for its (pair, exchange), and best
+    bid/ ask lookups only visit the exchanges listing the pair
+    The top of book of every row is also kept in a (4 x pairs x exchanges)
+    array, updated in place, so top_of_book slices it without a loop
+    """
+
+    columns = ['timestamp', 'exchange', 'pair', 'exchange_timestamp',
+               'bids', 'high_bid', 'high_bid_size',
+               'asks', 'low_ask', 'low_ask_size', 'volume']
+
+    EXCHANGE = columns.index('exchange')
+    PAIR = columns.index('pair')
+    HIGH_BID = columns.index('high_bid')
+    HIGH_BID_SIZE = columns.index('high_bid_size')
+    LOW_ASK = columns.index('low_ask')
+    LOW_ASK_SIZE = columns.index('low_ask_size')
+    TOP = [HIGH_BID, HIGH_BID_SIZE, LOW_ASK, LOW_ASK_SIZE]
+
+    def __init__(self):
+        self.rows = dict() # {pair: {exchange: row}}
+        self.pair_index = dict() # {pair: index in top}
+        self.exchange_index = dict() # {exchange: index in top}
+        self.top = np.full((4, 0, 0), np.nan)
+
+    def __len__(self):
+        return(sum(len(rows) for rows in self.rows.values()))
+
+    def update(self, row):
+        """ Store row as the latest order book of its (pair, exchange)
+        """
+        self.rows.setdefault(row[self.PAIR], dict())[row[self.EXCHANGE]] = row
+        p = self.pair_index.setdefault(row[self.PAIR], len(self.pair_index))
+        e = self.exchange_index.setdefault(row[self.EXCHANGE],\
+                                           len(self.exchange_index))
+        if p >= self.top.shape[1] or e >= self.top.shape[2]:
+            # grown by doubling, the new cells have no row
+            top = np.full((4, max(p + 1, 2 * self.top.shape[1]),\
+                           max(e + 1, 2 * self.top.shape[2])), np.nan)
+            top[:, :self.top.shape[1], :self.top.shape[2]] = self.top
+            self.top = top
+        self.top[:, p, e] = [row[i] for i in self.TOP]
+
+    def get(self, pair, exchange):
+        """ Latest row for (pair, exchange), None if never updated
+        """
+        return(self.rows.get(pair, dict()).get(exchange))
+
+    def pair_rows(self, pair, exchanges=None):
+        """ Latest rows for pair, only at exchanges if given
+        """
+        rows = self.rows.get(pair, dict())
+        if exchanges is None:
+            return(list(rows.values()))
+        return([rows[id] for id in exchanges if id in rows])
+
+    def best_bid(self, pair, exchanges=None):
+        """ Returns (exchange, high_bid, high_bid_size) of the highest bid
+        for pair, None if no row
+        """
+        rows = self.pair_rows(pair, exchanges)
+        if not rows:
+            return(None)
+        row = max(rows, key=lambda row: row[self.HIGH_BID])
+        return(row[self.EXCHANGE], row[self.HIGH_BID], row[self.HIGH_BID_SIZE])
+
+    def best_ask(self, pair, exchanges=None):
+        """ Returns (exchange, low_ask, low_ask_size) of the lowest ask for
+        pair, None if no row
+        """
+        rows = self.pair_rows(pair, exchanges)
+        if not rows:
+            return(None)
+        row = min(rows, key=lambda row: row[self.LOW_ASK])
+        return(row[self.EXCHANGE], row[self.LOW_ASK], row[self.LOW_ASK_SIZE])
+
+    def get_spread(self, pair, sellExchanges, buyExchanges):
+        """ Same result as get_spread on the prices dataframe:
+        (bb_exchange, best_bid, best_bid_size,
+         ba_exchange, best_ask, best_ask_size, spread)
+        Raises ValueError if pair has no bid or no ask
+        """
+        best_bid = self.best_bid(pair, sellExchanges)
+        best_ask = self.best_ask(pair, buyExchanges)
+        if best_bid is None or best_ask is None:
+            raise ValueError("No bid or ask for %s" % pair)
+        bb_exchange, high_bid, high_bid_size = best_bid
+        ba_exchange, low_ask, low_ask_size = best_ask
+        spread = 100 * (high_bid - low_ask) / high_bid
+        return(bb_exchange, high_bid, high_bid_size,\
+               ba_exchange, low_ask, low_ask_size, spread)
+
+    def top_of_book(self, pairs, exchanges):
+        """ Latest top of book as (pairs x exchanges) arrays
+        Returns high_bid, high_bid_size, low_ask, low_ask_size, NaN where
+        the pair has no row at the exchange
+        """
+        p = np.array([self.pair_index.get(pair, -1) for pair in pairs], dtype=int)
+        e = np.array([self.exchange_index.get(id, -1) for id in exchanges],\
+                     dtype=int)
+        known = (p >= 0)[:, None] & (e >= 0)[None, :]
+        if not known.any():
+            top = np.full((4, len(pairs), len(exchanges)), np.nan)
+        else:
+            top = self.top[:, np.maximum(p, 0)[:, None], np.maximum(e, 0)[None, :]]
+            top[:, ~known] = np.nan
+        return(top[0], top[1], top[2], top[3])
+
+    def to_columns(self):
+        """ Snapshot as {column: list of values}
+        """
+        rows = [row for pair_rows in self.rows.values()\
+                for row in pair_rows.values()]
+        return({column: [row[i] for row in rows]\
+                for i, column in enumerate(self.columns)})
+
+    def to_frame(self):
+        """ Snapshot as a prices dataframe (one row per pair and exchange)
+        """
+        return(pd.DataFrame(self.to_columns(), columns=self.columns))
+
+
+################################################################################
+# Spread matrix
+################################################################################
+
+def taker_fees(exchanges, pairs, ids):
+    """ (pairs x ids) array of taker fees from the exchanges' markets, 0 when
+    the market or its fee is unknown
+    """
+    fees = np.zeros((len(pairs), len(ids)))
+    for e, id in enumerate(ids):
+        markets = exchanges[id].markets or dict()
+        for p, pair in enumerate(pairs):
+            if pair in markets:
+                fees[p, e] = markets[pair].get('taker') or 0
+    return(fees)
+
+
+def rank_spreads(prices, pairs, ids, sellExchanges, buyExchanges,\
+                 fees=None, minSpread=None):
+    """ Best cross exchange opportunity for every pair, in one pass over the
+    (pairs x sell exchanges x buy exchanges) spread matrix
+    Percent spread of selling at s and buying at b is computed net of taker
+    fees (fees is a (pairs x ids) array, see taker_fees):
+        100 * (bid_s * (1 - fee_s) - ask_b * (1 + fee_b)) / bid_s
+    Returns [(pair, bb_exchange, best_bid, best_bid_size,
+              ba_exchange, best_ask, best_ask_size, spread)]
+    sorted by decreasing spread, only spreads above minSpread if given
+    """
+    if not pairs or not ids:
+        return([])
+    bids, bid_sizes, asks, ask_sizes = prices.top_of_book(pairs, ids)
+    if fees is None:
+        fees = np.zeros(bids.shape)
+    sell = np.isin(ids, sellExchanges)
+    buy = np.isin(ids, buyExchanges)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        net_bids = np.where(sell, bids * (1 - fees), np.nan)
+        net_asks = np.where(buy, asks * (1 + fees), np.nan)
+        spreads = 100 * (net_bids[:, :, None] - net_asks[:, None, :])\
+            / bids[:, :, None]
+    # buying and selling at the same exchange is not an arbitrage
+    spreads[:, np.arange(len(ids)), np.arange(len(ids))] = np.nan
+    spreads = np.where(np.isnan(spreads), -np.inf, spreads)
+
+    flat = spreads.reshape(len(pairs), -1)
+    best = flat.argmax(axis=1)
+    best_spreads = flat[np.arange(len(pairs)), best]
+    s, b = np.divmod(best, len(ids))
+
+    opportunities = []
+    for p in np.argsort(-best_spreads, kind='stable'):
+        spread = best_spreads[p]
+        if spread == -np.inf or (minSpread is not None and spread <= minSpread):
+            continue
+        opportunities.append((pairs[p], ids[s[p]],\
+                              float(bids[p, s[p]]), float(bid_sizes[p, s[p]]),\
+                              ids[b[p]],\
+                              float(asks[p, b[p]]), float(ask_sizes[p, b[p]]),\
+                              float(spread)))
+    return(opportunities)
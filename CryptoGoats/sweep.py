@@ -0,0 +1,131 @@
+import sys
+import json
+import time
+import calendar
+import datetime
+import itertools
+import multiprocessing
+import logging
+import pandas as pd
+try:
+    from CryptoGoats.replay import backtest, store_history
+    from CryptoGoats.tick_store import TickStore
+    from CryptoGoats.trading_functions import logger as trading_logger
+except ImportError:
+    from replay import backtest, store_history
+    from tick_store import TickStore
+    from trading_functions import logger as trading_logger
+
+logger = logging.getLogger(__name__)
+
+################################################################################
+# Parameter sweep
+################################################################################
+
+# Strategy parameters used by the replay
+ARBITRAGE_PARAMS = ['arbitrage', 'minSpread', 'min_arb_amount_BTC',\
+                    'max_arb_amount_BTC']
+
+
+def expand_grid(grid):
+    """ Every combination of {parameter: [values]}, as a list of
+    {parameter: value}, a value that isn't a list is used in every combination
+    """
+    names = sorted(grid)
+    values = [grid[name] if isinstance(grid[name], list) else [grid[name]]\
+              for name in names]
+    return([dict(zip(names, combination))\
+            for combination in itertools.product(*values)])
+
+
+def epoch(date):
+    """ Seconds since epoch of an ISO UTC date, None stays None
+    """
+    if date is None:
+        return(None)
+    return(calendar.timegm(datetime.datetime.strptime(date[:10], '%Y-%m-%d').timetuple()))
+
+
+# Recorded books shared by the worker processes, loaded before they fork
+history = dict()
+sweep = dict()
+
+
+def run_strategy(strategy):
+    """ Replay the recorded books with strategy, returns a results row
+    """
+    started = time.time()
+    params = {key: strategy[key] for key in ARBITRAGE_PARAMS if key in strategy}
+    params.setdefault('arbitrage', True)
+    try:
+        summary = backtest(history, sweep['balances'], params,\
+                           pairs=strategy.get('allowedPairs') or None,\
+                           taker=sweep.get('taker', 0.0025),\
+                           sellExchanges=strategy.get('sellExchanges') or None,\
+                           buyExchanges=strategy.get('buyExchanges') or None)
+    except Exception as mess:
+        logger.warning("%s failed: %s", strategy, mess)
+        return(None)
+    row = {key: strategy[key] for key in sweep['grid']}
+    row.update({'pnl_BTC': summary['gain_BTC'],\
+                'trades': summary['arbitrages'],\
+                'failed': summary['failed'],\
+                'orders': summary['orders'],\
+                'fill_ratio': summary['fill_ratio'],\
+                'scans': summary['scans'],\
+                'seconds': time.time() - started})
+    return(row)
+
+
+def init_worker():
+    # pair_arbitrage logs every scan
+    trading_logger.setLevel(logging.ERROR)
+
+
+def run_sweep(strategy, grid, processes=None):
+    """ Results table of strategy with every combination of grid, sorted by
+    decreasing PnL, replayed in a pool of processes
+    """
+    strategies = [dict(strategy, **values) for values in expand_grid(grid)]
+    context = multiprocessing.get_context('fork') # workers share history
+    with context.Pool(processes, initializer=init_worker) as pool:
+        rows = pool.map(run_strategy, strategies, chunksize=1)
+    results = pd.DataFrame([row for row in rows if row is not None])
+    if len(results):
+        results = results.sort_values('pnl_BTC', ascending=False)
+    return(results)
+
+
+if __name__ == '__main__':
+    # python ./CryptoGoats/sweep.py strategy1 sweep1
+    # e.g. python ./CryptoGoats/sweep.py example example
+    # the sweep file sets the recorded books to replay and the grid:
+    # {"store": "./CryptoGoats/Data", "depth": 20,
+    #  "exchanges": ["bittrex", "binance"], "pairs": ["ETH/BTC"],
+    #  "start": "2018-01-01", "end": "2018-02-01",
+    #  "balances": {"bittrex": {"BTC": 1, "ETH": 10}, ...},
+    #  "grid": {"minSpread": [1, 1.5, 2], "max_arb_amount_BTC": [.01, .07]},
+    #  "processes": null, "output": "sweep1.csv"}
+    logging.basicConfig(level=logging.INFO,\
+                        format='%(asctime)-2s: %(name)-2s %(levelname)-12s %(message)s')
+    strategy_filepath = './CryptoGoats/Config/Strategies/' + sys.argv[1] + '.json'
+    sweep_filepath = './CryptoGoats/Config/Sweeps/' + sys.argv[2] + '.json'
+    with open(strategy_filepath) as f:
+        strategy = json.load(f)
+    with open(sweep_filepath) as f:
+        sweep.update(json.load(f))
+
+    store = TickStore(sweep['store'], depth=sweep.get('depth', 20))
+    history.update(store_history(store, sweep['exchanges'], sweep['pairs'],\
+                                 epoch(sweep.get('start')), epoch(sweep.get('end'))))
+    logger.info("Replaying %d books of %d exchange pairs, %d combinations",\
+                sum(len(records) for records in history.values()), len(history),\
+                len(expand_grid(sweep['grid'])))
+
+    started = time.time()
+    results = run_sweep(strategy, sweep['grid'], sweep.get('processes'))
+    logger.info("Sweep done in %.1f s", time.time() - started)
+    pd.set_option('display.width', 200)
+    print(results.to_string(index=False))
+    if sweep.get('output'):
+        results.to_csv(sweep['output'], index=False)
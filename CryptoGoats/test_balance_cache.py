@@ -0,0 +1,117 @@
+import asyncio
+import pytest
+try:
+    from CryptoGoats.balance_cache import BalanceCache, order_changes, adjust
+except ImportError:
+    from balance_cache import BalanceCache, order_changes, adjust
+
+################################################################################
+# Helpers
+################################################################################
+
+def run(coroutine):
+    """ Run coroutine to completion on a new event loop
+    """
+    loop = asyncio.new_event_loop()
+    try:
+        return(loop.run_until_complete(coroutine))
+    finally:
+        loop.close()
+
+
+class BalanceExchange:
+    """ Exchange answering fetch_balance after delay seconds with balance
+    as it was when the request was sent
+    """
+
+    def __init__(self, balance, delay=0, taker=.0025):
+        self.id = 'bittrex'
+        self.balance = balance
+        self.delay = delay
+        self.markets = {'ETH/BTC': {'taker': taker}}
+        self.fetches = 0
+
+    async def fetch_balance(self, params={}):
+        self.fetches += 1
+        balance = {currency: {'free': total, 'used': 0., 'total': total}\
+                   for currency, total in self.balance.items()}
+        await asyncio.sleep(self.delay)
+        return(balance)
+
+################################################################################
+# Balance changes
+################################################################################
+
+def test_order_changes():
+    exchange = BalanceExchange(dict())
+    sell = order_changes(exchange, 'ETH/BTC', 'sell', 2., .1)
+    assert sell == {'ETH': -2., 'BTC': pytest.approx(.2 * .9975)}
+    buy = order_changes(exchange, 'ETH/BTC', 'buy', 2., .1)
+    assert buy == {'ETH': pytest.approx(2 * .9975), 'BTC': -.2}
+    # no fee for a market the exchange doesn't list
+    assert order_changes(exchange, 'XRP/BTC', 'sell', 1., .1)['BTC'] == .1
+
+
+def test_adjust():
+    balance = {'ETH': {'free': 1., 'used': 1., 'total': 2.},\
+               'free': {'ETH': 1.}, 'total': {'ETH': 2.}}
+    adjust(balance, 'ETH', -.5)
+    adjust(balance, 'BTC', .1)
+    assert balance['ETH'] == {'free': .5, 'used': 1., 'total': 1.5}
+    assert balance['free'] == {'ETH': .5, 'BTC': .1}
+    assert balance['BTC']['total'] == .1
+
+################################################################################
+# Balance cache
+################################################################################
+
+def test_fetches_shared_and_cached():
+    exchange = BalanceExchange({'ETH': 1.}, delay=.01)
+    cache = BalanceCache(ttl=60)
+
+    async def fetch():
+        balances = await asyncio.gather(*[cache.fetch_balance(exchange)\
+                                          for _ in range(3)])
+        balances[0]['ETH']['free'] = 0. # copies
+        return(await cache.fetch_balance(exchange))
+    assert run(fetch())['ETH']['free'] == 1.
+    assert exchange.fetches == 1
+    cache.invalidate()
+    assert run(cache.fetch_balance(exchange))['ETH']['free'] == 1.
+    assert exchange.fetches == 2
+
+
+def test_order_placed_adjusts_balance():
+    exchange = BalanceExchange({'ETH': 10., 'BTC': 1.}, delay=.01)
+    cache = BalanceCache(ttl=60)
+
+    async def trade():
+        await cache.fetch_balance(exchange)
+        # fetch sent before the order, answers the balance before it
+        stale = cache.refresh(exchange)
+        await asyncio.sleep(0)
+        cache.order_placed(exchange, 'ETH/BTC', 'sell', 2., .1)
+        adjusted = await cache.fetch_balance(exchange)
+        await stale
+        after = await cache.fetch_balance(exchange)
+        # which is refreshed by a new fetch instead
+        await cache.refresh(exchange)
+        return(adjusted, after)
+    adjusted, after = run(trade())
+    assert adjusted['ETH']['free'] == 8.
+    assert adjusted['BTC']['free'] == pytest.approx(1 + .2 * .9975)
+    # the stale fetch didn't overwrite the adjusted balance
+    assert after['ETH']['free'] == 8.
+    assert exchange.fetches == 3
+
+
+def test_order_placed_uncached():
+    exchange = BalanceExchange({'ETH': 10.})
+    cache = BalanceCache()
+
+    async def trade():
+        cache.order_placed(exchange, 'ETH/BTC', 'buy', 1., .1)
+        await cache.refresh(exchange)
+    run(trade())
+    assert exchange.fetches == 1
+    assert cache.balances['bittrex'][1]['ETH']['free'] == 10.
@@ -0,0 +1,73 @@
+import numpy as np
+import pytest
+try:
+    from CryptoGoats.book_codec import encode_levels, decode_levels,\
+        encoding_kind, diff_levels, apply_levels, BookEncoder, BookDecoder,\
+        FULL, DELTA
+except ImportError:
+    from book_codec import encode_levels, decode_levels, encoding_kind,\
+        diff_levels, apply_levels, BookEncoder, BookDecoder, FULL, DELTA
+
+################################################################################
+# Binary order book levels
+################################################################################
+
+bids = [[0.0100, 2.], [0.0099, 3.], [0.0098, 5.]]
+
+
+def columns(levels):
+    return(np.array([level[0] for level in levels]),\
+           np.array([level[1] for level in levels]))
+
+
+def assert_levels(actual, expected):
+    np.testing.assert_array_equal(actual[0], expected[0])
+    np.testing.assert_array_equal(actual[1], expected[1])
+
+
+def test_round_trip():
+    data = encode_levels(bids)
+    assert len(data) == 8 + 2 * 8 * 3
+    assert encoding_kind(data) == FULL
+    assert_levels(decode_levels(data), columns(bids))
+    assert_levels(decode_levels(encode_levels(bids, depth=2)), columns(bids[:2]))
+    assert_levels(decode_levels(encode_levels([])), (np.zeros(0), np.zeros(0)))
+    # a bytea column comes back as a memoryview
+    assert_levels(decode_levels(memoryview(data)), columns(bids))
+
+
+def test_unknown_version():
+    with pytest.raises(ValueError):
+        decode_levels(b'\x09' + encode_levels(bids)[1:])
+
+################################################################################
+# Deltas
+################################################################################
+
+def test_diff_and_apply():
+    previous = columns(bids)
+    levels = columns([[0.0101, 1.], [0.0100, 2.], [0.0098, 4.]])
+    delta = diff_levels(previous, levels)
+    # new level, changed amount and removed level (amount 0)
+    assert sorted(zip(*delta)) == [(0.0098, 4.), (0.0099, 0.), (0.0101, 1.)]
+    assert_levels(apply_levels(previous, delta, descending=True), levels)
+
+
+def test_encoder_keyframes():
+    encoder = BookEncoder(depth=3, delta=True, keyframe=3)
+    decoder = BookDecoder()
+    books = [bids, [[0.0100, 1.]] + bids[1:], bids, bids[:2], bids]
+    kinds = []
+    for book in books:
+        data = encoder.encode('bids', book)
+        kinds.append(encoding_kind(data))
+        assert_levels(decoder.decode('bids', data, descending=True),\
+                      columns(book))
+    assert kinds == [FULL, DELTA, DELTA, FULL, DELTA]
+    encoder.reset()
+    assert encoding_kind(encoder.encode('bids', bids)) == FULL
+    # a delta can't be read without the full snapshot before it
+    delta = encoder.encode('bids', bids[:2])
+    assert encoding_kind(delta) == DELTA
+    with pytest.raises(KeyError):
+        BookDecoder().decode('bids', delta)
@@ -0,0 +1,62 @@
+import numpy as np
+import pytest
+from ccxt.base.order_book import OrderBookSide
+try:
+    from CryptoGoats.depth import book_columns, cumulative_cost,\
+        executable_amount
+except ImportError:
+    from depth import book_columns, cumulative_cost, executable_amount
+
+################################################################################
+# Order book depth
+################################################################################
+
+bids = [[1.10, 1.], [1.00, 2.]]
+asks = [[1.00, 1.], [1.06, 2.]]
+
+
+def net_spread(sell_vwap, buy_vwap, sell_fee=0, buy_fee=0):
+    return(100 * (sell_vwap * (1 - sell_fee) - buy_vwap * (1 + buy_fee))\
+           / sell_vwap)
+
+
+def test_book_columns():
+    prices, amounts = book_columns(bids)
+    np.testing.assert_array_equal(prices, [1.10, 1.00])
+    np.testing.assert_array_equal(amounts, [1., 2.])
+    prices, amounts = book_columns(OrderBookSide(bids))
+    np.testing.assert_array_equal(prices, [1.10, 1.00])
+    assert [len(column) for column in book_columns([])] == [0, 0]
+
+
+def test_cumulative_cost():
+    amounts, costs = cumulative_cost(asks)
+    np.testing.assert_allclose(amounts, [0., 1., 3.])
+    np.testing.assert_allclose(costs, [0., 1.00, 1.00 + 2 * 1.06])
+
+
+def test_executable_amount_interpolates_last_segment():
+    amount, sell_vwap, buy_vwap = executable_amount(bids, asks, 0)
+    # margin .10 - .06 (q - 1) over the second levels
+    assert amount == pytest.approx(1 + .10 / .06)
+    assert net_spread(sell_vwap, buy_vwap) == pytest.approx(0, abs=1e-9)
+
+    amount, sell_vwap, buy_vwap = executable_amount(bids, asks, 2, .001, .002)
+    assert 1 < amount < 1 + .10 / .06
+    assert net_spread(sell_vwap, buy_vwap, .001, .002) == pytest.approx(2)
+
+
+def test_executable_amount_limits():
+    # whole books clear the spread: capped by the thinner book or max_amount
+    assert executable_amount(bids, [[.5, 1.], [.6, 1.]], 0)[0] == 2.
+    amount, sell_vwap, buy_vwap = executable_amount(bids, asks, 0,\
+                                                    max_amount=.5)
+    assert (amount, sell_vwap, buy_vwap) == (.5, 1.10, 1.00)
+    assert executable_amount(OrderBookSide(bids), OrderBookSide(asks), 0)[0]\
+        == pytest.approx(executable_amount(bids, asks, 0)[0])
+
+
+def test_executable_amount_none():
+    # the top of the books doesn't clear 10%
+    assert executable_amount(bids, asks, 10) == (0., None, None)
+    assert executable_amount([], asks, 0) == (0., None, None)
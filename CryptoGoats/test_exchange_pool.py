@@ -0,0 +1,99 @@
+import asyncio
+import types
+import pytest
+try:
+    from CryptoGoats import exchange_pool
+    from CryptoGoats.exchange_pool import ExchangePool
+except ImportError:
+    import exchange_pool
+    from exchange_pool import ExchangePool
+
+################################################################################
+# Helpers
+################################################################################
+
+def run(coroutine):
+    """ Run coroutine to completion on a new event loop
+    """
+    loop = asyncio.new_event_loop()
+    try:
+        return(loop.run_until_complete(coroutine))
+    finally:
+        loop.close()
+
+
+class PoolExchange:
+    """ Exchange loading its markets in delay seconds, raising error
+    instead if set
+    """
+    built = list()
+
+    def __init__(self, config={}):
+        self.id = config.get('id', 'bittrex')
+        self.config = config
+        self.delay = config.get('delay', .01)
+        self.error = config.get('error')
+        self.markets = None
+        self.loads = 0
+        self.closed = False
+        PoolExchange.built.append(self)
+
+    async def load_markets(self, reload=False):
+        self.loads += 1
+        await asyncio.sleep(self.delay)
+        if self.error is not None:
+            raise self.error
+        self.markets = {'ETH/BTC': {'symbol': 'ETH/BTC'}}
+        return(self.markets)
+
+    async def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    PoolExchange.built = list()
+    monkeypatch.setattr(exchange_pool, 'ccxt',\
+                        types.SimpleNamespace(bittrex=PoolExchange,\
+                                              binance=PoolExchange,\
+                                              cex=PoolExchange))
+    return(ExchangePool({'binance': {'id': 'binance'},\
+                         'cex': {'id': 'cex', 'error': ValueError('down')}}))
+
+################################################################################
+# Tests
+################################################################################
+
+def test_get_builds_once(pool):
+    bittrex = pool.get('bittrex')
+    assert pool.get('bittrex') is bittrex
+    assert pool['bittrex'] is bittrex
+    assert 'bittrex' in pool and 'binance' not in pool
+    assert pool.get('binance').config == {'id': 'binance'}
+    assert len(PoolExchange.built) == 2
+
+
+def test_load_all_shares_loads(pool):
+
+    async def load():
+        return(await asyncio.gather(pool.load_all(['bittrex', 'binance', 'cex']),\
+                                    pool.load_all(['bittrex', 'binance']),\
+                                    pool.load('bittrex')))
+    (loaded, failed), (others, none), bittrex = run(load())
+    assert sorted(loaded) == ['binance', 'bittrex'] and failed == ['cex']
+    assert others == loaded and none == []
+    assert bittrex is loaded['bittrex']
+    assert [exchange.loads for exchange in PoolExchange.built] == [1, 1, 1]
+    # loaded markets are kept, a failed load is tried again
+    loaded, failed = run(pool.load_all(['bittrex', 'cex']))
+    assert loaded['bittrex'].loads == 1 and pool['cex'].loads == 2
+    run(pool.load('bittrex', reload=True))
+    assert pool['bittrex'].loads == 2
+
+
+def test_close(pool):
+    exchanges = [pool.get(id) for id in ('bittrex', 'binance', 'cex')]
+    run(pool.close())
+    assert all(exchange.closed for exchange in exchanges)
+    assert 'bittrex' not in pool
+    assert pool.get('bittrex') is not exchanges[0]
@@ -0,0 +1,142 @@
+import asyncio
+import datetime
+try:
+    from CryptoGoats.psql_helpers import copy_timestamp, format_levels,\
+        copy_bytea, BookRecorder
+    from CryptoGoats.book_codec import BookDecoder, encoding_kind, FULL, DELTA
+except ImportError:
+    from psql_helpers import copy_timestamp, format_levels, copy_bytea,\
+        BookRecorder
+    from book_codec import BookDecoder, encoding_kind, FULL, DELTA
+
+################################################################################
+# COPY values
+################################################################################
+
+def test_copy_timestamp_is_utc():
+    assert copy_timestamp(1517000000123) == '2018-01-26T20:53:20.123000+00'
+    value = datetime.datetime.strptime(copy_timestamp(0)[:-3] + '+0000',\
+                                       '%Y-%m-%dT%H:%M:%S%z')
+    assert value.timestamp() == 0
+
+
+def test_format_levels():
+    levels = [[0.1, 2.0], [0.11, 3.5], [0.12, 1.0]]
+    assert format_levels(levels, 2) == '2.0@0.1;3.5@0.11'
+    assert format_levels([], 2) == ''
+
+
+def test_copy_bytea():
+    assert copy_bytea(b'\x01\xff') == '\\\\x01ff'
+
+################################################################################
+# Order book recorder
+################################################################################
+
+class Connection:
+    """ psycopg2 connection keeping the COPY data of committed batches,
+    failing COPY while fail is set
+    """
+
+    def __init__(self):
+        self.fail = False
+        self.batches = []
+        self.pending = None
+
+    def cursor(self):
+        return(Cursor(self))
+
+    def commit(self):
+        self.batches.append(self.pending)
+
+    def rollback(self):
+        self.pending = None
+
+
+class Cursor:
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def copy_expert(self, sql, data):
+        if self.conn.fail:
+            raise IOError("connection lost")
+        self.conn.pending = [line.split('\t') for line in data.read().splitlines()]
+
+    def close(self):
+        pass
+
+
+def book(bid):
+    return({'bids': [[bid, 1.], [bid - .001, 2.]], 'asks': [[bid + .001, 1.]],\
+            'timestamp': 1517000000000})
+
+
+def record(recorder, *books):
+    """ Queued rows of books recorded for bittrex ETH/BTC
+    """
+    loop = asyncio.new_event_loop()
+    try:
+        for orderbook in books:
+            loop.run_until_complete(recorder.record('bittrex', 'ETH/BTC', orderbook))
+    finally:
+        loop.close()
+    rows = []
+    while not recorder.queue.empty():
+        rows.append(recorder.queue.get_nowait())
+    return(rows)
+
+
+def test_recorder_text_rows():
+    conn = Connection()
+    recorder = BookRecorder(conn, depth=1)
+    recorder.copy(record(recorder, book(.1), book(.2)))
+    assert recorder.recorded == 2
+    [row, _] = conn.batches[0]
+    assert row[1:4] == ['bittrex', 'ETH', 'BTC']
+    assert row[4] == '2018-01-26T20:53:20+00'
+    assert row[5:] == ['1.0@0.1', '1.0@0.101', '10000']
+
+
+def test_recorder_run_flushes_on_cancel():
+    conn = Connection()
+    recorder = BookRecorder(conn, batch_size=2, flush_interval=10)
+    loop = asyncio.new_event_loop()
+
+    async def run():
+        writer = asyncio.ensure_future(recorder.run())
+        for bid in (.1, .2, .3):
+            await recorder.record('bittrex', 'ETH/BTC', book(bid))
+        await asyncio.sleep(0.1)
+        writer.cancel()
+        try:
+            await writer
+        except asyncio.CancelledError:
+            pass
+    try:
+        loop.run_until_complete(run())
+    finally:
+        loop.close()
+    assert [len(batch) for batch in conn.batches] == [2, 1]
+    assert recorder.recorded == 3
+
+
+def test_recorder_keyframe_after_failed_batch():
+    conn = Connection()
+    recorder = BookRecorder(conn, binary=True, delta=True, keyframe=100)
+    recorder.copy(record(recorder, book(.1), book(.2)))
+    conn.fail = True
+    recorder.copy(record(recorder, book(.3)))
+    conn.fail = False
+    recorder.copy(record(recorder, book(.4), book(.5)))
+    assert (recorder.recorded, recorder.failed) == (4, 1)
+
+    decoder = BookDecoder()
+    kinds = []
+    for row in [row for batch in conn.batches for row in batch]:
+        data = bytes.fromhex(row[5][3:])
+        kinds.append(encoding_kind(data))
+        decoder.decode('bids', data, descending=True)
+    # the book after the lost one is full again, its successor a delta
+    assert kinds == [FULL, DELTA, FULL, DELTA]
+    assert list(decoder.previous['bids'][0]) == [.5, .499]
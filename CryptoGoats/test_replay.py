@@ -0,0 +1,113 @@
+import asyncio
+import time
+import numpy as np
+import pytest
+try:
+    from CryptoGoats.replay import VirtualEventLoop, Replay, backtest
+    from CryptoGoats.tick_store import book_dtype
+    from CryptoGoats.trading_functions import exchange_pool
+except ImportError:
+    from replay import VirtualEventLoop, Replay, backtest
+    from tick_store import book_dtype
+    from trading_functions import exchange_pool
+
+################################################################################
+# Helpers
+################################################################################
+
+START = 1517011200.
+
+
+def records(mids, depth=2):
+    """ One book per second around mids, depth levels .1% apart
+    """
+    books = np.zeros(len(mids), dtype=book_dtype(depth))
+    books['timestamp'] = START + np.arange(len(mids))
+    books['exchange_timestamp'] = np.nan
+    for k in range(depth):
+        books['bid_price'][:, k] = np.array(mids) * (1 - .001 * (k + 1))
+        books['ask_price'][:, k] = np.array(mids) * (1 + .001 * (k + 1))
+        books['bid_amount'][:, k] = 5.
+        books['ask_amount'][:, k] = 5.
+    return(books)
+
+
+history = {('bittrex', 'ETH/BTC'): records([.1, .1, .11, .1]),\
+           ('binance', 'ETH/BTC'): records([.1, .1, .1, .1])}
+balances = {'bittrex': {'ETH': 10., 'BTC': 1.},\
+            'binance': {'ETH': 10., 'BTC': 1.}}
+
+################################################################################
+# Virtual time
+################################################################################
+
+def test_virtual_event_loop():
+    loop = VirtualEventLoop()
+
+    async def wait():
+        started = loop.time()
+        await asyncio.sleep(60)
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(asyncio.sleep(10), 5)
+        return(loop.time() - started)
+    try:
+        started = time.time()
+        assert loop.run_until_complete(wait()) == pytest.approx(65)
+        assert time.time() - started < 1
+    finally:
+        loop.close()
+
+################################################################################
+# Simulated exchange
+################################################################################
+
+def test_simulated_orders():
+    replay = Replay(history, balances)
+    replay.now = START + 2
+    bittrex = replay.exchanges['bittrex']
+    loop = asyncio.new_event_loop()
+    try:
+        book = loop.run_until_complete(bittrex.fetch_order_book('ETH/BTC'))
+        assert book['bids'][0] == [pytest.approx(.10989), 5.]
+        # a sell limited to the first level fills 5 of 6
+        order = loop.run_until_complete(\
+            bittrex.create_limit_sell_order('ETH/BTC', 6., .1098))
+    finally:
+        loop.close()
+    assert (order['filled'], order['status']) == (5., 'canceled')
+    assert bittrex.balance['ETH'] == 5.
+    assert bittrex.balance['BTC'] == pytest.approx(1 + 5 * .10989 * .9975)
+    replay.now = START + 100 # books older than max_age are missing
+    with pytest.raises(Exception):
+        bittrex.levels('ETH/BTC')
+
+################################################################################
+# Backtest
+################################################################################
+
+def test_backtest():
+    exchanges = dict(exchange_pool.exchanges)
+    summary = backtest(history, balances, {'arbitrage': True, 'minSpread': 1,\
+                                           'min_arb_amount_BTC': .004,\
+                                           'max_arb_amount_BTC': .07})
+    # the usd exchange is passed to pair_arbitrage, not put in the pool
+    assert exchange_pool.exchanges == exchanges
+    assert summary['scans'] == 4
+    assert summary['arbitrages'] == 1
+    assert summary['orders'] == 2
+    assert summary['fill_ratio'] == 1.
+    assert summary['gain_BTC'] > 0
+    assert summary['final']['ETH'] == pytest.approx(20.)
+    with pytest.raises(ValueError):
+        backtest(history, balances, {}, start=START + 10)
+
+
+def test_backtest_without_event_loop():
+    previous_loop = asyncio.get_event_loop()
+    asyncio.set_event_loop(None)
+    try:
+        summary = backtest(history, balances, {'arbitrage': False})
+    finally:
+        asyncio.set_event_loop(previous_loop)
+    assert summary['scans'] == 4
+    assert summary['orders'] == 0
@@ -0,0 +1,141 @@
+import asyncio
+import pytest
+import ccxt.async as ccxt
+try:
+    from CryptoGoats.settlement import SettlementMonitor, placed_order
+except ImportError:
+    from settlement import SettlementMonitor, placed_order
+
+################################################################################
+# Helpers
+################################################################################
+
+def run(coroutine):
+    """ Run coroutine to completion on a new event loop
+    """
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    try:
+        return(loop.run_until_complete(coroutine))
+    finally:
+        asyncio.set_event_loop(None)
+        loop.close()
+
+
+class OrderExchange:
+    """ Exchange whose orders fill after polls fetches, reported with the
+    order id and status only as most exchanges do
+    fetch_order raises NotSupported unless has_fetch_order
+    """
+
+    def __init__(self, id, polls=1, has_fetch_order=True):
+        self.id = id
+        self.polls = polls
+        self.has_fetch_order = has_fetch_order
+        self.markets = {'ETH/BTC': {'taker': 0.}}
+        self.fetches = 0
+
+    def create_order(self, id):
+        return({'info': {'uuid': id}, 'id': id})
+
+    async def fetch_order(self, id, symbol=None, params={}):
+        if not self.has_fetch_order:
+            raise ccxt.NotSupported("fetch_order")
+        self.fetches += 1
+        status = 'closed' if self.fetches >= self.polls else 'open'
+        return({'info': {}, 'id': id, 'symbol': symbol, 'status': status,\
+                'price': None, 'amount': None, 'average': None,\
+                'filled': None})
+
+    async def fetch_open_orders(self, symbol=None, since=None, limit=None,\
+                                params={}):
+        self.fetches += 1
+        if self.fetches >= self.polls:
+            return([])
+        return([{'id': '1', 'status': 'open'}])
+
+
+def exchanges(**kwargs):
+    return({id: OrderExchange(id, **kwargs) for id in ('bittrex', 'binance')})
+
+################################################################################
+# Settlement
+################################################################################
+
+def test_placed_order():
+    assert placed_order(None, 'ETH/BTC', 'sell', 1., .1) is None
+    order = placed_order({'info': {}, 'id': '1', 'price': None},\
+                         'ETH/BTC', 'sell', 1., .1)
+    assert order == {'info': {}, 'id': '1', 'symbol': 'ETH/BTC', 'side': 'sell',\
+                     'amount': 1., 'price': .1}
+
+
+def test_track_real_order_answers():
+    trades = []
+    monitor = SettlementMonitor(delay=.001, on_settled=trades.append)
+    pool = exchanges(polls=2)
+
+    async def track():
+        monitor.track(pool, 'ETH/BTC',\
+                      ('bittrex', pool['bittrex'].create_order('1'), .11),\
+                      ('binance', pool['binance'].create_order('1'), .10),\
+                      2., rate=1, usd=10000.)
+        await monitor.close()
+    run(track())
+    trade, = trades
+    assert trade['success'] == 1
+    assert [leg['status'] for leg in trade['legs']] == ['closed', 'closed']
+    # filled at the limit prices they were placed with
+    assert trade['base_diff'] == 0
+    assert trade['quote_diff'] == pytest.approx(2 * (.11 - .10))
+    assert trade['gain_USD'] == pytest.approx(10000 * .02)
+    assert monitor.failed == 0
+
+
+def test_track_without_fetch_order():
+    monitor = SettlementMonitor(delay=.001)
+    pool = exchanges(polls=2, has_fetch_order=False)
+
+    async def track():
+        return(await monitor.track(pool, 'ETH/BTC',\
+                                   ('bittrex', {'id': '1'}, .11),\
+                                   ('binance', {'id': '2'}, .10), 2.))
+    trade = run(track())
+    assert trade['success'] == 1
+    assert trade['legs'][1]['filled'] == 2.
+
+
+def test_unsettled_and_failed_trades():
+    monitor = SettlementMonitor(delay=.001, max_delay=.001, timeout=.05)
+    pool = exchanges(polls=1000)
+
+    async def track():
+        # never settles
+        unsettled = await monitor.track(pool, 'ETH/BTC',\
+                                        ('bittrex', {'id': '1'}, .11),\
+                                        ('binance', None, .10), 2.)
+        # the sell exchange is unknown: the trade still counts as failed
+        failed = await monitor.track(pool, 'ETH/BTC',\
+                                     ('gdax', {'id': '1'}, .11),\
+                                     ('binance', {'id': '2'}, .10), 2.)
+        return(unsettled, failed)
+    unsettled, failed = run(track())
+    assert unsettled['success'] == -1
+    assert unsettled['legs'][1] is None
+    assert failed['success'] == -1
+    assert failed['gain_BTC'] is None
+    assert monitor.failed == 2
+    assert len(monitor.trades) == 2
+
+
+def test_close_cancels_pending():
+    monitor = SettlementMonitor(delay=.01, timeout=60)
+    pool = exchanges(polls=1000)
+
+    async def track():
+        task = monitor.track(pool, 'ETH/BTC', ('bittrex', {'id': '1'}, .11),\
+                             ('binance', {'id': '2'}, .10), 2.)
+        await monitor.close(timeout=.05)
+        return(task)
+    assert run(track()).cancelled()
+    assert monitor.trades == []
@@ -0,0 +1,69 @@
+import asyncio
+import time
+try:
+    from CryptoGoats.sharding import shard_pairs, SharedRateLimit, run_shards
+except ImportError:
+    from sharding import shard_pairs, SharedRateLimit, run_shards
+
+################################################################################
+# Shards
+################################################################################
+
+def test_shard_pairs_balances_book_requests():
+    exchangesBySymbol = {'ETH/BTC': ['bittrex', 'binance', 'cex'],\
+                         'XRP/BTC': ['bittrex', 'binance'],\
+                         'LTC/BTC': ['bittrex', 'binance'],\
+                         'NEO/BTC': ['binance', 'cex'],\
+                         'DASH/BTC': ['bittrex', 'cex', 'gdax']}
+    shards = shard_pairs(list(exchangesBySymbol), exchangesBySymbol, 2)
+    assert sorted(pair for shard in shards for pair in shard) ==\
+        sorted(exchangesBySymbol)
+    loads = [sum(len(exchangesBySymbol[pair]) for pair in shard)\
+             for shard in shards]
+    assert sorted(loads) == [5, 7]
+    assert all(shard == sorted(shard) for shard in shards)
+    assert shard_pairs(['ETH/BTC'], exchangesBySymbol, 3) ==\
+        [['ETH/BTC'], [], []]
+
+################################################################################
+# Global rate limits
+################################################################################
+
+def test_shared_rate_limit_spaces_requests():
+    limit = SharedRateLimit(0.1) # a unit of cost every 10 ms
+    loop = asyncio.new_event_loop()
+
+    async def requests():
+        started = time.time()
+        await limit()
+        await limit(3)
+        await limit()
+        return(time.time() - started)
+    try:
+        # 1 then 3 units of cost go first, the last waits 40 ms
+        assert 0.035 < loop.run_until_complete(requests()) < 0.2
+    finally:
+        loop.close()
+
+################################################################################
+# Coordinator
+################################################################################
+
+def report_cycles(shard, pairs, results):
+    """ Worker reporting two cycles with one opportunity per pair
+    """
+    for cycle in range(2):
+        results.put((shard, cycle, [(pair, shard, 10. * shard + cycle)\
+                                    for pair in pairs]))
+    results.put((shard, None, None))
+
+
+def test_run_shards_merges_cycles():
+    reported = []
+    run_shards([['ETH/BTC'], ['XRP/BTC', 'LTC/BTC']], report_cycles,\
+               on_cycle=lambda cycle, opportunities:\
+               reported.append((cycle, opportunities)), poll=.1)
+    assert [cycle for cycle, _ in reported] == [0, 1]
+    cycle, opportunities = reported[1]
+    assert [opportunity[0] for opportunity in opportunities] ==\
+        ['XRP/BTC', 'LTC/BTC', 'ETH/BTC'] # decreasing spread, last item
@@ -0,0 +1,115 @@
+import math
+import numpy as np
+import pytest
+try:
+    from CryptoGoats.spread_table import SpreadTable, rank_spreads
+except ImportError:
+    from spread_table import SpreadTable, rank_spreads
+
+################################################################################
+# Helpers
+################################################################################
+
+def book_row(exchange, pair, high_bid, low_ask, high_bid_size=1.,\
+             low_ask_size=1.):
+    """ Row of the prices dataframe layout (see order_book_row)
+    """
+    return([0., exchange, pair, None, None, high_bid, high_bid_size,\
+            None, low_ask, low_ask_size, 1000])
+
+
+def table(*rows):
+    prices = SpreadTable()
+    for row in rows:
+        prices.update(book_row(*row))
+    return(prices)
+
+################################################################################
+# Spread table
+################################################################################
+
+def test_update_replaces_row():
+    prices = table(('bittrex', 'ETH/BTC', .10, .11),\
+                   ('binance', 'ETH/BTC', .12, .13),\
+                   ('bittrex', 'ETH/BTC', .09, .095))
+    assert len(prices) == 2
+    assert prices.get('ETH/BTC', 'bittrex')[SpreadTable.HIGH_BID] == .09
+    assert prices.get('ETH/BTC', 'cex') is None
+    assert prices.get('XRP/BTC', 'bittrex') is None
+
+
+def test_best_bid_ask():
+    prices = table(('bittrex', 'ETH/BTC', .10, .11, 2., 3.),\
+                   ('binance', 'ETH/BTC', .12, .13, 4., 5.),\
+                   ('cex', 'ETH/BTC', .09, .095, 6., 7.))
+    assert prices.best_bid('ETH/BTC') == ('binance', .12, 4.)
+    assert prices.best_ask('ETH/BTC') == ('cex', .095, 7.)
+    assert prices.best_bid('ETH/BTC', ['bittrex', 'cex']) == ('bittrex', .10, 2.)
+    assert prices.best_ask('XRP/BTC') is None
+
+
+def test_get_spread():
+    prices = table(('bittrex', 'ETH/BTC', .10, .11),\
+                   ('binance', 'ETH/BTC', .12, .13))
+    bb_exchange, best_bid, _, ba_exchange, best_ask, _, spread =\
+        prices.get_spread('ETH/BTC', ['bittrex', 'binance'], ['bittrex'])
+    assert (bb_exchange, ba_exchange) == ('binance', 'bittrex')
+    assert spread == pytest.approx(100 * (.12 - .11) / .12)
+    with pytest.raises(ValueError):
+        prices.get_spread('ETH/BTC', ['bittrex'], ['cex'])
+
+
+def test_to_frame():
+    frame = table(('bittrex', 'ETH/BTC', .10, .11),\
+                  ('binance', 'XRP/BTC', .001, .0011)).to_frame()
+    assert list(frame.columns) == SpreadTable.columns
+    assert sorted(frame['pair']) == ['ETH/BTC', 'XRP/BTC']
+    assert math.isclose(frame.loc[frame['exchange'] == 'bittrex',\
+                                  'low_ask'].iloc[0], .11)
+
+
+def test_top_of_book():
+    prices = table(('bittrex', 'ETH/BTC', .10, .11, 2., 3.),\
+                   ('binance', 'XRP/BTC', .001, .0011, 4., 5.),\
+                   ('cex', 'LTC/BTC', .02, .021, 6., 7.),\
+                   ('bittrex', 'ETH/BTC', .105, .11, 2.5, 3.))
+    bids, bid_sizes, asks, ask_sizes =\
+        prices.top_of_book(['ETH/BTC', 'DOGE/BTC', 'XRP/BTC'],\
+                           ['binance', 'bittrex', 'gdax'])
+    np.testing.assert_array_equal(bids, [[np.nan, .105, np.nan],\
+                                         [np.nan, np.nan, np.nan],\
+                                         [.001, np.nan, np.nan]])
+    assert bid_sizes[0, 1] == 2.5
+    assert asks[2, 0] == .0011
+    assert ask_sizes[2, 0] == 5.
+    assert np.isnan(SpreadTable().top_of_book(['ETH/BTC'], ['bittrex'])[0]).all()
+
+################################################################################
+# Spread matrix
+################################################################################
+
+def test_rank_spreads():
+    prices = table(('bittrex', 'ETH/BTC', .100, .101),\
+                   ('binance', 'ETH/BTC', .110, .111),\
+                   ('bittrex', 'XRP/BTC', .0010, .0011),\
+                   ('binance', 'XRP/BTC', .0012, .0013),\
+                   ('bittrex', 'LTC/BTC', .020, .021))
+    ids = ['binance', 'bittrex']
+    opportunities = rank_spreads(prices, ['ETH/BTC', 'XRP/BTC', 'LTC/BTC'],\
+                                 ids, ids, ids)
+    # LTC/BTC is listed at one exchange: no cross exchange spread
+    assert [o[0] for o in opportunities] == ['XRP/BTC', 'ETH/BTC']
+    pair, bb_exchange, best_bid, _, ba_exchange, best_ask, _, spread =\
+        opportunities[0]
+    assert (bb_exchange, best_bid, ba_exchange, best_ask) ==\
+        ('binance', .0012, 'bittrex', .0011)
+    assert spread == pytest.approx(100 * (.0012 - .0011) / .0012)
+
+    fees = np.full((2, 2), .0025)
+    net = rank_spreads(prices, ['ETH/BTC', 'XRP/BTC'], ids, ids, ids, fees=fees)
+    assert net[1][7] == pytest.approx(100 * (.110 * .9975 - .101 * 1.0025) / .110)
+    assert rank_spreads(prices, ['ETH/BTC', 'XRP/BTC'], ids, ids, ids,\
+                        minSpread=8.25) == [opportunities[0]]
+    # selling at binance only leaves no opportunity buying there
+    assert rank_spreads(prices, ['ETH/BTC'], ids, ['bittrex'], ['binance'],\
+                        minSpread=0) == []
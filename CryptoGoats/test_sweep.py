@@ -0,0 +1,92 @@
+import os
+import json
+import numpy as np
+import pytest
+try:
+    from CryptoGoats import sweep
+    from CryptoGoats.tick_store import book_dtype
+except ImportError:
+    import sweep
+    from tick_store import book_dtype
+
+################################################################################
+# Helpers
+################################################################################
+
+START = 1517011200.
+
+
+def records(mids, depth=2):
+    """ One book per second around mids, depth levels .1% apart
+    """
+    books = np.zeros(len(mids), dtype=book_dtype(depth))
+    books['timestamp'] = START + np.arange(len(mids))
+    books['exchange_timestamp'] = np.nan
+    for k in range(depth):
+        books['bid_price'][:, k] = np.array(mids) * (1 - .001 * (k + 1))
+        books['ask_price'][:, k] = np.array(mids) * (1 + .001 * (k + 1))
+        books['bid_amount'][:, k] = 5.
+        books['ask_amount'][:, k] = 5.
+    return(books)
+
+
+@pytest.fixture
+def recorded():
+    """ Module globals of the sweep, as loaded before the workers fork
+    """
+    sweep.history.update({('bittrex', 'ETH/BTC'): records([.1, .1, .11, .1]),\
+                          ('binance', 'ETH/BTC'): records([.1, .1, .1, .1])})
+    sweep.sweep.update({'balances': {'bittrex': {'ETH': 10., 'BTC': 1.},\
+                                     'binance': {'ETH': 10., 'BTC': 1.}},\
+                        'grid': {'minSpread': [1, 20],\
+                                 'max_arb_amount_BTC': .07}})
+    yield(sweep.sweep)
+    sweep.history.clear()
+    sweep.sweep.clear()
+
+################################################################################
+# Grid
+################################################################################
+
+def test_expand_grid():
+    grid = sweep.expand_grid({'minSpread': [1, 1.5, 2],\
+                              'max_arb_amount_BTC': [.01, .07]})
+    assert len(grid) == 6
+    assert {'minSpread': 1.5, 'max_arb_amount_BTC': .07} in grid
+    assert len(set(tuple(sorted(values.items())) for values in grid)) == 6
+
+
+def test_expand_grid_scalars():
+    assert sweep.expand_grid({'minSpread': [1, 2], 'arbitrage': True}) ==\
+        [{'arbitrage': True, 'minSpread': 1}, {'arbitrage': True, 'minSpread': 2}]
+    assert sweep.expand_grid({'allowedPairs': [['ETH/BTC'], ['LTC/BTC']]}) ==\
+        [{'allowedPairs': ['ETH/BTC']}, {'allowedPairs': ['LTC/BTC']}]
+    assert sweep.expand_grid({}) == [{}]
+
+################################################################################
+# Sweep
+################################################################################
+
+def test_run_sweep(recorded):
+    strategy = {'arbitrage': True, 'min_arb_amount_BTC': .004,\
+                'allowedPairs': ['ETH/BTC'], 'cycles': 200}
+    results = sweep.run_sweep(strategy, recorded['grid'], processes=2)
+    assert list(results['minSpread']) == [1, 20] # by decreasing PnL
+    assert list(results['max_arb_amount_BTC']) == [.07, .07]
+    assert list(results['trades']) == [1, 0]
+    assert list(results['scans']) == [4, 4]
+    assert results['pnl_BTC'].iloc[0] > 0
+    assert results['pnl_BTC'].iloc[1] == pytest.approx(0)
+
+
+def test_example_strategy():
+    """ The example strategy has every parameter the scanner reads
+    """
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)),\
+                        'Config', 'Strategies', 'example.json')
+    with open(path) as f:
+        strategy = json.load(f)
+    for key in ['allowedExchanges', 'sellExchanges', 'buyExchanges',\
+                'allowedPairs', 'excludedCurrencies', 'cycles',\
+                'displayPortolio', 'inBTC', 'loggingMode'] + sweep.ARBITRAGE_PARAMS:
+        assert key in strategy
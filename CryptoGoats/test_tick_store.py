@@ -0,0 +1,88 @@
+import numpy as np
+import pytest
+try:
+    from CryptoGoats.tick_store import TickStore, BOOKS, TICKERS
+except ImportError:
+    from tick_store import TickStore, BOOKS, TICKERS
+
+################################################################################
+# Tick store
+################################################################################
+
+DAY = 1517011200. # 2018-01-27 00:00 UTC
+
+
+def book(bid):
+    return({'bids': [[bid, 1.], [bid - .001, 2.], [bid - .002, 3.]],\
+            'asks': [[bid + .001, 4.]], 'timestamp': 1517011200000})
+
+
+def test_books_round_trip(tmpdir):
+    store = TickStore(str(tmpdir), depth=2)
+    for i in range(3):
+        store.append_book('bittrex', 'ETH/BTC', book(.1 + i / 100.), DAY + i)
+    books = store.books('bittrex', 'ETH/BTC')
+    assert len(books) == 3
+    np.testing.assert_allclose(books['timestamp'], [DAY, DAY + 1, DAY + 2])
+    # books keep depth levels, shorter sides are padded with NaN
+    np.testing.assert_allclose(books['bid_price'][0], [.1, .099])
+    np.testing.assert_allclose(books['bid_amount'][:, 1], [2., 2., 2.])
+    assert books['ask_price'][2, 0] == pytest.approx(.121)
+    assert np.isnan(books['ask_amount'][:, 1]).all()
+    assert (books['exchange_timestamp'] == 1517011200000).all()
+    assert store.days('bittrex', 'ETH/BTC') == ['2018-01-27']
+    assert tmpdir.join('bittrex', 'ETH-BTC', '2018-01-27.books').check()
+    store.close()
+
+
+def test_time_ranges_across_days(tmpdir):
+    store = TickStore(str(tmpdir), depth=1)
+    timestamps = [DAY - 2, DAY - 1, DAY, DAY + 1, DAY + 86400]
+    for timestamp in timestamps:
+        store.append_book('bittrex', 'ETH/BTC', book(.1), timestamp)
+    assert store.days('bittrex', 'ETH/BTC') ==\
+        ['2018-01-26', '2018-01-27', '2018-01-28']
+    # start included, end excluded
+    np.testing.assert_array_equal(\
+        store.books('bittrex', 'ETH/BTC', DAY - 1, DAY + 1)['timestamp'],\
+        [DAY - 1, DAY])
+    assert len(store.books('bittrex', 'ETH/BTC', DAY)) == 3
+    assert len(store.books('bittrex', 'ETH/BTC', end=DAY)) == 2
+    assert len(store.books('bittrex', 'ETH/BTC', DAY + 2, DAY + 3)) == 0
+    assert len(store.books('binance', 'ETH/BTC')) == 0
+    store.close()
+
+
+def test_tickers(tmpdir):
+    store = TickStore(str(tmpdir))
+    store.append_ticker('bittrex', 'ETH/BTC', {'bid': .1, 'ask': .11,\
+                                               'last': .105}, DAY)
+    tickers = store.tickers('bittrex', 'ETH/BTC')
+    assert (tickers['bid'][0], tickers['ask'][0]) == (.1, .11)
+    assert np.isnan(tickers['baseVolume'][0])
+    assert len(store.books('bittrex', 'ETH/BTC')) == 0
+    store.close()
+
+
+def test_reopen_drops_incomplete_record(tmpdir):
+    store = TickStore(str(tmpdir), depth=1)
+    store.append_book('bittrex', 'ETH/BTC', book(.1), DAY)
+    store.close()
+    path = tmpdir.join('bittrex', 'ETH-BTC', '2018-01-27.books')
+    path.write_binary(path.read_binary() + b'\x01\x02\x03', ensure=False)
+    store = TickStore(str(tmpdir), depth=1)
+    store.append_book('bittrex', 'ETH/BTC', book(.2), DAY + 1)
+    np.testing.assert_allclose(store.books('bittrex', 'ETH/BTC')['bid_price'][:, 0],\
+                               [.1, .2])
+    store.close()
+
+
+def test_segment_checks(tmpdir):
+    store = TickStore(str(tmpdir), depth=2)
+    store.append_book('bittrex', 'ETH/BTC', book(.1), DAY)
+    store.close()
+    with pytest.raises(ValueError):
+        TickStore(str(tmpdir), depth=3).books('bittrex', 'ETH/BTC')
+    with pytest.raises(ValueError):
+        store.check_header(store.path('bittrex', 'ETH/BTC', '2018-01-27',\
+                                      BOOKS), TICKERS)
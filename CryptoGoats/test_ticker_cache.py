@@ -0,0 +1,117 @@
+import asyncio
+import pytest
+try:
+    from CryptoGoats import ticker_cache
+    from CryptoGoats.ticker_cache import TickerCache
+except ImportError:
+    import ticker_cache
+    from ticker_cache import TickerCache
+
+################################################################################
+# Helpers
+################################################################################
+
+def run(coroutine):
+    """ Run coroutine to completion on a new event loop
+    """
+    loop = asyncio.new_event_loop()
+    try:
+        return(loop.run_until_complete(coroutine))
+    finally:
+        loop.close()
+
+
+class TickerExchange:
+    """ Exchange answering fetch_ticker after delay seconds, raising error
+    instead if set
+    """
+
+    def __init__(self, id='bittrex', delay=0):
+        self.id = id
+        self.delay = delay
+        self.error = None
+        self.fetches = 0
+
+    async def fetch_ticker(self, symbol):
+        self.fetches += 1
+        await asyncio.sleep(self.delay)
+        if self.error is not None:
+            raise self.error
+        return({'symbol': symbol, 'bid': .1, 'ask': .1001, 'fetch': self.fetches})
+
+
+class Clock:
+
+    def __init__(self, now=1517011200.):
+        self.now = now
+
+    def time(self):
+        return(self.now)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(ticker_cache, 'time', clock)
+    return(clock)
+
+################################################################################
+# Tests
+################################################################################
+
+def test_concurrent_fetches_coalesce():
+    cache = TickerCache()
+    bittrex = TickerExchange(delay=.01)
+    binance = TickerExchange('binance', delay=.01)
+
+    async def fetch():
+        return(await asyncio.gather(*[cache.fetch_ticker(bittrex, 'ETH/BTC')\
+                                      for _ in range(5)],\
+                                    cache.fetch_ticker(binance, 'ETH/BTC'),\
+                                    cache.fetch_ticker(bittrex, 'LTC/BTC')))
+    tickers = run(fetch())
+    assert (bittrex.fetches, binance.fetches) == (2, 1)
+    assert all(ticker is tickers[0] for ticker in tickers[:5])
+    assert tickers[6]['symbol'] == 'LTC/BTC'
+    assert cache.pending == dict()
+
+
+def test_ttl(clock):
+    cache = TickerCache(ttl=10)
+    bittrex = TickerExchange()
+    first = run(cache.fetch_ticker(bittrex, 'ETH/BTC'))
+    clock.now += 9
+    assert run(cache.fetch_ticker(bittrex, 'ETH/BTC')) is first
+    clock.now += 1
+    assert run(cache.fetch_ticker(bittrex, 'ETH/BTC'))['fetch'] == 2
+    assert bittrex.fetches == 2
+
+
+def test_failed_fetch_not_cached():
+    cache = TickerCache()
+    bittrex = TickerExchange(delay=.01)
+    bittrex.error = ValueError('unavailable')
+
+    async def fetch():
+        return(await asyncio.gather(cache.fetch_ticker(bittrex, 'ETH/BTC'),\
+                                    cache.fetch_ticker(bittrex, 'ETH/BTC'),\
+                                    return_exceptions=True))
+    errors = run(fetch())
+    # both callers get the error of the single call
+    assert bittrex.fetches == 1
+    assert all(isinstance(error, ValueError) for error in errors)
+    assert cache.tickers == dict() and cache.pending == dict()
+    bittrex.error = None
+    assert run(cache.fetch_ticker(bittrex, 'ETH/BTC'))['fetch'] == 2
+
+
+def test_update_and_invalidate():
+    cache = TickerCache()
+    bittrex = TickerExchange()
+    cache.update('bittrex', {'symbol': 'ETH/BTC', 'bid': .2})
+    cache.update('binance', {'symbol': 'ETH/BTC', 'bid': .3})
+    assert run(cache.fetch_ticker(bittrex, 'ETH/BTC'))['bid'] == .2
+    cache.invalidate('bittrex')
+    assert list(cache.tickers) == [('binance', 'ETH/BTC')]
+    assert run(cache.fetch_ticker(bittrex, 'ETH/BTC'))['bid'] == .1
+    assert bittrex.fetches == 1
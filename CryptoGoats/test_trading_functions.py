@@ -0,0 +1,425 @@
+import asyncio
+import logging
+import numpy as np
+import pytest
+try:
+    from CryptoGoats import trading_functions
+    from CryptoGoats.trading_functions import exchange_semaphore,\
+        fetch_order_book, scan_pairs, trade_locks, ranked_pairs, SpreadTable,\
+        pair_arbitrage, TickerCache, BalanceCache, btc_rates, portfolio_balance,\
+        ticker_candidates
+    from CryptoGoats.settlement import SettlementMonitor
+    from CryptoGoats.replay import Replay, SimulatedExchange, VirtualEventLoop
+    from CryptoGoats.tick_store import book_dtype
+except ImportError:
+    import trading_functions
+    from trading_functions import exchange_semaphore, fetch_order_book,\
+        scan_pairs, trade_locks, ranked_pairs, SpreadTable, pair_arbitrage,\
+        TickerCache, BalanceCache, btc_rates, portfolio_balance,\
+        ticker_candidates
+    from settlement import SettlementMonitor
+    from replay import Replay, SimulatedExchange, VirtualEventLoop
+    from tick_store import book_dtype
+
+################################################################################
+# Helpers
+################################################################################
+
+def run(coroutine):
+    """ Run coroutine to completion on a new event loop
+    """
+    loop = asyncio.new_event_loop()
+    try:
+        return(loop.run_until_complete(coroutine))
+    finally:
+        loop.close()
+
+
+class BookExchange:
+    """ Exchange answering order books after delay seconds
+    """
+
+    def __init__(self, id='bittrex', delay=0):
+        self.id = id
+        self.delay = delay
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def fetch_order_book(self, pair, params={}):
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        await asyncio.sleep(self.delay)
+        self.in_flight -= 1
+        return({'bids': [[1.0, 1.0]], 'asks': [[1.1, 1.0]]})
+
+
+class InfoExchange(SimulatedExchange):
+    """ Simulated exchange answering orders as most exchanges do, with the
+    order id and the raw response only
+    """
+
+    async def create_order(self, symbol, type, side, amount, price=None, params={}):
+        order = await super().create_order(symbol, type, side, amount, price,\
+                                           params)
+        return({'info': dict(order), 'id': order['id']})
+
+
+def book_records(bid, ask, depth=2):
+    """ A single book recorded at time 0, depth levels .1% apart
+    """
+    books = np.zeros(1, dtype=book_dtype(depth))
+    books['exchange_timestamp'] = np.nan
+    for k in range(depth):
+        books['bid_price'][0, k] = bid * (1 - .001 * k)
+        books['ask_price'][0, k] = ask * (1 + .001 * k)
+    books['bid_amount'] = 5.
+    books['ask_amount'] = 5.
+    return(books)
+
+
+def info_exchanges():
+    """ (replay, exchanges): ETH/BTC bids at bittrex above the asks at
+    binance by about 9%
+    """
+    books = {'bittrex': book_records(.110, .111), 'binance': book_records(.100, .101)}
+    replay = Replay({(id, 'ETH/BTC'): records for id, records in books.items()},\
+                    dict())
+    exchanges = {id: InfoExchange(id, replay, {'ETH/BTC': records},\
+                                  {'ETH': 10., 'BTC': 1.})\
+                 for id, records in books.items()}
+    return(replay, exchanges)
+
+################################################################################
+# Order books
+################################################################################
+
+def test_semaphore_by_concurrency():
+    exchange = BookExchange()
+    assert exchange_semaphore(exchange, 1) is exchange_semaphore(exchange, 1)
+    assert exchange_semaphore(exchange, 1) is not exchange_semaphore(exchange, 3)
+    assert exchange_semaphore(exchange, 1) is not\
+        exchange_semaphore(BookExchange(), 1)
+
+
+def test_fetch_order_book_concurrency():
+    exchange = BookExchange(delay=0.01)
+
+    async def fetch():
+        await asyncio.gather(*[fetch_order_book(exchange, 'ETH/BTC',\
+                                                max_concurrency=2)\
+                               for _ in range(5)])
+    run(fetch())
+    assert exchange.max_in_flight == 2
+
+
+def test_fetch_order_book_timeout_covers_queue():
+    exchange = BookExchange(delay=0.2)
+
+    async def fetch():
+        first = asyncio.ensure_future(fetch_order_book(exchange, 'ETH/BTC',\
+                                                       max_concurrency=1))
+        await asyncio.sleep(0)
+        with pytest.raises(asyncio.TimeoutError):
+            # waits for the slot held by first longer than its timeout
+            await fetch_order_book(exchange, 'ETH/BTC', timeout=0.05,\
+                                   max_concurrency=1)
+        await first
+    run(fetch())
+
+
+def test_ranked_pairs():
+    exchanges = {'bittrex': BookExchange('bittrex'),\
+                 'binance': BookExchange('binance')}
+    for exchange in exchanges.values():
+        exchange.markets = {'ETH/BTC': {'taker': .0025},\
+                            'XRP/BTC': {'taker': .0025}}
+    prices = SpreadTable()
+    for id, pair, bid, ask in [('bittrex', 'ETH/BTC', .100, .101),\
+                               ('binance', 'ETH/BTC', .110, .111),\
+                               ('bittrex', 'XRP/BTC', .0010, .0011),\
+                               ('binance', 'XRP/BTC', .0012, .0013)]:
+        prices.update([0., id, pair, None, None, bid, 1., None, ask, 1., 0])
+    pairs = ['LTC/BTC', 'ETH/BTC', 'XRP/BTC']
+    ids = sorted(exchanges)
+    assert ranked_pairs(prices, exchanges, pairs, ids, ids) ==\
+        ['XRP/BTC', 'ETH/BTC', 'LTC/BTC']
+    # only XRP/BTC clears 7.8% net of fees
+    assert ranked_pairs(prices, exchanges, pairs, ids, ids, minSpread=7.8) ==\
+        ['XRP/BTC', 'LTC/BTC', 'ETH/BTC']
+
+################################################################################
+# Scanner
+################################################################################
+
+def test_scan_pairs_caps_rescans():
+    scanned = []
+
+    async def scan(pair):
+        scanned.append(pair)
+        await asyncio.sleep(0)
+        return(1) # an arbitrage every time: the pair is queued again
+
+    assert run(scan_pairs(['ETH/BTC', 'XRP/BTC'], scan, cycles=3)) == 6
+    assert len(scanned) == 6
+    assert run(scan_pairs(['ETH/BTC'], scan, cycles=3, max_scans=4)) == 4
+
+
+def test_scan_pairs_interrupt():
+    async def scan(pair):
+        return(-1 if pair == 'XRP/BTC' else 0)
+
+    assert run(scan_pairs(['ETH/BTC', 'XRP/BTC', 'LTC/BTC'], scan, cycles=5,\
+                          max_in_flight=1)) == 2
+
+
+def test_trade_locks_serialize_shared_exchanges():
+    bittrex, binance, cex = BookExchange('bittrex'), BookExchange('binance'),\
+        BookExchange('cex')
+    trading = set()
+    overlaps = []
+
+    async def trade(sell, buy):
+        async with trade_locks(sell, buy):
+            overlaps.append(bool(trading & {sell.id, buy.id}))
+            trading.update((sell.id, buy.id))
+            await asyncio.sleep(0.01)
+            trading.difference_update((sell.id, buy.id))
+
+    async def trades():
+        # opposite directions take the locks in the same order
+        await asyncio.wait_for(asyncio.gather(trade(bittrex, binance),\
+                                              trade(binance, bittrex),\
+                                              trade(cex, bittrex)), 1)
+    run(trades())
+    assert overlaps == [False, False, False]
+
+################################################################################
+# Arbitrage
+################################################################################
+
+def arbitrage(replay, exchanges, settlement=None):
+    """ pair_arbitrage of ETH/BTC on a virtual clock
+    """
+    loop = VirtualEventLoop()
+
+    async def trade():
+        result = await pair_arbitrage(SpreadTable(), 'ETH/BTC', exchanges,\
+                                      {'ETH/BTC': sorted(exchanges)},\
+                                      sorted(exchanges), sorted(exchanges),\
+                                      arbitrage=True, minSpread=1,\
+                                      min_arb_amount_BTC=.004,\
+                                      max_arb_amount_BTC=.07,\
+                                      tickers=TickerCache(ttl=0),\
+                                      balances=BalanceCache(ttl=60),\
+                                      settlement=settlement,\
+                                      usd=replay.usd_exchange)
+        if settlement is not None:
+            await settlement.close()
+        return(result)
+    try:
+        return(loop.run_until_complete(trade()))
+    finally:
+        loop.close()
+
+
+def test_pair_arbitrage_places_each_order_once():
+    replay, exchanges = info_exchanges()
+    assert arbitrage(replay, exchanges) == 1
+    sell, = exchanges['bittrex'].orders
+    buy, = exchanges['binance'].orders
+    assert (sell['side'], buy['side']) == ('sell', 'buy')
+    assert sell['amount'] == buy['amount']
+
+
+def test_pair_arbitrage_settles_in_background():
+    replay, exchanges = info_exchanges()
+    settlement = SettlementMonitor(delay=1)
+    assert arbitrage(replay, exchanges, settlement) == 1
+    trade, = settlement.trades
+    assert trade['success'] == 1
+    assert trade['gain_BTC'] > 0
+    assert settlement.failed == 0
+
+################################################################################
+# Portfolio
+################################################################################
+
+class RateExchange:
+    """ Exchange quoting tickers {symbol: ask}, with fetch_tickers if bulk,
+    every request raising error instead if set
+    """
+
+    def __init__(self, id, asks, balance=None, bulk=False):
+        self.id = id
+        self.has = {'fetchTickers': bulk}
+        self.tickers = {symbol: {'symbol': symbol, 'ask': ask}\
+                        for symbol, ask in asks.items()}
+        self.balance = balance or dict()
+        self.error = None
+        self.requests = 0
+
+    async def request(self):
+        self.requests += 1
+        await asyncio.sleep(0)
+        if self.error is not None:
+            raise self.error
+
+    async def fetch_tickers(self, symbols=None, params={}):
+        await self.request()
+        return(dict(self.tickers))
+
+    async def fetch_ticker(self, symbol, params={}):
+        await self.request()
+        if symbol not in self.tickers:
+            raise ValueError(self.id + ' does not list ' + symbol)
+        return(self.tickers[symbol])
+
+    fetchTicker = fetch_ticker
+
+    async def fetch_balance(self, params={}):
+        await self.request()
+        return({currency: {'free': total, 'used': 0., 'total': total}\
+                for currency, total in self.balance.items()})
+
+
+async def sequential_rates(exchanges, currencies):
+    """ BTC rates as requested one by one before btc_rates
+    """
+    rates = dict()
+    for curr in currencies:
+        for id in 'bittrex', 'binance':
+            try:
+                rates[curr] = await exchanges[id].fetchTicker(curr + '/BTC')
+            except Exception:
+                rates[curr] = 0
+            else:
+                break
+    return(rates)
+
+
+def rate_exchanges():
+    return({'bittrex': RateExchange('bittrex', {'ETH/BTC': .1, 'LTC/BTC': .02},\
+                                    {'BTC': 1., 'ETH': 10., 'EUR': 100.},\
+                                    bulk=True),\
+            'binance': RateExchange('binance', {'ETH/BTC': .11, 'XRP/BTC': .0001},\
+                                    {'BTC': .5, 'XRP': 1000.}),\
+            'cex': RateExchange('cex', {'LTC/BTC': .03}, {'LTC': 5.})})
+
+
+def test_btc_rates_match_sequential():
+    currencies = ['ETH', 'LTC', 'XRP', 'DOGE']
+    exchanges = rate_exchanges()
+    rates = run(btc_rates(exchanges, currencies))
+    # a single fetch_tickers at bittrex, binance asked for what it lacks
+    assert exchanges['bittrex'].requests == 1
+    assert exchanges['binance'].requests == 2
+    assert exchanges['cex'].requests == 0
+    assert rates == run(sequential_rates(exchanges, currencies))
+    assert rates['ETH']['ask'] == .1 and rates['DOGE'] == 0
+
+
+def test_btc_rates_failing_exchange():
+    currencies = ['ETH', 'LTC', 'XRP']
+    exchanges = rate_exchanges()
+    exchanges['bittrex'].error = ValueError('bittrex unavailable')
+    rates = run(btc_rates(exchanges, currencies))
+    assert rates == run(sequential_rates(exchanges, currencies))
+    assert rates['ETH']['ask'] == .11 and rates['LTC'] == 0
+    del exchanges['bittrex']
+    assert run(btc_rates(exchanges, currencies)) == rates
+
+
+class Messages(logging.Handler):
+
+    def __init__(self):
+        super().__init__()
+        self.messages = list()
+
+    def emit(self, record):
+        self.messages.append(record.getMessage())
+
+
+def test_portfolio_balance(monkeypatch):
+    exchanges = rate_exchanges()
+    exchanges['cex'].error = ValueError('cex unavailable')
+    gemini = RateExchange('gemini', {'BTC/USD': 10000.})
+    monkeypatch.setattr(trading_functions, 'usd_exchange', lambda: gemini)
+    messages = Messages()
+    level = trading_functions.logger.level
+    trading_functions.logger.setLevel(logging.INFO)
+    trading_functions.logger.addHandler(messages)
+    balances = BalanceCache()
+    try:
+        portfolio = run(portfolio_balance(exchanges, ['ETH/BTC', 'XRP/BTC',\
+                                                      'LTC/BTC'],\
+                                          inBTC=True, balances=balances))
+    finally:
+        trading_functions.logger.removeHandler(messages)
+        trading_functions.logger.setLevel(level)
+    # cex failed its 3 tries, the currencies of no arbitrable pair are left out
+    assert exchanges['cex'].requests == 3
+    assert dict(portfolio) == {'BTC': 1.5, 'ETH': 10., 'XRP': 1000.}
+    assert sorted(balances.balances) == ['binance', 'bittrex']
+    value = 1.5 + 10. * .1 + 1000. * .0001
+    assert "Total portfolio balance: %f (BTC)" % value in messages.messages
+    assert "Total portfolio balance: %f (USD)" % (value * 10000.)\
+        in messages.messages
+
+################################################################################
+# Ticker prefilter
+################################################################################
+
+def ticker_exchanges():
+    """ ETH/BTC bids at bittrex about 9% above the asks at binance, XRP/BTC
+    bids at binance about 20% above the asks at bittrex, LTC/BTC at the
+    same price, cex without fetch_tickers
+    """
+    quotes = {'bittrex': {'ETH/BTC': (.110, .111), 'LTC/BTC': (.020, .0201),\
+                          'XRP/BTC': (.00010, .00010)},\
+              'binance': {'ETH/BTC': (.100, .101), 'LTC/BTC': (.020, .0201),\
+                          'XRP/BTC': (.00012, .000121), 'NEO/BTC': (.01, .0101)},\
+              'cex': {'NEO/BTC': (.01, .0101)}}
+    exchanges = dict()
+    for id, books in quotes.items():
+        exchanges[id] = RateExchange(id, dict(), bulk=id != 'cex')
+        exchanges[id].tickers = {symbol: {'symbol': symbol, 'bid': bid, 'ask': ask}\
+                                 for symbol, (bid, ask) in books.items()}
+    return(exchanges)
+
+
+pairs = ['ETH/BTC', 'LTC/BTC', 'XRP/BTC', 'NEO/BTC']
+exchangesBySymbol = {'ETH/BTC': ['bittrex', 'binance'],\
+                     'LTC/BTC': ['bittrex', 'binance'],\
+                     'XRP/BTC': ['bittrex', 'binance'],\
+                     'NEO/BTC': ['binance', 'cex']}
+
+
+def test_ticker_candidates_spread():
+    exchanges = ticker_exchanges()
+    ids = sorted(exchanges)
+    tickers = TickerCache()
+    # NEO/BTC is kept, cex has no tickers to compare with
+    assert run(ticker_candidates(pairs, exchanges, exchangesBySymbol, ids, ids,\
+                                 minSpread=1, tickers=tickers)) ==\
+        ['ETH/BTC', 'XRP/BTC', 'NEO/BTC']
+    assert run(ticker_candidates(pairs, exchanges, exchangesBySymbol, ids, ids,\
+                                 minSpread=10)) == ['XRP/BTC', 'NEO/BTC']
+    assert exchanges['cex'].requests == 0
+    assert tickers.tickers[('bittrex', 'ETH/BTC')][1]['bid'] == .110
+    assert ('cex', 'NEO/BTC') not in tickers.tickers
+
+
+def test_ticker_candidates_exchanges():
+    exchanges = ticker_exchanges()
+    ids = sorted(exchanges)
+    without = [id for id in ids if id != 'binance']
+    assert run(ticker_candidates(pairs, exchanges, exchangesBySymbol,\
+                                 without, ids, minSpread=1)) ==\
+        ['ETH/BTC', 'NEO/BTC']
+    assert run(ticker_candidates(pairs, exchanges, exchangesBySymbol,\
+                                 ids, without, minSpread=1)) ==\
+        ['XRP/BTC', 'NEO/BTC']
+    # pairs at an exchange whose tickers failed are all kept
+    exchanges['binance'].error = ValueError('binance unavailable')
+    assert run(ticker_candidates(pairs, exchanges, exchangesBySymbol, ids, ids,\
+                                 minSpread=1)) == pairs
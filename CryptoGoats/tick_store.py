@@ -0,0 +1,199 @@
+import os
+import struct
+import time
+import datetime
+import numpy as np
+try:
+    from CryptoGoats.depth import book_columns
+except ImportError:
+    from depth import book_columns
+
+################################################################################
+# Tick store
+################################################################################
+
+# segment header: magic, version, kind, book depth
+HEADER = struct.Struct('<4sHHI4x')
+MAGIC = b'CGTS'
+VERSION = 1
+BOOKS = 1
+TICKERS = 2
+
+EXTENSIONS = {BOOKS: '.books', TICKERS: '.tickers'}
+
+
+def book_dtype(depth):
+    """ Record of one order book, depth levels per side padded with NaN
+    timestamp is the local time in seconds, exchange_timestamp in ms
+    """
+    return(np.dtype([('timestamp', '<f8'), ('exchange_timestamp', '<f8'),\
+                     ('bid_price', '<f8', (depth,)), ('bid_amount', '<f8', (depth,)),\
+                     ('ask_price', '<f8', (depth,)), ('ask_amount', '<f8', (depth,))]))
+
+
+TICKER_DTYPE = np.dtype([('timestamp', '<f8'), ('exchange_timestamp', '<f8'),\
+                         ('bid', '<f8'), ('ask', '<f8'), ('last', '<f8'),\
+                         ('baseVolume', '<f8')])
+
+
+def day(timestamp):
+    return(datetime.datetime.utcfromtimestamp(timestamp).strftime('%Y-%m-%d'))
+
+
+def number(value):
+    return(np.nan if value is None else value)
+
+
+class TickStore:
+    """ Append-only files of order books and tickers, one segment per
+    exchange, pair and UTC day: <root>/<exchange>/<BASE-QUOTE>/<day>.books
+    Records have a fixed size (books keep depth levels per side) and are
+    appended in time order, so the timestamp column is the time index and
+    reads map the segments and return time range slices as NumPy record
+    arrays, without a copy within a day
+    Written by a single process, readers only see complete records
+    """
+
+    def __init__(self, root, depth=20):
+        self.root = root
+        self.depth = depth
+        self.dtypes = {BOOKS: book_dtype(depth), TICKERS: TICKER_DTYPE}
+        self.files = dict() # {(exchange, pair, kind): (day, file)}
+
+    def path(self, exchange_id, pair, date, kind):
+        return(os.path.join(self.root, exchange_id, pair.replace('/', '-'),\
+                            date + EXTENSIONS[kind]))
+
+    ############################################################
+    # Write
+    ############################################################
+
+    def segment(self, exchange_id, pair, kind, timestamp):
+        """ File to append the records of timestamp to, a new segment is
+        started every UTC day
+        """
+        key = (exchange_id, pair, kind)
+        date = day(timestamp)
+        current = self.files.get(key)
+        if current is not None and current[0] == date:
+            return(current[1])
+        if current is not None:
+            current[1].close()
+        path = self.path(exchange_id, pair, date, kind)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        f = open(path, 'ab')
+        if f.tell() == 0:
+            f.write(HEADER.pack(MAGIC, VERSION, kind, self.depth))
+        else:
+            self.check_header(path, kind)
+            # drop a record left incomplete by a crash
+            size = self.dtypes[kind].itemsize
+            f.truncate(HEADER.size + (f.tell() - HEADER.size) // size * size)
+            f.seek(0, os.SEEK_END)
+        self.files[key] = (date, f)
+        return(f)
+
+    def append_book(self, exchange_id, pair, orderbook, timestamp=None):
+        """ Store the first depth levels of orderbook, received at
+        timestamp (seconds, now by default)
+        """
+        timestamp = time.time() if timestamp is None else timestamp
+        record = np.zeros(1, dtype=self.dtypes[BOOKS])
+        record['timestamp'] = timestamp
+        record['exchange_timestamp'] = number(orderbook.get('timestamp'))
+        for side in ('bid', 'ask'):
+            prices, amounts = book_columns(orderbook[side + 's'])
+            n = min(len(prices), self.depth)
+            for field, column in ((side + '_price', prices),\
+                                  (side + '_amount', amounts)):
+                record[field][0, :n] = column[:n]
+                record[field][0, n:] = np.nan
+        self.segment(exchange_id, pair, BOOKS, timestamp).write(record.tobytes())
+
+    def append_ticker(self, exchange_id, pair, ticker, timestamp=None):
+        """ Store bid, ask, last and baseVolume of ticker
+        """
+        timestamp = time.time() if timestamp is None else timestamp
+        record = np.array([(timestamp, number(ticker.get('timestamp')),\
+                            number(ticker.get('bid')), number(ticker.get('ask')),\
+                            number(ticker.get('last')),\
+                            number(ticker.get('baseVolume')))],\
+                          dtype=TICKER_DTYPE)
+        self.segment(exchange_id, pair, TICKERS, timestamp).write(record.tobytes())
+
+    def flush(self):
+        for date, f in self.files.values():
+            f.flush()
+
+    def close(self):
+        for date, f in self.files.values():
+            f.close()
+        self.files = dict()
+
+    ############################################################
+    # Read
+    ############################################################
+
+    def check_header(self, path, kind):
+        with open(path, 'rb') as f:
+            magic, version, file_kind, depth = HEADER.unpack(f.read(HEADER.size))
+        if magic != MAGIC or version != VERSION or file_kind != kind:
+            raise ValueError("%s is not a tick store segment" % path)
+        if kind == BOOKS and depth != self.depth:
+            raise ValueError("%s has depth %d, store depth is %d"\
+                             % (path, depth, self.depth))
+
+    def days(self, exchange_id, pair, kind=BOOKS):
+        """ Sorted days with a segment for exchange and pair
+        """
+        directory = os.path.dirname(self.path(exchange_id, pair, '', kind))
+        if not os.path.isdir(directory):
+            return([])
+        return(sorted(name[:-len(EXTENSIONS[kind])] for name in os.listdir(directory)\
+                      if name.endswith(EXTENSIONS[kind])))
+
+    def load(self, exchange_id, pair, date, kind=BOOKS):
+        """ Records of one segment, mapped read-only
+        """
+        path = self.path(exchange_id, pair, date, kind)
+        self.check_header(path, kind)
+        dtype = self.dtypes[kind]
+        count = (os.path.getsize(path) - HEADER.size) // dtype.itemsize
+        if count == 0:
+            return(np.zeros(0, dtype=dtype))
+        return(np.memmap(path, dtype=dtype, mode='r', offset=HEADER.size,\
+                         shape=(count,)))
+
+    def read(self, exchange_id, pair, start=None, end=None, kind=BOOKS):
+        """ Records with start <= timestamp < end (seconds, open ended when
+        None) as a record array, a view of the segment within one day
+        """
+        self.flush()
+        first = None if start is None else day(start)
+        last = None if end is None else day(end)
+        slices = []
+        for date in self.days(exchange_id, pair, kind):
+            if (first is not None and date < first) or (last is not None and date > last):
+                continue
+            records = self.load(exchange_id, pair, date, kind)
+            timestamps = records['timestamp']
+            i = 0 if start is None else np.searchsorted(timestamps, start, 'left')
+            j = len(records) if end is None else np.searchsorted(timestamps, end, 'left')
+            if j > i:
+                slices.append(records[i:j])
+        if not slices:
+            return(np.zeros(0, dtype=self.dtypes[kind]))
+        if len(slices) == 1:
+            return(slices[0])
+        return(np.concatenate(slices))
+
+    def books(self, exchange_id, pair, start=None, end=None):
+        """ Order books of exchange and pair in [start, end)
+        e.g. books['bid_price'][:, 0] is the best bid of every book
+        """
+        return(self.read(exchange_id, pair, start, end, BOOKS))
+
+    def tickers(self, exchange_id, pair, start=None, end=None):
+        """ Tickers of exchange and pair in [start, end)
+        """
+        return(self.read(exchange_id, pair, start, end, TICKERS))
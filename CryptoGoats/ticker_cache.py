@@ -0,0 +1,51 @@
+import asyncio
+import time
+
+################################################################################
+# Ticker cache
+################################################################################
+
+class TickerCache:
+    """ Tickers shared by all pairs scanned concurrently
+    A ticker is fetched at most once every ttl seconds per (exchange, symbol)
+    and concurrent requests for a ticker being fetched wait on the same call
+    """
+
+    def __init__(self, ttl=10):
+        self.ttl = ttl
+        self.tickers = dict() # {(exchange id, symbol): (time, ticker)}
+        self.pending = dict() # {(exchange id, symbol): future}
+
+    async def fetch_ticker(self, exchange, symbol):
+        """ Cached exchange.fetch_ticker(symbol)
+        Errors are raised to every waiting caller and not cached
+        """
+        key = (exchange.id, symbol)
+        cached = self.tickers.get(key)
+        if cached is not None and time.time() - cached[0] < self.ttl:
+            return(cached[1])
+        if key not in self.pending:
+            self.pending[key] =\
+                asyncio.ensure_future(self._fetch(exchange, symbol, key))
+        # a cancelled caller must not cancel the call other callers wait on
+        return(await asyncio.shield(self.pending[key]))
+
+    async def _fetch(self, exchange, symbol, key):
+        try:
+            ticker = await exchange.fetch_ticker(symbol)
+            self.tickers[key] = (time.time(), ticker)
+            return(ticker)
+        finally:
+            del self.pending[key]
+
+    def update(self, exchange_id, ticker):
+        """ Store a ticker received by other means, e.g. fetch_tickers
+        """
+        self.tickers[(exchange_id, ticker['symbol'])] = (time.time(), ticker)
+
+    def invalidate(self, exchange_id=None, symbol=None):
+        """ Drop cached tickers, all of them by default
+        """
+        for key in list(self.tickers):
+            if exchange_id in (None, key[0]) and symbol in (None, key[1]):
+                del self.tickers[key]
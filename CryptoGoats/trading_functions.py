@@ -5,6 +5,24 @@ import math
 import numbers
 import pandas as pd
 from collections import defaultdict
+try:
+    from CryptoGoats.spread_table import SpreadTable, rank_spreads, taker_fees
+    from CryptoGoats.depth import executable_amount
+    from CryptoGoats.book_codec import encode_levels, decode_levels
+    from CryptoGoats.ticker_cache import TickerCache
+    from CryptoGoats.balance_cache import BalanceCache
+    from CryptoGoats.settlement import SettlementMonitor
+    from CryptoGoats.exchange_pool import ExchangePool
+    from CryptoGoats.sharding import shard_pairs, shared_rate_limits, run_shards
+except ImportError:
+    from spread_table import SpreadTable, rank_spreads, taker_fees
+    from depth import executable_amount
+    from book_codec import encode_levels, decode_levels
+    from ticker_cache import TickerCache
+    from balance_cache import BalanceCache
+    from settlement import SettlementMonitor
+    from exchange_pool import ExchangePool
+    from sharding import shard_pairs, shared_rate_limits, run_shards
 
 import logging
 logger = logging.getLogger(__name__)
@@ -21,51 +39,142 @@ class style:
     BOLD = '\033[1m'
     UNDERLINE = '\033[4m'
 
+################################################################################
+# Exchanges and tickers
+################################################################################
+
+# Exchange instances shared for the process lifetime, configure with
+# exchange_pool.config.update({id: config})
+exchange_pool = ExchangePool()
+
+# Tickers shared by all pairs when pair_arbitrage isn't given a cache
+default_tickers = TickerCache()
+
+# Balances fetched on every call when pair_arbitrage isn't given a cache
+default_balances = BalanceCache(ttl=0)
+
+def usd_exchange():
+    """ Exchange quoting BTC and ETH in USD
+    """
+    return(exchange_pool.get('gemini'))
+
+async def shard_exchanges(exchanges, rate_limits):
+    """ New instances of exchanges for a forked scanner shard, with the
+    markets already loaded by the parent and the global rate limits
+    (see shared_rate_limits) as throttle
+    Returns {id: exchange}
+    """
+    # instances inherited from the parent use its event loop
+    exchange_pool.reset()
+    for id, exchange in exchanges.items():
+        config = dict(exchange_pool.config.get(id, dict()))
+        config.update({'markets': exchange.markets, 'enableRateLimit': True})
+        exchange_pool.config[id] = config
+    loaded, notLoaded = await exchange_pool.load_all(list(exchanges))
+    for id, exchange in loaded.items():
+        exchange.throttle = rate_limits[id]
+    return(loaded)
+
 ################################################################################
 # OrderBook
 ################################################################################
 
+def exchange_semaphore(exchange, max_concurrency):
+    """ Returns the semaphore shared by the order book calls to exchange
+    made with the same max_concurrency
+    Semaphores are kept on the exchange instance ({limit: semaphore}), so
+    they share its event loop and go away with it
+    """
+    semaphores = getattr(exchange, 'book_semaphores', None)
+    if semaphores is None:
+        semaphores = exchange.book_semaphores = dict()
+    if max_concurrency not in semaphores:
+        semaphores[max_concurrency] = asyncio.Semaphore(max_concurrency)
+    return(semaphores[max_concurrency])
+
+
+async def fetch_order_book(exchange, pair, timeout=None, max_concurrency=2):
+    """ Fetch order book with at most max_concurrency calls in flight per
+    exchange. Raises asyncio.TimeoutError after timeout seconds, time
+    spent waiting for a free slot included
+    """
+    async def fetch():
+        async with exchange_semaphore(exchange, max_concurrency):
+            return(await exchange.fetch_order_book(pair))
+    return(await asyncio.wait_for(fetch(), timeout))
+
+
+async def fetch_order_books(exchanges, ids, pair, timeout=None,\
+                            max_concurrency=2):
+    """ Fetch order books for pair at all exchanges in ids concurrently
+    Returns {exchange id: orderbook}, exchanges that failed or timed out
+    are logged and left out (partial result)
+    """
+    results = await asyncio.gather(*[fetch_order_book(exchanges[id], pair,\
+                                                      timeout, max_concurrency)\
+                                     for id in ids], return_exceptions=True)
+    books = dict()
+    for id, result in zip(ids, results):
+        if isinstance(result, asyncio.TimeoutError):
+            logger.warning(style.FAIL + "Order book timeout %s %s" + style.END,\
+                           id, pair)
+        elif isinstance(result, Exception):
+            logger.warning(style.FAIL + "%s" + style.END, result)
+        else:
+            books[id] = result
+    return(books)
+
+
 async def load_order_book(exchange, pair, min_arb_amount):
-    """ Add order_book to Pandas dataframe
-    Only look for bids/ asks with size > min_arb_amount
+    """ Fetch order book and format it as a row of the prices dataframe
     pair = 'ETH/BTC'
     """
     orderbook = await exchange.fetch_order_book(pair)
+    return(order_book_row(exchange, pair, orderbook, min_arb_amount))
 
+
+def first_level(levels, min_amount):
+    """ Index of the first [price, size] level with size >= min_amount
+    (len(levels) if none). Compact order books (compactOrderBooks exchange
+    option) answer from their size column
+    """
+    if hasattr(levels, 'first_level'):
+        return(levels.first_level(min_amount))
+    i = 0
+    while i < len(levels) and levels[i][1] < min_amount:
+        i += 1
+    return(i)
+
+
+def order_book_row(exchange, pair, orderbook, min_arb_amount):
+    """ Add order_book to Pandas dataframe
+    Only look for bids/ asks with size > min_arb_amount
+    pair = 'ETH/BTC'
+    """
     # min_arb_amount = min_arb_amount_BTC / orderbook['bids'][0][0]
     # logger.debug("min_arb_amount: %f", min_arb_amount)
 
     # get best bid/ ask with size > min order amount
-    i = 0
-    while i < len(orderbook['bids']) and\
-        orderbook['bids'][i][1] < min_arb_amount:
-        logger.debug("min_arb_amount %f bid %f bid size %f, i: %d",\
-                     min_arb_amount,\
-                     orderbook['bids'][i][0], orderbook['bids'][i][1], i)
-        i +=1
+    i = first_level(orderbook['bids'], min_arb_amount)
     high_bid, high_bid_size = orderbook['bids'][i][0], orderbook['bids'][i][1]
     logger.debug("min_arb_amount %f bid %f bid size %f, i: %d",\
                  min_arb_amount, high_bid, high_bid_size, i)
-    i = 0
-    while i < len(orderbook['asks']) and\
-        orderbook['asks'][i][1] < min_arb_amount:
-        logger.debug("min_arb_amount %f ask %f ask size %f, i: %d",\
-                     min_arb_amount,\
-                     orderbook['asks'][i][0], orderbook['asks'][i][1], i)
-        i +=1
+    i = first_level(orderbook['asks'], min_arb_amount)
     low_ask, low_ask_size = orderbook['asks'][i][0], orderbook['asks'][i][1]
     logger.debug("min_arb_amount %f ask %f ask size %f, i: %d",\
                  min_arb_amount, low_ask, low_ask_size, i)
 
 
+    # bids and asks as binary float64 columns, decode_levels(row[4]) gives
+    # (prices, sizes) arrays
     row = [time.time(), exchange.id, pair, orderbook['timestamp'],\
-     ';'.join(map(lambda x: "@".join([str(x[1]), str(x[0])]), orderbook['bids'][:])),\
+     encode_levels(orderbook['bids']),\
      high_bid,
      high_bid_size,
-    ';'.join(map(lambda x: "@".join([str(x[1]), str(x[0])]), orderbook['asks'][:])),\
-    low_ask,
-    low_ask_size,
-    1000]
+     encode_levels(orderbook['asks']),\
+     low_ask,
+     low_ask_size,
+     1000]
 
     # logger.debug("row %s", row)
     return(row)
@@ -76,6 +185,7 @@ async def load_order_book(exchange, pair, min_arb_amount):
 
 def get_spread(pair, df, sellExchanges, buyExchanges):
     """ Identify spread for a pair and returns data for arbitrage trade
+    df is a prices dataframe, e.g. a SpreadTable snapshot from to_frame()
     """
     best_bid = df.loc[(df['pair'] == pair) &\
                       (df['exchange'].isin(sellExchanges)),\
@@ -119,22 +229,160 @@ def get_spread(pair, df, sellExchanges, buyExchanges):
 
 
 
+async def ticker_candidates(pairs, exchanges, exchangesBySymbol,\
+                            sellExchanges, buyExchanges, minSpread=0,\
+                            tickers=None):
+    """ Pairs worth loading order books for, from one fetch_tickers call per
+    exchange: pairs whose best bid/ ask spread across tickers is above
+    minSpread, plus pairs listed at an exchange whose tickers couldn't be
+    loaded at once (no fetchTickers support or error)
+    Tickers are stored in the tickers cache when given
+    """
+    ids = [id for id, exchange in exchanges.items()\
+           if exchange.has.get('fetchTickers')]
+    results = await asyncio.gather(*[exchanges[id].fetch_tickers()\
+                                     for id in ids], return_exceptions=True)
+    table = SpreadTable()
+    loaded = list()
+    for id, result in zip(ids, results):
+        if isinstance(result, Exception):
+            logger.warning(style.FAIL + "%s" + style.END, result)
+            continue
+        loaded.append(id)
+        for symbol, ticker in result.items():
+            if tickers is not None:
+                tickers.update(id, ticker)
+            if ticker.get('bid') and ticker.get('ask'):
+                table.update([time.time(), id, symbol, ticker.get('timestamp'),\
+                              None, ticker['bid'], float('nan'),\
+                              None, ticker['ask'], float('nan'),\
+                              ticker.get('baseVolume')])
+
+    covered = [pair for pair in pairs\
+               if all(id in loaded for id in exchangesBySymbol[pair])]
+    opportunities = rank_spreads(table, covered, sorted(loaded),\
+                                 sellExchanges, buyExchanges,\
+                                 minSpread=minSpread)
+    candidates = set(pair for pair in pairs if pair not in covered)
+    candidates.update(opportunity[0] for opportunity in opportunities)
+    logger.info("%d of %d pairs above %s%% ticker spread or without tickers",\
+                len(candidates), len(pairs), minSpread)
+    return([pair for pair in pairs if pair in candidates])
+
+
+def rank_opportunities(prices, exchanges, pairs, sellExchanges, buyExchanges,\
+                       minSpread=None):
+    """ Cross exchange spreads, net of taker fees, of all pairs in prices
+    sorted by decreasing spread (see rank_spreads)
+    """
+    ids = sorted(exchanges)
+    return(rank_spreads(prices, pairs, ids, sellExchanges, buyExchanges,\
+                        fees=taker_fees(exchanges, pairs, ids),\
+                        minSpread=minSpread))
+
+
+def ranked_pairs(prices, exchanges, pairs, sellExchanges, buyExchanges,\
+                 minSpread=None):
+    """ pairs in scan order: pairs whose latest books rank above minSpread
+    net of taker fees first, by decreasing spread, then the others
+    (pairs without books included) in their order
+    """
+    ranked = [opportunity[0] for opportunity in\
+              rank_opportunities(prices, exchanges, pairs, sellExchanges,\
+                                 buyExchanges, minSpread)]
+    first = set(ranked)
+    return(ranked + [pair for pair in pairs if pair not in first])
+
+
+def log_ranked(opportunities, top=5):
+    """ Log the top opportunities of rank_opportunities
+    """
+    for pair, bb_exchange, best_bid, best_bid_size,\
+            ba_exchange, best_ask, best_ask_size, spread in opportunities[:top]:
+        logger.info(style.LIGHTBLUE + "%s net spread %f (sell %s %f, buy %s %f)"\
+                    + style.END, pair, spread, bb_exchange, best_bid,\
+                    ba_exchange, best_ask)
+
+
+def log_opportunities(prices, exchanges, pairs, sellExchanges, buyExchanges,\
+                      minSpread=None, top=5):
+    """ Log the top cross exchange spreads, net of taker fees, of all pairs
+    in prices
+    """
+    opportunities = rank_opportunities(prices, exchanges, pairs,\
+                                       sellExchanges, buyExchanges, minSpread)
+    log_ranked(opportunities, top)
+    return(opportunities)
+
+
+
 ################################################################################
 # Arbitrage
 ################################################################################
 
-async def pair_arbitrage(df, pair, exchanges, exchangesBySymbol,\
+def trade_lock(exchange):
+    """ Returns the lock held while trading at exchange, kept on the
+    instance as its book semaphores
+    """
+    lock = getattr(exchange, 'trade_lock', None)
+    if lock is None:
+        lock = exchange.trade_lock = asyncio.Lock()
+    return(lock)
+
+
+class trade_locks:
+    """ Async context manager holding the trade locks of exchanges, taken
+    in exchange id order so concurrent scans can't deadlock
+    """
+
+    def __init__(self, *exchanges):
+        exchanges = {exchange.id: exchange for exchange in exchanges}
+        self.locks = [trade_lock(exchanges[id]) for id in sorted(exchanges)]
+
+    async def __aenter__(self):
+        acquired = []
+        try:
+            for lock in self.locks:
+                await lock.acquire()
+                acquired.append(lock)
+        except BaseException:
+            for lock in reversed(acquired):
+                lock.release()
+            raise
+
+    async def __aexit__(self, *exc_info):
+        for lock in reversed(self.locks):
+            lock.release()
+
+
+async def pair_arbitrage(prices, pair, exchanges, exchangesBySymbol,\
                          sellExchanges, buyExchanges,\
                          arbitrage=False, minSpread=5,\
-                         min_arb_amount_BTC=0.01, max_arb_amount_BTC=.01):
+                         min_arb_amount_BTC=0.01, max_arb_amount_BTC=.01,\
+                         concurrent=True, book_timeout=5, max_book_requests=2,\
+                         tickers=None, balances=None, settlement=None,\
+                         usd=None):
     """ 1) Calculate best spread for a pair at available exchanges
         2) Performs check and create arbitrage orders
+    prices is the SpreadTable keeping the latest order book row by exchange
+    Order books are requested from all exchanges at once when concurrent,
+    each call bounded by book_timeout seconds and max_book_requests per
+    exchange
+    tickers is the TickerCache for quote prices shared between pairs
+    balances is the BalanceCache serving the pre-trade funds check
+    settlement is the SettlementMonitor following the orders placed in the
+    background, the balances are otherwise polled until the trade settles
+    usd is the exchange quoting BTC and ETH in USD, usd_exchange() if None
     Returns portfolio gain in BTC (0 if no trade attempted)
     """
     ############################################################
     # Initialization
     ############################################################
 
+    tickers = tickers or default_tickers
+    balances = balances or default_balances
+    usd = usd or usd_exchange()
+
     quote_pair = pair.split("/")[1] # e.g. 'BTC'
     if quote_pair != 'BTC' and quote_pair != 'ETH':
         logger.warning(style.FAIL +\
@@ -147,7 +395,7 @@ async def pair_arbitrage(df, pair, exchanges, exchangesBySymbol,\
     for _ in range(3):
         try:
             quote_price =\
-            await ccxt.gemini().fetchTicker(quote_pair + '/USD')
+            await tickers.fetch_ticker(usd, quote_pair + '/USD')
         except Exception as mess:
             logger.warning(style.FAIL + "%s" + style.END, mess)
         else:
@@ -163,7 +411,7 @@ async def pair_arbitrage(df, pair, exchanges, exchangesBySymbol,\
     quote_rate = None
     for id in 'bittrex', 'binance':
         try:
-            quote_rate = await exchanges[id].fetchTicker(pair)
+            quote_rate = await tickers.fetch_ticker(exchanges[id], pair)
             quote_rate = quote_rate['ask']
         except Exception as mess:
             logger.warning(style.FAIL + "%s" + style.END, mess)
@@ -190,12 +438,25 @@ async def pair_arbitrage(df, pair, exchanges, exchangesBySymbol,\
     # Load orderbooks at all exchanges containing pair
     ############################################################
 
-    for id in exchangesBySymbol[pair]:
+    if concurrent:
+        books = await fetch_order_books(exchanges, exchangesBySymbol[pair], pair,\
+                                        timeout=book_timeout,\
+                                        max_concurrency=max_book_requests)
+    else:
+        books = dict()
+        for id in exchangesBySymbol[pair]:
+            try:
+                logger.debug("Exchange: %s pair: %s", id, pair)
+                books[id] = await fetch_order_book(exchanges[id], pair,\
+                                                   book_timeout,\
+                                                   max_book_requests)
+            except Exception as mess:
+                logger.warning(style.FAIL + "%s" + style.END, mess)
+
+    for id, orderbook in books.items():
         try:
-            logger.debug("Exchange: %s pair: %s", id, pair)
-            row = await load_order_book(exchanges[id], pair, min_arb_amount)
-            df = df.append(pd.DataFrame([row], columns=df.columns)\
-                            , ignore_index=True)
+            prices.update(order_book_row(exchanges[id], pair, orderbook,\
+                                         min_arb_amount))
         except Exception as mess:
             logger.warning(style.FAIL + "%s" + style.END, mess)
 
@@ -203,7 +464,9 @@ async def pair_arbitrage(df, pair, exchanges, exchangesBySymbol,\
     try:
         bb_exchange, best_bid, best_bid_size,\
             ba_exchange, best_ask, best_ask_size, spread =\
-                get_spread(pair, df, sellExchanges, buyExchanges)
+                prices.get_spread(pair,\
+                                  [id for id in sellExchanges if id in books],\
+                                  [id for id in buyExchanges if id in books])
 
         spreadString = "Biggest percent spread for %s: %s (sell %s, buy %s)"\
                 % (pair, spread, bb_exchange, ba_exchange)
@@ -213,7 +476,8 @@ async def pair_arbitrage(df, pair, exchanges, exchangesBySymbol,\
             logger.info(spreadString)
     except Exception as mess:
         logger.warning(style.FAIL + "%s" + style.END, mess)
-        logger.error("No spread calculated for %s at %s", pair, id)
+        logger.error("No spread calculated for %s at %s", pair,\
+                     exchangesBySymbol[pair])
         return(0)
 
     ############################################################
@@ -226,158 +490,246 @@ async def pair_arbitrage(df, pair, exchanges, exchangesBySymbol,\
     # Max amount in base currency
     max_arb_amount = max_arb_amount_BTC / best_bid
     max_arb_amount = max(max_arb_amount, min_arb_amount)
-    # Possible amount per order book
-    arb_amount = min(max_arb_amount, best_bid_size, best_ask_size)
+    # Possible amount per order book: largest amount whose VWAP spread,
+    # net of taker fees, still clears minSpread across both books
+    sell_fee = exchanges[bb_exchange].markets[pair].get('taker') or 0
+    buy_fee = exchanges[ba_exchange].markets[pair].get('taker') or 0
+    depth_amount, sell_vwap, buy_vwap =\
+        executable_amount(books[bb_exchange]['bids'], books[ba_exchange]['asks'],\
+                          minSpread, sell_fee, buy_fee, max_arb_amount)
+    arb_amount = min(max_arb_amount, depth_amount)
     logger.debug("Arb amount after orderbook adjustment %f", arb_amount)
 
-    # Check orderbook size - Should almost never happen
-    if not (min_arb_amount <= best_bid_size and\
-            min_arb_amount <= best_ask_size):
+    # Check orderbook size
+    if not (min_arb_amount <= depth_amount):
         logger.warning("  No order book size")
-        logger.info("  amount to sell %f bid_size %f", min_arb_amount, best_bid_size)
-        logger.info("  amount to buy %f ask_size %f", min_arb_amount, best_ask_size)
+        logger.info("  amount to trade %f executable amount %f",\
+                    min_arb_amount, depth_amount)
         return(0)
+    logger.debug("Sell VWAP %f, buy VWAP %f", sell_vwap, buy_vwap)
 
-    # Check funds
-    bb_balance = -1
-    ba_balance = -1
-    for _ in range(3):
+    # Balances of both exchanges are read and traded by one scan at a time
+    async with trade_locks(exchanges[bb_exchange], exchanges[ba_exchange]):
+        # Check funds
+        bb_balance = -1
+        ba_balance = -1
+        for _ in range(3):
+            try:
+                bb_balance, ba_balance = await asyncio.gather(\
+                    balances.fetch_balance(exchanges[bb_exchange]),\
+                    balances.fetch_balance(exchanges[ba_exchange]))
+            except Exception as mess:
+                logger.warning(style.FAIL + "%s" + style.END, mess)
+            else:
+                break
+        if bb_balance == -1:
+            logger.warning(style.FAIL + "Balance couldn't be retrieved%s"\
+                           + style.END, bb_exchange)
+            return(0)
+        if ba_balance == -1:
+            logger.warning(style.FAIL + "Balance couldn't be retrieved%s"\
+                           + style.END, ba_balance)
+            return(0)
+
+        # Rounding below needed for gdax
+        # Will also loosen the limit and trigger more executions
+        sell_price = math.floor(best_bid*0.99 * 1e5) / 1e5
+        buy_price = math.ceil(best_ask*1.01 * 1e5) / 1e5
+
+        # Check wallet exist, reduce arb_amount to what funds allow
         try:
-            bb_balance = await exchanges[bb_exchange].fetch_balance()
-            ba_balance = await exchanges[ba_exchange].fetch_balance()
+            arb_amount = min(.995 * bb_balance[pair.split("/")[0]]['total'],\
+                             .995 * ba_balance[pair.split("/")[1]]['total']/buy_price,\
+                             arb_amount) # .995 to account for fees
+            logger.debug("Arb amount after funds check %f", arb_amount)
+            logger.debug("min_arb_amount %f", min_arb_amount)
         except Exception as mess:
-            logger.warning(style.FAIL + "%s" + style.END, mess)
-        else:
-            break
-    if bb_balance == -1:
-        logger.warning(style.FAIL + "Balance couldn't be retrieved%s"\
-                       + style.END, bb_exchange)
-        return(0)
-    if ba_balance == -1:
-        logger.warning(style.FAIL + "Balance couldn't be retrieved%s"\
-                       + style.END, ba_balance)
-        return(0)
-
-    # Rounding below needed for gdax
-    # Will also loosen the limit and trigger more executions
-    sell_price = math.floor(best_bid*0.99 * 1e5) / 1e5
-    buy_price = math.ceil(best_ask*1.01 * 1e5) / 1e5
-
-    # Check wallet exist, reduce arb_amount to what funds allow
-    try:
-        arb_amount = min(.995 * bb_balance[pair.split("/")[0]]['total'],\
-                         .995 * ba_balance[pair.split("/")[1]]['total']/buy_price,\
-                         arb_amount) # .995 to account for fees
-        logger.debug("Arb amount after funds check %f", arb_amount)
-        logger.debug("min_arb_amount %f", min_arb_amount)
-    except Exception as mess:
-        logger.warning(style.LIGHTBLUE + "No wallet defined %s" + style.END, mess)
-        return(0)
-
-    # Check enough funds
-    if not (arb_amount >= min_arb_amount):
-        logger.warning("  Not enough funds")
-        logger.info("  sell balance %s %s %f", bb_exchange, pair.split("/")[0],
-              bb_balance[pair.split("/")[0]]['total'])
-        logger.info("  Minimum amount %f", min_arb_amount)
-        logger.info("  buy balance %s %s %f", ba_exchange, pair.split("/")[1],
-              ba_balance[pair.split("/")[1]]['total'])
-        logger.info("  Minimum amount %f", min_arb_amount * buy_price)
-        return(0)
+            logger.warning(style.LIGHTBLUE + "No wallet defined %s" + style.END, mess)
+            return(0)
+
+        # Check enough funds
+        if not (arb_amount >= min_arb_amount):
+            logger.warning("  Not enough funds")
+            logger.info("  sell balance %s %s %f", bb_exchange, pair.split("/")[0],
+                  bb_balance[pair.split("/")[0]]['total'])
+            logger.info("  Minimum amount %f", min_arb_amount)
+            logger.info("  buy balance %s %s %f", ba_exchange, pair.split("/")[1],
+                  ba_balance[pair.split("/")[1]]['total'])
+            logger.info("  Minimum amount %f", min_arb_amount * buy_price)
+            return(0)
+
+
+        # Prevent "order too precise" error
+        arb_amount = math.floor(arb_amount *1e4) / 1e4
+
+        # Arbitrage
+        logger.info(style.BOLD + "***** arbitrage *****" + style.END)
+        logger.info("Amount in USD: %f", arb_amount * quote_price['ask'] * best_bid)
+        # print("Amount in USD",\
+        #       arb_amount * 15000 * best_bid) # TODO get BTC price in USD
+        logger.info("Sell %s %s amount: %f %f",\
+                    bb_exchange, pair, arb_amount, sell_price)
+        # print("Sell", bb_exchange, pair, "amount", arb_amount, sell_price)
+        logger.info("Buy %s %s amount: %f %f",\
+                    ba_exchange, pair, arb_amount, buy_price)
+        # print("Buy", ba_exchange, pair, "amount", arb_amount, buy_price)
+
+        # Launch orders
+        sell_success = 0
+        for _ in range(3):
+            try:
+                sell_order = await exchanges[bb_exchange].\
+            create_limit_sell_order(pair, arb_amount, sell_price)
+                logger.info("Sell order: %s", sell_order)
+            except Exception as mess:
+                logger.warning(style.FAIL + "Sell order failed" + style.END)
+                logger.warning(style.FAIL + "%s" + style.END, mess)
+            else:
+                sell_success = 1
+                # the order is placed, a failure here must not place another
+                try:
+                    balances.order_placed(exchanges[bb_exchange], pair, 'sell',\
+                                          arb_amount, sell_price)
+                except Exception as mess:
+                    logger.warning(style.FAIL + "%s" + style.END, mess)
+                break
 
+        # Terminate pair arbitrage if no sell order was created
+        if sell_success == 0:
+            logger.warning(style.FAIL + "No Sell order created, skipping" + style.END)
+            return(0)
 
-    # Prevent "order too precise" error
-    arb_amount = math.floor(arb_amount *1e4) / 1e4
+        buy_order = None
+        for _ in range(5):
+            try:
+                buy_order = await exchanges[ba_exchange].\
+                    create_limit_buy_order(pair, arb_amount, buy_price)
+                logger.info("Buy order: %s", buy_order)
+            except Exception as mess:
+                logger.warning(style.FAIL + "Buy order failed" + style.END)
+                logger.warning(style.FAIL + "%s" + style.END, mess)
+                await asyncio.sleep(3)
+            else:
+                try:
+                    balances.order_placed(exchanges[ba_exchange], pair, 'buy',\
+                                          arb_amount, buy_price)
+                except Exception as mess:
+                    logger.warning(style.FAIL + "%s" + style.END, mess)
+                break
 
-    # Arbitrage
-    logger.info(style.BOLD + "***** arbitrage *****" + style.END)
-    logger.info("Amount in USD: %f", arb_amount * quote_price['ask'] * best_bid)
-    # print("Amount in USD",\
-    #       arb_amount * 15000 * best_bid) # TODO get BTC price in USD
-    logger.info("Sell %s %s amount: %f %f",\
-                bb_exchange, pair, arb_amount, sell_price)
-    # print("Sell", bb_exchange, pair, "amount", arb_amount, sell_price)
-    logger.info("Buy %s %s amount: %f %f",\
-                ba_exchange, pair, arb_amount, buy_price)
-    # print("Buy", ba_exchange, pair, "amount", arb_amount, buy_price)
+        if settlement is not None:
+            # the scan goes on while the orders fill
+            settlement.track(exchanges, pair,\
+                             (bb_exchange, sell_order, sell_price),\
+                             (ba_exchange, buy_order, buy_price), arb_amount,\
+                             rate=quote_rate, usd=quote_price['ask'])
+            return(1)
+
+        # Check portfolio went up
+        portfolio_up = False
+        portfolio_counter = 0
+        while portfolio_up == False and portfolio_counter < 50:
+            # try getting balance up to 3 times
+            for _ in range(3):
+                try:
+                    bb_balance_after = await exchanges[bb_exchange].fetch_balance()
+                    ba_balance_after = await exchanges[ba_exchange].fetch_balance()
+                    balances.update(bb_exchange, bb_balance_after)
+                    balances.update(ba_exchange, ba_balance_after)
+                except Exception as mess:
+                    logger.warning(style.FAIL + "%s" + style.END, mess)
+                else:
+                    break
+            try:
+                portfolio_up, base_diff, quote_diff =\
+                    balance_check(pair.split("/")[0], pair.split("/")[1],\
+                                     bb_balance, ba_balance,\
+                                     bb_balance_after, ba_balance_after, arb_amount)
+            except Exception as mess:
+                logger.warning(style.FAIL + "%s" + style.END, mess)
+            if not portfolio_up:
+                await asyncio.sleep(5)
+            portfolio_counter += 1
 
-    # Launch orders
-    sell_success = 0
-    for _ in range(3):
+        # trade gain in BTC
         try:
-            sell_order = await exchanges[bb_exchange].\
-        create_limit_sell_order(pair, arb_amount, sell_price)
-            logger.info("Sell order: %s", sell_order)
-        except Exception as mess:
-            logger.warning(style.FAIL + "Sell order failed" + style.END)
-            logger.warning(style.FAIL + "%s" + style.END, mess)
-        else:
-            sell_success = 1
-            break
+            trade_gain_BTC = base_diff * quote_rate + quote_diff
+            trade_gain_USD = trade_gain_BTC * quote_price['ask']
 
-    # Terminate pair arbitrage if no sell order was created
-    if sell_success == 0:
-        logger.warning(style.FAIL + "No Sell order created, skipping" + style.END)
-        Return(0)
+            logger.info("Trade gain (USD) %f, Percentage gain %f",\
+                        trade_gain_USD,\
+                        100 * (trade_gain_BTC) / (arb_amount * best_bid))
 
-    for _ in range(5):
-        try:
-            buy_order = await exchanges[ba_exchange].\
-                create_limit_buy_order(pair, arb_amount, buy_price)
-            logger.info("Buy order: %s", buy_order)
-        except Exception as mess:
-            logger.warning(style.FAIL + "Buy order failed" + style.END)
-            logger.warning(style.FAIL + "%s" + style.END, mess)
-            time.sleep(3)
+        except:
+            logger.warning(style.FAIL +\
+                           "Balances cannot be updated,\
+                       probably because order didn't go through. Exiting"\
+                            + style.END, mess)
+            return(-1)
+
+        if portfolio_up:
+            return(1)
         else:
-            break
+            return(-1)
 
 
+################################################################################
+# Scanner
+################################################################################
 
-    # Check portfolio went up
-    portfolio_up = False
-    portfolio_counter = 0
-    while portfolio_up == False and portfolio_counter < 50:
-        # try getting balance up to 3 times
-        for _ in range(3):
+async def scan_pairs(pairs, scan, cycles=1, max_in_flight=10,\
+                     after_cycle=None, select_pairs=None, max_scans=None):
+    """ Call scan(pair) for every pair, cycles times, with at most
+    max_in_flight pairs scanned at once
+    scan is a coroutine function returning pair_arbitrage results: pairs
+    returning 1 (arbitrage made) are scanned again in the same cycle, -1
+    stops the scanner once in-flight scans are done
+    At most max_scans scans are made in all, cycles * len(pairs) by
+    default: rescans after an arbitrage count towards it
+    select_pairs(pairs) is a coroutine function returning the pairs worth
+    scanning in a cycle (see ticker_candidates), all pairs by default
+    after_cycle(cycle) is called at the end of every cycle
+    Returns the number of scans made
+    """
+    if max_scans is None:
+        max_scans = cycles * len(pairs)
+    state = {'scans': 0, 'started': 0, 'interrupted': False}
+
+    async def worker(queue):
+        while not (queue.empty() or state['interrupted']\
+                   or state['started'] >= max_scans):
+            pair = queue.get_nowait()
+            state['started'] += 1
             try:
-                bb_balance_after = await exchanges[bb_exchange].fetch_balance()
-                ba_balance_after = await exchanges[ba_exchange].fetch_balance()
+                result = await scan(pair)
             except Exception as mess:
-                logger.warning(style.FAIL + "%s" + style.END, mess)
-            else:
-                break
-        try:
-            portfolio_up, base_diff, quote_diff =\
-                balance_check(pair.split("/")[0], pair.split("/")[1],\
-                                 bb_balance, ba_balance,\
-                                 bb_balance_after, ba_balance_after, arb_amount)
-        except Exception as mess:
-            logger.warning(style.FAIL + "%s" + style.END, mess)
-        if not portfolio_up:
-            time.sleep(5)
-        portfolio_counter += 1
-
-    # trade gain in BTC
-    try:
-        trade_gain_BTC = base_diff * quote_rate + quote_diff
-        trade_gain_USD = trade_gain_BTC * quote_price['ask']
-
-        logger.info("Trade gain (USD) %f, Percentage gain %f",\
-                    trade_gain_USD,\
-                    100 * (trade_gain_BTC) / (arb_amount * best_bid))
+                logger.warning(style.FAIL + "%s %s" + style.END, pair, mess)
+                result = 0
+            state['scans'] += 1
+            if result == -1:
+                logger.info(style.FAIL + "Interrupting" + style.END)
+                state['interrupted'] = True
+            elif result == 1: # stay on same pair if arbitrage was made
+                queue.put_nowait(pair)
+
+    for cycle in range(cycles):
+        started = time.time()
+        cycle_pairs = pairs
+        if select_pairs is not None:
+            cycle_pairs = await select_pairs(pairs)
+        queue = asyncio.Queue()
+        for pair in cycle_pairs:
+            queue.put_nowait(pair)
+        await asyncio.gather(*[worker(queue) for _ in\
+                               range(max(1, min(max_in_flight, len(cycle_pairs))))])
+        logger.debug("Cycle %d: %d pairs in %.2f s", cycle + 1,\
+                     len(cycle_pairs), time.time() - started)
+        if after_cycle is not None:
+            after_cycle(cycle)
+        if state['interrupted'] or state['started'] >= max_scans:
+            break
 
-    except:
-        logger.warning(style.FAIL +\
-                       "Balances cannot be updated,\
-                       probably because order didn't go through. Exiting"\
-                        + style.END, mess)
-        return(-1)
-
-    if portfolio_up:
-        return(1)
-    else:
-        return(-1)
+    return(state['scans'])
 
 
 ################################################################################
@@ -401,9 +753,56 @@ def balance_check(base, quote, bb_balance, ba_balance,\
 
 
 
-async def portfolio_balance(exchanges, arbitrableSymbols, inBTC=False):
+async def btc_rates(exchanges, currencies, ids=('bittrex', 'binance')):
+    """ {currency: currency/BTC ticker} from the first of ids listing it, 0
+    if none could be loaded
+    One fetch_tickers call per exchange of ids supporting it, fetchTicker
+    for the currencies left
+    """
+    ids = [id for id in ids if id in exchanges]
+    bulk = [id for id in ids if exchanges[id].has.get('fetchTickers')]
+    results = await asyncio.gather(*[exchanges[id].fetch_tickers()\
+                                     for id in bulk], return_exceptions=True)
+    loaded = dict()
+    for id, result in zip(bulk, results):
+        if isinstance(result, Exception):
+            logger.warning(style.FAIL + "%s" + style.END, result)
+        else:
+            loaded[id] = result
+
+    async def fetch_rate(curr):
+        for id in ids:
+            if id in loaded:
+                if curr + '/BTC' in loaded[id]:
+                    return(loaded[id][curr + '/BTC'])
+                continue # not listed
+            try:
+                return(await exchanges[id].fetchTicker(curr + '/BTC'))
+            except Exception as mess:
+                logger.warning(style.FAIL + "%s" + style.END, mess)
+        return(0)
+
+    rates = await asyncio.gather(*[fetch_rate(curr) for curr in currencies])
+    return(dict(zip(currencies, rates)))
+
+
+async def fetch_balance_retry(exchange, tries=3):
+    """ exchange.fetch_balance(), None if it failed tries times
+    """
+    for _ in range(tries):
+        try:
+            return(await exchange.fetch_balance())
+        except Exception as mess:
+            logger.warning(style.FAIL + "%s" + style.END, mess)
+    return(None)
+
+
+async def portfolio_balance(exchanges, arbitrableSymbols, inBTC=False,\
+                            balances=None):
     """ Returns the value of the portfolio in BTC for all currencies in
     arbitrable pairs
+    Balances and BTC rates are requested at all exchanges at once
+    Balances fetched are stored in the BalanceCache balances if given
     """
     logger.info(style.OKBLUE + "Loading Portfolio Balances" + style.END)
     portfolio = defaultdict()
@@ -414,32 +813,25 @@ async def portfolio_balance(exchanges, arbitrableSymbols, inBTC=False):
         Currencies.append(pair.split('/')[0])
     Currencies = list(set(Currencies))
 
+    requests = [fetch_balance_retry(exchange) for exchange in exchanges.values()]
     if inBTC:
         logger.info("...loading BTC rates...")
-        CurrenciesBitcoinRate = dict()
-        for curr in Currencies:
-            for id in 'bittrex', 'binance':
-                try:
-                    CurrenciesBitcoinRate[curr] =\
-                    await exchanges[id].fetchTicker(curr + '/BTC')
-                except Exception as mess:
-                    logger.warning(style.FAIL + "%s" + style.END, mess)
-                    CurrenciesBitcoinRate[curr] = 0
-                else:
-                    break
+        requests.append(btc_rates(exchanges, Currencies))
+        requests.append(usd_exchange().fetch_ticker('BTC/USD'))
+    results = await asyncio.gather(*requests, return_exceptions=True)
+    if inBTC:
+        CurrenciesBitcoinRate, BTC_price = results[-2:]
+        if isinstance(BTC_price, Exception):
+            logger.warning(style.FAIL + "%s" + style.END, BTC_price)
 
     Currencies.append('BTC')
 
     BTC_value = 0
-    for id, exchange in exchanges.items():
-        # try getting balance up to 3 times
-        for _ in range(3):
-            try:
-                balance = await exchange.fetch_balance()
-            except Exception as mess:
-                logger.warning(style.FAIL + "%s" + style.END, mess)
-            else:
-                break
+    for (id, exchange), balance in zip(exchanges.items(), results):
+        if balance is None:
+            continue
+        if balances is not None:
+            balances.update(id, balance)
 
         logger.info(style.BOLD + "Exchange: %s" + style.END, id)
         for curr in Currencies:
@@ -472,8 +864,8 @@ async def portfolio_balance(exchanges, arbitrableSymbols, inBTC=False):
                 except:
                     pass
         logger.info("Total portfolio balance: %f (BTC)", BTC_value)
-        BTC_price = await ccxt.gemini().fetchTicker('BTC/USD')
-        logger.info("Total portfolio balance: %f (USD)",\
-                    BTC_value * BTC_price['ask'])
+        if not isinstance(BTC_price, Exception):
+            logger.info("Total portfolio balance: %f (USD)",\
+                        BTC_value * BTC_price['ask'])
 
     return(portfolio)
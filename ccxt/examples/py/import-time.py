@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+
+import os
+import subprocess
+import sys
+
+root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(root + '/python')
+
+# compares cold start times, each case runs in a fresh interpreter
+# usage: python import-time.py [ccxt|ccxt.async] [runs]
+
+package = sys.argv[1] if len(sys.argv) > 1 else 'ccxt'
+runs = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+
+venues = ['binance', 'bittrex', 'gdax', 'gemini', 'kraken', 'poloniex']
+
+cases = [
+    ('import ' + package, ''),
+    ('import + ' + str(len(venues)) + ' venues', 'for id in ' + repr(venues) + ': getattr(ccxt, id)'),
+    ('import + all exchanges (eager)', 'for id in ccxt.exchanges: getattr(ccxt, id)'),
+]
+
+template = '''
+import time
+start = time.time()
+import {package} as ccxt
+{statement}
+print(time.time() - start)
+'''
+
+env = dict(os.environ)
+env['PYTHONPATH'] = os.pathsep.join([root + '/python', env.get('PYTHONPATH', '')])
+
+for name, statement in cases:
+    script = template.format(package=package, statement=statement)
+    times = []
+    for run in range(runs):
+        output = subprocess.check_output([sys.executable, '-c', script], env=env)
+        times.append(float(output))
+    print('{:40} best {:8.1f} ms   mean {:8.1f} ms'.format(name, 1000 * min(times), 1000 * sum(times) / len(times)))
@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+
+import json
+import os
+import random
+import sys
+import timeit
+
+root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(root + '/python')
+
+import ccxt  # noqa: E402
+from ccxt.base.exchange import json_decode  # noqa: E402
+
+# times JSON decoding of large REST payloads with the available decoders
+# usage: python json-decode.py [payloads dir] [--record]
+# --record saves live payloads (binance depth and tickers, bittrex summaries)
+# to the payloads dir, without payloads recorded synthetic ones are used
+
+directory = sys.argv[1] if len(sys.argv) > 1 and not sys.argv[1].startswith('--') else None
+record = '--record' in sys.argv
+
+requests = [
+    ('binance-depth-100', 'binance', 'publicGetDepth', {'symbol': 'ETHBTC', 'limit': 100}),
+    ('binance-tickers', 'binance', 'publicGetTicker24hr', {}),
+    ('bittrex-summaries', 'bittrex', 'publicGetMarketsummaries', {}),
+]
+
+
+def synthetic():
+    price = lambda: '%.8f' % random.uniform(0.01, 0.1)  # noqa: E731
+    depth = {
+        'lastUpdateId': 123456789,
+        'bids': [[price(), '%.8f' % random.uniform(0, 100), []] for i in range(100)],
+        'asks': [[price(), '%.8f' % random.uniform(0, 100), []] for i in range(100)],
+    }
+    fields = [
+        'priceChange', 'priceChangePercent', 'weightedAvgPrice', 'prevClosePrice',
+        'lastPrice', 'lastQty', 'bidPrice', 'bidQty', 'askPrice', 'askQty',
+        'openPrice', 'highPrice', 'lowPrice', 'volume', 'quoteVolume',
+    ]
+    tickers = []
+    for i in range(300):
+        ticker = dict((key, price()) for key in fields)
+        ticker.update({'symbol': 'SYM%dBTC' % i, 'openTime': 1517000000000, 'closeTime': 1517086400000,
+                       'firstId': 1, 'lastId': 100000, 'count': 100000})
+        tickers.append(ticker)
+    return [('synthetic-depth-100', json.dumps(depth)), ('synthetic-tickers', json.dumps(tickers))]
+
+
+def recorded():
+    payloads = []
+    for name, id, method, params in requests:
+        path = os.path.join(directory, name + '.json')
+        if record:
+            exchange = getattr(ccxt, id)({'parseJsonResponse': False})
+            with open(path, 'w') as f:
+                f.write(getattr(exchange, method)(params))
+        if os.path.exists(path):
+            with open(path) as f:
+                payloads.append((name, f.read()))
+    return payloads
+
+
+decoders = [
+    ('json.loads(str)', lambda text, data: json.loads(text)),
+    ('json.loads(bytes.decode())', lambda text, data: json.loads(data.decode('utf-8'))),
+    ('json_decode(str)', lambda text, data: json_decode(text)),
+    ('json_decode(bytes)', lambda text, data: json_decode(data)),
+]
+
+payloads = (recorded() if directory else []) or synthetic()
+for name, text in payloads:
+    data = text.encode('utf-8')
+    print('{} ({:.1f} kB)'.format(name, len(data) / 1000.0))
+    for decoder_name, decode in decoders:
+        runs = 200
+        best = min(timeit.repeat(lambda: decode(text, data), number=runs, repeat=5)) / runs
+        print('    {:30} {:8.1f} us'.format(decoder_name, 1e6 * best))
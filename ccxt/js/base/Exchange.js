@@ -85,6 +85,7 @@ module.exports = class Exchange {
         // rate limiter settings
         this.enableRateLimit  = false
         this.rateLimit        = 2000  // milliseconds = seconds * 1000
+        this.weights          = {}    // request weights { api: { path: cost }}, e.g. binance
 
         this.parseJsonResponse             = true  // whether a reply is required to be in JSON or not
         this.substituteCommonCurrencyCodes = true  // reserved
@@ -251,6 +252,14 @@ module.exports = class Exchange {
         })
     }
 
+    requestCost (path, api = 'public', method = 'GET', params = {}) {
+        // tokens taken by a request: weights[api][path], or weights[api][path][method], or the default cost
+        let weight = this.safeValue (this.safeValue (this.weights, api, {}), path)
+        if ((typeof weight == 'object') && (weight !== null))
+            weight = weight[method]
+        return weight
+    }
+
     initRestRateLimiter () {
 
         this.tokenBucket = this.extend ({
@@ -362,7 +371,7 @@ module.exports = class Exchange {
     async fetch2 (path, api = 'public', method = 'GET', params = {}, headers = undefined, body = undefined) {
 
         if (this.enableRateLimit)
-            await this.throttle ()
+            await this.throttle (this.requestCost (path, api, method, params))
 
         let request = this.sign (path, api, method, params, headers, body)
         return this.fetch (request.url, request.method, request.headers, request.body)
@@ -15,6 +15,33 @@ module.exports = class binance extends Exchange {
             'name': 'Binance',
             'countries': 'CN', // China
             'rateLimit': 500,
+            // the async rate limiter counts request weights, 1200 per minute
+            'tokenBucket': {
+                'refillRate': 0.02,
+                'capacity': 20,
+            },
+            'weights': {
+                'public': {
+                    'exchangeInfo': 1,
+                    'ping': 1,
+                    'time': 1,
+                    'depth': 1, // limit <= 100, see requestCost
+                    'aggTrades': 1,
+                    'klines': 1,
+                    'ticker/24hr': 1, // one symbol, 40 for all
+                    'ticker/allPrices': 1,
+                    'ticker/allBookTickers': 1,
+                },
+                'private': {
+                    'order': 1,
+                    'order/test': 1,
+                    'openOrders': 1, // one symbol, 40 for all
+                    'allOrders': 5,
+                    'account': 5,
+                    'myTrades': 5,
+                    'userDataStream': 1,
+                },
+            },
             'hasCORS': false,
             // obsolete metainfo interface
             'hasFetchTickers': true,
@@ -693,6 +720,23 @@ module.exports = class binance extends Exchange {
         };
     }
 
+    requestCost (path, api = 'public', method = 'GET', params = {}) {
+        if (path == 'depth') {
+            let limit = this.safeInteger (params, 'limit', 100);
+            if (limit <= 100)
+                return 1;
+            if (limit <= 500)
+                return 5;
+            return 10;
+        }
+        if ((path == 'ticker/24hr') || (path == 'openOrders')) {
+            let symbol = this.safeValue (params, 'symbol');
+            if (typeof symbol == 'undefined')
+                return 40;
+        }
+        return this.safeValue (this.safeValue (this.weights, api, {}), path);
+    }
+
     sign (path, api = 'public', method = 'GET', params = {}, headers = undefined, body = undefined) {
         let url = this.urls['api'][api];
         url += '/' + path;
@@ -10,6 +10,33 @@ class binance extends Exchange {
             'name' => 'Binance',
             'countries' => 'CN', // China
             'rateLimit' => 500,
+            // the async rate limiter counts request weights, 1200 per minute
+            'tokenBucket' => array (
+                'refillRate' => 0.02,
+                'capacity' => 20,
+            ),
+            'weights' => array (
+                'public' => array (
+                    'exchangeInfo' => 1,
+                    'ping' => 1,
+                    'time' => 1,
+                    'depth' => 1, // limit <= 100, see requestCost
+                    'aggTrades' => 1,
+                    'klines' => 1,
+                    'ticker/24hr' => 1, // one symbol, 40 for all
+                    'ticker/allPrices' => 1,
+                    'ticker/allBookTickers' => 1,
+                ),
+                'private' => array (
+                    'order' => 1,
+                    'order/test' => 1,
+                    'openOrders' => 1, // one symbol, 40 for all
+                    'allOrders' => 5,
+                    'account' => 5,
+                    'myTrades' => 5,
+                    'userDataStream' => 1,
+                ),
+            ),
             'hasCORS' => false,
             // obsolete metainfo interface
             'hasFetchTickers' => true,
@@ -688,6 +715,23 @@ class binance extends Exchange {
         );
     }
 
+    public function request_cost ($path, $api = 'public', $method = 'GET', $params = array ()) {
+        if ($path == 'depth') {
+            $limit = $this->safe_integer($params, 'limit', 100);
+            if ($limit <= 100)
+                return 1;
+            if ($limit <= 500)
+                return 5;
+            return 10;
+        }
+        if (($path == 'ticker/24hr') || ($path == 'openOrders')) {
+            $symbol = $this->safe_value($params, 'symbol');
+            if ($symbol === null)
+                return 40;
+        }
+        return $this->safe_value($this->safe_value($this->weights, $api, array ()), $path);
+    }
+
     public function sign ($path, $api = 'public', $method = 'GET', $params = array (), $headers = null, $body = null) {
         $url = $this->urls['api'][$api];
         $url .= '/' . $path;
@@ -9,9 +9,7 @@ __version__ = '1.10.437'
 import asyncio
 import concurrent
 import socket
-import time
-import math
-import random
+import warnings
 
 import aiohttp
 
@@ -40,45 +38,99 @@ __all__ = [
 
 class Exchange(BaseExchange):
 
+    # aiohttp connection pool of the session created by the exchange
+    connectionPool = {
+        'limit': 100,  # connections open at once, 0 for no limit
+        'limitPerHost': 0,  # connections open at once to one host, 0 for no limit
+        'keepAliveTimeout': 30,  # seconds an idle connection is kept for reuse
+        'dnsCacheTTL': 300,  # seconds a resolved host is cached, None to cache forever
+        'useDnsCache': True,
+    }
+    shareSession = False  # one session for all the exchanges with this connectionPool on this loop
+
+    shared_sessions = {}  # {(loop, connection pool options): [session, exchanges using it]}
+
+    markets_refresh = None  # task reloading markets served from a stale marketsCache
+
     def __init__(self, config={}):
         super(Exchange, self).__init__(config)
         self.asyncio_loop = self.asyncio_loop or asyncio.get_event_loop()
-        self.aiohttp_session = self.aiohttp_session or aiohttp.ClientSession(loop=self.asyncio_loop)
+        self.own_session = not self.aiohttp_session
+        if self.own_session:
+            self.aiohttp_session = self.open_session()
         self.init_rest_rate_limiter()
 
     def __del__(self):
-        if self.aiohttp_session:
-            self.aiohttp_session.close()
+        # a finalizer can't wait for close(): it is scheduled on the running loop, otherwise
+        # the session is left to aiohttp with a warning (__init__ may have failed early)
+        session = getattr(self, 'aiohttp_session', None)
+        if not getattr(self, 'own_session', False) or not session or session.closed:
+            return
+        loop = getattr(self, 'asyncio_loop', None)
+        if loop is not None and loop.is_running():
+            loop.call_soon_threadsafe(loop.create_task, self.close())
+        else:
+            warnings.warn(str(getattr(self, 'id', None)) + ' was not closed, call await exchange.close() when done', ResourceWarning)
+
+    def session_key(self):
+        return (self.asyncio_loop, tuple(sorted(self.connectionPool.items())))
+
+    def create_connector(self):
+        return aiohttp.TCPConnector(
+            limit=self.connectionPool['limit'],
+            limit_per_host=self.connectionPool['limitPerHost'],
+            keepalive_timeout=self.connectionPool['keepAliveTimeout'],
+            use_dns_cache=self.connectionPool['useDnsCache'],
+            ttl_dns_cache=self.connectionPool['dnsCacheTTL'],
+            loop=self.asyncio_loop)
+
+    def open_session(self):
+        """Session with a pooled connector, shared with the other exchanges of the same pool settings if shareSession"""
+        if not self.shareSession:
+            return aiohttp.ClientSession(connector=self.create_connector(), loop=self.asyncio_loop)
+        key = self.session_key()
+        shared = Exchange.shared_sessions.get(key)
+        if shared is None or shared[0].closed:
+            shared = Exchange.shared_sessions[key] = [aiohttp.ClientSession(connector=self.create_connector(), loop=self.asyncio_loop), 0]
+        shared[1] += 1
+        return shared[0]
+
+    async def close(self):
+        """Close the session of the exchange, a shared session once no other exchange uses it"""
+        refresh = self.markets_refresh
+        if refresh is not None:
+            refresh.cancel()
+            try:
+                await refresh
+            except (asyncio.CancelledError, Exception):
+                pass  # a failed refresh was reported by markets_refreshed
+        session, self.aiohttp_session = self.aiohttp_session, None
+        if not self.own_session or not session or session.closed:
+            return
+        if self.shareSession:
+            key = self.session_key()
+            shared = Exchange.shared_sessions.get(key)
+            if shared is not None and shared[0] is session:
+                shared[1] -= 1
+                if shared[1] > 0:
+                    return
+                del Exchange.shared_sessions[key]
+        closed = session.close()
+        if asyncio.iscoroutine(closed) or isinstance(closed, asyncio.Future):
+            await closed
 
     def init_rest_rate_limiter(self):
         self.throttle = throttle(self.extend({
             'loop': self.asyncio_loop,
         }, self.tokenBucket))
 
-    async def wait_for_token(self):
-        while self.rateLimitTokens <= 1:
-            # if self.verbose:
-            #     print('Waiting for tokens: Exchange: {0}'.format(self.id))
-            self.add_new_tokens()
-            seconds_delays = [0.001, 0.005, 0.022, 0.106, 0.5]
-            delay = random.choice(seconds_delays)
-            await asyncio.sleep(delay)
-        self.rateLimitTokens -= 1
-
-    def add_new_tokens(self):
-        # if self.verbose:
-        #     print('Adding new tokens: Exchange: {0}'.format(self.id))
-        now = time.monotonic()
-        time_since_update = now - self.rateLimitUpdateTime
-        new_tokens = math.floor((0.8 * 1000.0 * time_since_update) / self.rateLimit)
-        if new_tokens > 1:
-            self.rateLimitTokens = min(self.rateLimitTokens + new_tokens, self.rateLimitMaxTokens)
-            self.rateLimitUpdateTime = now
+    async def wait_for_token(self, cost=None):
+        await self.throttle(cost)
 
     async def fetch2(self, path, api='public', method='GET', params={}, headers=None, body=None):
         """A better wrapper over request for deferred signing"""
         if self.enableRateLimit:
-            await self.throttle()
+            await self.throttle(self.request_cost(path, api, method, params))
         self.lastRestRequestTimestamp = self.milliseconds()
         request = self.sign(path, api, method, params, headers, body)
         return await self.fetch(request['url'], request['method'], request['headers'], request['body'])
@@ -102,7 +154,7 @@ class Exchange(BaseExchange):
         session_method = getattr(self.aiohttp_session, method.lower())
         try:
             async with session_method(url, data=encoded_body, headers=headers, timeout=(self.timeout / 1000), proxy=self.aiohttp_proxy) as response:
-                text = await response.text()
+                text = self.decode_body(await response.read(), response.charset)
                 self.handle_errors(response.status, text, url, method, None, text)
                 self.handle_rest_errors(None, response.status, text, url, method)
         except socket.gaierror as e:
@@ -123,12 +175,31 @@ class Exchange(BaseExchange):
                 if not self.markets_by_id:
                     return self.set_markets(self.markets)
                 return self.markets
+            cache = self.read_markets_cache()
+            if cache is not None:
+                if self.markets_cache_stale(cache):
+                    self.refresh_markets()  # served stale while reloaded in the background
+                return self.set_markets(cache['markets'], cache['currencies'])
         markets = await self.fetch_markets()
         currencies = None
         if self.has['fetchCurrencies']:
             currencies = await self.fetch_currencies()
+        self.write_markets_cache(markets, currencies)
         return self.set_markets(markets, currencies)
 
+    def refresh_markets(self):
+        """Reload markets and the marketsCache in a background task, returns the task"""
+        if self.markets_refresh is None:
+            self.markets_refresh = asyncio.ensure_future(self.load_markets(reload=True), loop=self.asyncio_loop)
+            self.markets_refresh.add_done_callback(self.markets_refreshed)
+        return self.markets_refresh
+
+    def markets_refreshed(self, task):
+        self.markets_refresh = None
+        if not task.cancelled() and task.exception() is not None:
+            if self.verbose:
+                print('markets not refreshed:', task.exception())  # the stale markets stay in use
+
     async def fetch_order_status(self, id, market=None):
         order = await self.fetch_order(id)
         return order['status']
@@ -140,8 +211,8 @@ class Exchange(BaseExchange):
     async def fetch_l2_order_book(self, symbol, params={}):
         orderbook = await self.fetch_order_book(symbol, params)
         return self.extend(orderbook, {
-            'bids': self.sort_by(self.aggregate(orderbook['bids']), 0, True),
-            'asks': self.sort_by(self.aggregate(orderbook['asks']), 0),
+            'bids': self.aggregate_bids_asks(orderbook['bids'], True),
+            'asks': self.aggregate_bids_asks(orderbook['asks']),
         })
 
     async def update_order(self, id, symbol, *args):
@@ -1,50 +1,107 @@
 # -*- coding: utf-8 -*-
 
-from asyncio import Queue, sleep, Future, ensure_future, get_event_loop
-from time import time
+from asyncio import get_event_loop
+from collections import deque
 
 __all__ = [
+    'Throttle',
     'throttle',
 ]
 
 
-def throttle(config=None):
+class Throttle(object):
+    """Token bucket rate limiter driven by the event loop
+
+    Tokens refill continuously at refillRate tokens per millisecond up to
+    capacity, which is the burst size. A request of a given cost (weight)
+    waits until the bucket holds that many tokens, in arrival order; a cost
+    above capacity waits for a full bucket. Instead of polling, one timer is
+    set for the exact time the request at the head of the queue can go.
+    """
+
+    def __init__(self, config=None):
+        self.config = {
+            'loop': None,
+            'refillRate': 0.001,    # tokens per millisecond
+            'defaultCost': 1.000,
+            'capacity': 1.000,
+            'maxCapacity': 1000,    # max number of queued requests
+        }
+        self.config.update(config or {})
+        self.loop = self.config['loop'] or get_event_loop()
+        self.tokens = self.config['capacity']
+        self.last_refill = self.loop.time()
+        self.queue = deque()        # (cost, future, enqueued time)
+        self.timer = None
+        self.requests = 0
+        self.delayed = 0
+        self.total_wait = 0.0       # seconds
+        self.max_wait = 0.0
 
-    cfg = {
-        'lastTimestamp': time(),
-        'numTokens': 0,
-        'running': False,
-        'queue': Queue(),
-        'loop': get_event_loop(),
-        'delay': 0.001,
-        'refillRate': 0.001,
-        'defaultCost': 1.000,
-        'capacity': 1.000,
-        'maxCapacity': 100,
-    }
-
-    cfg.update(config)
-
-    async def run():
-        if not cfg['running']:
-            cfg['running'] = True
-            while not cfg['queue'].empty():
-                now = time()
-                elapsed = (now - cfg['lastTimestamp'])
-                cfg['lastTimestamp'] = now
-                cfg['numTokens'] = min(cfg['capacity'], cfg['numTokens'] + elapsed * cfg['refillRate'] * 1000)
-                if cfg['numTokens'] > 0:
-                    if not cfg['queue'].empty():
-                        cost, future = cfg['queue'].get_nowait()
-                        cfg['numTokens'] -= (cost if cost else cfg['defaultCost'])
-                        future.set_result(None)
-                await sleep(cfg['delay'])
-            cfg['running'] = False
-
-    def throttle(cost=None):
-        future = Future()
-        cfg['queue'].put_nowait((cost, future))
-        ensure_future(run())
+    def __call__(self, cost=None):
+        """Returns a future resolved when the request may be sent"""
+        cost = self.config['defaultCost'] if cost is None else cost
+        future = self.loop.create_future()
+        self.requests += 1
+        self.refill()
+        if not self.queue and self.tokens >= self.needed(cost):
+            self.tokens -= cost
+            future.set_result(None)
+            return future
+        if len(self.queue) >= self.config['maxCapacity']:
+            raise RuntimeError('throttle queue is over maxCapacity of ' + str(self.config['maxCapacity']))
+        self.queue.append((cost, future, self.loop.time()))
+        self.schedule()
         return future
 
-    return throttle
+    def needed(self, cost):
+        return min(cost, self.config['capacity'])
+
+    def refill(self):
+        now = self.loop.time()
+        elapsed = (now - self.last_refill) * 1000
+        self.last_refill = now
+        self.tokens = min(self.config['capacity'], self.tokens + elapsed * self.config['refillRate'])
+
+    def schedule(self):
+        if self.timer is None and self.queue:
+            deficit = self.needed(self.queue[0][0]) - self.tokens
+            delay = max(deficit, 0) / self.config['refillRate'] / 1000
+            self.timer = self.loop.call_later(delay, self.release)
+
+    def release(self):
+        self.timer = None
+        self.refill()
+        now = self.loop.time()
+        while self.queue:
+            cost, future, enqueued = self.queue[0]
+            if future.done():   # cancelled while waiting, takes no tokens
+                self.queue.popleft()
+                continue
+            if self.tokens < self.needed(cost):
+                break
+            self.queue.popleft()
+            self.tokens -= cost
+            self.delayed += 1
+            wait = now - enqueued
+            self.total_wait += wait
+            self.max_wait = max(self.max_wait, wait)
+            future.set_result(None)
+        self.schedule()
+
+    def metrics(self):
+        """Queue depth, available tokens and wait times in milliseconds"""
+        self.refill()
+        return {
+            'queueDepth': len(self.queue),
+            'tokens': self.tokens,
+            'requests': self.requests,
+            'delayed': self.delayed,
+            'totalWait': self.total_wait * 1000,
+            'maxWait': self.max_wait * 1000,
+            'meanWait': self.total_wait * 1000 / self.delayed if self.delayed else 0.0,
+        }
+
+
+def throttle(config=None):
+    return Throttle(config)
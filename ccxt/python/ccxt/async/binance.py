@@ -16,6 +16,33 @@ class binance (Exchange):
             'name': 'Binance',
             'countries': 'CN',  # China
             'rateLimit': 500,
+            # the async rate limiter counts request weights, 1200 per minute
+            'tokenBucket': {
+                'refillRate': 0.02,
+                'capacity': 20,
+            },
+            'weights': {
+                'public': {
+                    'exchangeInfo': 1,
+                    'ping': 1,
+                    'time': 1,
+                    'depth': 1,  # limit <= 100, see requestCost
+                    'aggTrades': 1,
+                    'klines': 1,
+                    'ticker/24hr': 1,  # one symbol, 40 for all
+                    'ticker/allPrices': 1,
+                    'ticker/allBookTickers': 1,
+                },
+                'private': {
+                    'order': 1,
+                    'order/test': 1,
+                    'openOrders': 1,  # one symbol, 40 for all
+                    'allOrders': 5,
+                    'account': 5,
+                    'myTrades': 5,
+                    'userDataStream': 1,
+                },
+            },
             'hasCORS': False,
             # obsolete metainfo interface
             'hasFetchTickers': True,
@@ -650,6 +677,20 @@ class binance (Exchange):
             'id': None,
         }
 
+    def request_cost(self, path, api='public', method='GET', params={}):
+        if path == 'depth':
+            limit = self.safe_integer(params, 'limit', 100)
+            if limit <= 100:
+                return 1
+            if limit <= 500:
+                return 5
+            return 10
+        if (path == 'ticker/24hr') or (path == 'openOrders'):
+            symbol = self.safe_value(params, 'symbol')
+            if symbol is None:
+                return 40
+        return self.safe_value(self.safe_value(self.weights, api, {}), path)
+
     def sign(self, path, api='public', method='GET', params={}, headers=None, body=None):
         url = self.urls['api'][api]
         url += '/' + path
@@ -17,8 +17,15 @@ from ccxt.base.errors import ExchangeNotAvailable
 
 # -----------------------------------------------------------------------------
 
+from ccxt.base.order_book import OrderBookSide
+from ccxt.base.order_book import LazyOrderBookSide
+from ccxt.base.lazy_list import LazyList
+
+# -----------------------------------------------------------------------------
+
 __all__ = [
     'Exchange',
+    'json_decode',
 ]
 
 # -----------------------------------------------------------------------------
@@ -35,6 +42,7 @@ import hmac
 import io
 import json
 import math
+import os
 import re
 from requests import Session
 from requests.exceptions import ConnectionError, HTTPError, Timeout, TooManyRedirects, RequestException
@@ -66,6 +74,35 @@ except NameError:
 
 # -----------------------------------------------------------------------------
 
+try:
+    import orjson  # optional, several times faster than json on large payloads
+except ImportError:
+    orjson = None
+
+# -----------------------------------------------------------------------------
+
+MARKETS_CACHE_FORMAT = 1  # layout of the files written by Exchange.write_markets_cache
+
+replace_file = getattr(os, 'replace', os.rename)  # os.replace from Python 3.3, rename replaces files on POSIX
+
+# -----------------------------------------------------------------------------
+
+
+def json_decode(data):
+    """Decode a JSON document from bytes or str with the fastest available decoder,
+    falling back to json for what orjson rejects (NaN, Infinity)
+    orjson decodes integers over 64 bits as floats"""
+    if orjson is not None:
+        try:
+            return orjson.loads(data)
+        except ValueError:
+            pass
+    if isinstance(data, bytes) and not isinstance(data, str):  # json.loads takes bytes from Python 3.6
+        data = data.decode('utf-8')
+    return json.loads(data)
+
+# -----------------------------------------------------------------------------
+
 
 class Exchange(object):
     """Base exchange class"""
@@ -75,6 +112,7 @@ class Exchange(object):
     # rate limiter settings
     enableRateLimit = False
     rateLimit = 2000  # milliseconds = seconds * 1000
+    weights = {}  # request weights {api: {path: cost}} for the rate limiter, e.g. binance
     timeout = 10000   # milliseconds = seconds * 1000
     asyncio_loop = None
     aiohttp_session = None
@@ -96,6 +134,10 @@ class Exchange(object):
     tickers = None
     api = None
     parseJsonResponse = True
+    compactOrderBooks = False  # parse order book sides into OrderBookSide columns
+    lazyParsing = False  # keep raw order book levels and trades until they are read (LazyOrderBookSide, LazyList)
+    marketsCache = None  # directory keeping the markets of every exchange on disk for load_markets, None to always fetch them
+    marketsCacheTTL = 86400  # seconds cached markets are used without fetching them again
     headers = {}
     balance = {}
     orderbooks = {}
@@ -173,6 +215,7 @@ class Exchange(object):
     rateLimitUpdateTime = 0
     last_http_response = None
     last_json_response = None
+    jsonDecoder = None  # decoder of response bodies (bytes or str), json_decode by default, set per instance e.g. {'jsonDecoder': ujson.loads}
 
     def __init__(self, config={}):
 
@@ -181,7 +224,10 @@ class Exchange(object):
         #     'User-Agent': 'ccxt/' + __version__ + ' (+https://github.com/ccxt/ccxt) Python/' + version
         # }
 
-        settings = self.deep_extend(self.describe(), config)
+        # describe() and the API method table are computed once per class,
+        # each instance gets its own copy of the lists and dicts of the description
+        description = self.class_cache('describe', self.describe)
+        settings = self.deep_extend(self.deep_copy(description), config)
 
         for key in settings:
             if hasattr(self, key) and isinstance(getattr(self, key), dict):
@@ -189,17 +235,27 @@ class Exchange(object):
             else:
                 setattr(self, key, settings[key])
 
+        api_methods = []
         if self.api:
-            self.define_rest_api(self.api, 'request')
+            if 'api' in config:
+                api_methods = list(self.rest_api_methods(self.api))
+            else:
+                api_methods = self.class_cache('api', lambda: list(self.rest_api_methods(self.api)))
+            self.bind_rest_api(api_methods, 'request')
 
         if self.markets:
             self.set_markets(self.markets)
 
         # format camel case
-        for attr in dir(self):
-            if attr[0] != '_'and attr[-1] != '_' and '_' in attr:
-                conv = attr.split('_')
-                camel_case = conv[0] + ''.join(i[0].upper() + i[1:] for i in conv[1:])
+        api_attrs = [underscore for camelcase, underscore, url, api_type, method in api_methods]
+        if 'api' in config:
+            attrs = set(dir(type(self))) | set(settings) | set(api_attrs)
+        else:
+            class_attrs = self.class_cache('attrs', lambda: set(dir(type(self))) | set(description) | set(api_attrs))
+            attrs = class_attrs | set(config) if config else class_attrs
+        for attr in sorted(attrs):
+            camel_case = self.camelcase_name(attr)
+            if camel_case:
                 setattr(self, camel_case, getattr(self, attr))
 
         self.tokenBucket = self.extend({
@@ -215,7 +271,35 @@ class Exchange(object):
     def describe(self):
         return {}
 
+    def class_cache(self, key, build):
+        """Returns build(), called once per exchange class"""
+        cls = type(self)
+        if '_class_cache' not in cls.__dict__:
+            cls._class_cache = {}
+        if key not in cls._class_cache:
+            cls._class_cache[key] = build()
+        return cls._class_cache[key]
+
+    @staticmethod
+    def camelcase_name(attr):
+        if attr[0] != '_'and attr[-1] != '_' and '_' in attr:
+            conv = attr.split('_')
+            return conv[0] + ''.join(i[0].upper() + i[1:] for i in conv[1:])
+        return None
+
     def define_rest_api(self, api, method_name, options={}):
+        self.bind_rest_api(self.rest_api_methods(api, options), method_name)
+
+    def bind_rest_api(self, api_methods, method_name):
+        request = getattr(self, method_name)
+        for camelcase, underscore, url, api_type, uppercase_method in api_methods:
+            partial = functools.partial(request, url, api_type, uppercase_method)
+            setattr(self, camelcase, partial)
+            setattr(self, underscore, partial)
+
+    @staticmethod
+    def rest_api_methods(api, options={}):
+        """Yields (camelcase, underscore, url, api type, http method) for every endpoint of api"""
         delimiters = re.compile('[^a-zA-Z0-9]')
         for api_type, methods in api.items():
             for http_method, urls in methods.items():
@@ -245,9 +329,7 @@ class Exchange(object):
                         if 'underscore' in options['suffixes']:
                             underscore += options['suffixes']['underscore']
 
-                    partial = functools.partial(getattr(self, method_name), url, api_type, uppercase_method)
-                    setattr(self, camelcase, partial)
-                    setattr(self, underscore, partial)
+                    yield camelcase, underscore, url, api_type, uppercase_method
 
     def raise_error(self, exception_type, url, method='GET', error=None, details=None):
         details = details if details else ''
@@ -273,6 +355,13 @@ class Exchange(object):
         else:
             raise exception_type(' '.join([self.id, method, url, details]))
 
+    def request_cost(self, path, api='public', method='GET', params={}):
+        """Tokens taken by a request: weights[api][path], or weights[api][path][method], or the default cost"""
+        weight = self.safe_value(self.safe_value(self.weights, api, {}), path)
+        if isinstance(weight, dict):
+            weight = weight.get(method)
+        return weight
+
     def throttle(self):
         now = float(self.milliseconds())
         elapsed = now - self.lastRestRequestTimestamp
@@ -340,7 +429,7 @@ class Exchange(object):
                 timeout=int(self.timeout / 1000),
                 proxies=self.proxies
             )
-            self.last_http_response = response.text
+            self.last_http_response = self.decode_body(response.content, response.encoding)
             response.raise_for_status()
 
         except Timeout as e:
@@ -435,10 +524,22 @@ class Exchange(object):
         if error:
             self.raise_error(error, url, method, exception if exception else http_status_code, response)
 
+    def parse_json(self, response):
+        """Decode a JSON response body, bytes or str, with jsonDecoder"""
+        return (self.jsonDecoder or json_decode)(response)
+
+    @staticmethod
+    def decode_body(body, encoding=None):
+        """Text of a response body, utf-8 (the JSON default) unless the response declares a charset, without charset detection"""
+        try:
+            return body.decode(encoding or 'utf-8')
+        except (LookupError, UnicodeDecodeError):
+            return body.decode('utf-8', 'replace')
+
     def handle_rest_response(self, response, url, method='GET', headers=None, body=None):
         try:
             if self.parseJsonResponse:
-                self.last_json_response = json.loads(response) if len(response) > 1 else None
+                self.last_json_response = self.parse_json(response) if len(response) > 1 else None
                 return self.last_json_response
             else:
                 return response
@@ -525,6 +626,14 @@ class Exchange(object):
                 result = arg
         return result
 
+    @staticmethod
+    def deep_copy(value):
+        if isinstance(value, dict):
+            return {key: Exchange.deep_copy(value[key]) for key in value}
+        if isinstance(value, list):
+            return [Exchange.deep_copy(item) for item in value]
+        return value
+
     @staticmethod
     def filter_by(array, key, value=None):
         if value:
@@ -650,6 +759,12 @@ class Exchange(object):
             result.append([price, volume])
         return result
 
+    @staticmethod
+    def aggregate_bids_asks(bidasks, descending=False):
+        if isinstance(bidasks, OrderBookSide):
+            return bidasks.aggregate(descending)
+        return Exchange.sort_by(Exchange.aggregate(bidasks), 0, descending)
+
     @staticmethod
     def sec():
         return Exchange.seconds()
@@ -676,8 +791,8 @@ class Exchange(object):
 
     @staticmethod
     def iso8601(timestamp):
-        utc = datetime.datetime.utcfromtimestamp(int(round(timestamp / 1000)))
-        return utc.strftime('%Y-%m-%dT%H:%M:%S.%f')[:-6] + "{:<03d}".format(int(timestamp) % 1000) + 'Z'
+        utc = time.gmtime(int(round(timestamp / 1000)))
+        return time.strftime('%Y-%m-%dT%H:%M:%S.', utc) + "{:<03d}".format(int(timestamp) % 1000) + 'Z'
 
     @staticmethod
     def Ymd(timestamp):
@@ -861,12 +976,63 @@ class Exchange(object):
                 if not self.markets_by_id:
                     return self.set_markets(self.markets)
                 return self.markets
+            cache = self.read_markets_cache()
+            if cache is not None and not self.markets_cache_stale(cache):
+                return self.set_markets(cache['markets'], cache['currencies'])
         markets = self.fetch_markets()
         currencies = None
         if self.has['fetchCurrencies']:
             currencies = self.fetch_currencies()
+        self.write_markets_cache(markets, currencies)
         return self.set_markets(markets, currencies)
 
+    def markets_cache_path(self):
+        return os.path.join(self.marketsCache, self.id + '.json')
+
+    def read_markets_cache(self):
+        """Returns the cached {'timestamp', 'markets', 'currencies'} of the exchange,
+        None if there is none or it was written by another version of ccxt"""
+        if not self.marketsCache:
+            return None
+        try:
+            with open(self.markets_cache_path()) as f:
+                cache = json.load(f)
+        except (IOError, OSError, ValueError):
+            return None
+        if cache.get('format') != MARKETS_CACHE_FORMAT or cache.get('version') != __version__ or cache.get('id') != self.id:
+            return None
+        return cache
+
+    def write_markets_cache(self, markets, currencies=None):
+        """Stores fetched markets for load_markets, the cache is optional and failures to write it are ignored"""
+        if not self.marketsCache:
+            return
+        path = self.markets_cache_path()
+        temporary = path + '.' + str(os.getpid()) + '.tmp'
+        try:
+            if not os.path.isdir(self.marketsCache):
+                os.makedirs(self.marketsCache)
+            with open(temporary, 'w') as f:
+                json.dump({
+                    'format': MARKETS_CACHE_FORMAT,
+                    'version': __version__,
+                    'id': self.id,
+                    'timestamp': self.milliseconds(),
+                    'markets': markets,
+                    'currencies': currencies,
+                }, f)
+            replace_file(temporary, path)  # readers never see a partial file
+        except (IOError, OSError, TypeError, ValueError):
+            try:
+                os.remove(temporary)
+            except OSError:
+                pass
+
+    def markets_cache_stale(self, cache=None):
+        """True unless the markets cached on disk (cache if already read) are younger than marketsCacheTTL, always True without a cache"""
+        cache = cache or self.read_markets_cache()
+        return cache is None or self.milliseconds() - cache['timestamp'] >= self.marketsCacheTTL * 1000
+
     def fetch_markets(self):
         return self.markets
 
@@ -914,20 +1080,26 @@ class Exchange(object):
         return [float(bidask[price_key]), float(bidask[amount_key])]
 
     def parse_bids_asks(self, bidasks, price_key=0, amount_key=1):
+        if self.lazyParsing and type(self).parse_bid_ask == Exchange.parse_bid_ask:
+            return LazyOrderBookSide(bidasks, price_key, amount_key)
+        if self.compactOrderBooks:
+            if type(self).parse_bid_ask == Exchange.parse_bid_ask:
+                return OrderBookSide(bidasks, price_key, amount_key)
+            return OrderBookSide([self.parse_bid_ask(bidask, price_key, amount_key) for bidask in bidasks])
         return [self.parse_bid_ask(bidask, price_key, amount_key) for bidask in bidasks]
 
     def fetch_l2_order_book(self, symbol, params={}):
         orderbook = self.fetch_order_book(symbol, params)
         return self.extend(orderbook, {
-            'bids': self.sort_by(self.aggregate(orderbook['bids']), 0, True),
-            'asks': self.sort_by(self.aggregate(orderbook['asks']), 0),
+            'bids': self.aggregate_bids_asks(orderbook['bids'], True),
+            'asks': self.aggregate_bids_asks(orderbook['asks']),
         })
 
     def parse_order_book(self, orderbook, timestamp=None, bids_key='bids', asks_key='asks', price_key=0, amount_key=1):
         timestamp = timestamp or self.milliseconds()
         return {
-            'bids': self.parse_bids_asks(orderbook[bids_key], price_key, amount_key) if (bids_key in orderbook) and isinstance(orderbook[bids_key], list) else [],
-            'asks': self.parse_bids_asks(orderbook[asks_key], price_key, amount_key) if (asks_key in orderbook) and isinstance(orderbook[asks_key], list) else [],
+            'bids': self.parse_bids_asks(orderbook[bids_key], price_key, amount_key) if (bids_key in orderbook) and isinstance(orderbook[bids_key], list) else self.parse_bids_asks([]),
+            'asks': self.parse_bids_asks(orderbook[asks_key], price_key, amount_key) if (asks_key in orderbook) and isinstance(orderbook[asks_key], list) else self.parse_bids_asks([]),
             'timestamp': timestamp,
             'datetime': self.iso8601(timestamp),
         }
@@ -958,6 +1130,8 @@ class Exchange(object):
 
     def parse_trades(self, trades, market=None, since=None, limit=None):
         array = self.to_array(trades)
+        if self.lazyParsing and not since:
+            return LazyList(array[0:limit] if limit else array, lambda trade: self.parse_trade(trade, market))
         array = [self.parse_trade(trade, market) for trade in array]
         return self.filter_by_since_limit(array, since, limit)
 
@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+
+"""Exchange classes imported on first attribute access of the ccxt package"""
+
+# -----------------------------------------------------------------------------
+
+import importlib
+import sys
+import types
+
+# -----------------------------------------------------------------------------
+
+__all__ = [
+    'lazy_exchanges',
+]
+
+# -----------------------------------------------------------------------------
+
+
+class LazyExchangesModule(types.ModuleType):
+    """Package module importing ccxt.<id> the first time ccxt.<id> is read
+
+    The exchange ids stay listed in the package's exchanges list and in
+    dir(), and ccxt.<id> is always the exchange class, also when the
+    submodule was imported by another exchange module or directly.
+    """
+
+    def __getattr__(self, name):
+        # only called when name is not set yet
+        if name in self.__dict__.get('exchanges', []):
+            module = importlib.import_module(self.__name__ + '.' + name)
+            return getattr(module, name)
+        raise AttributeError("module '%s' has no attribute '%s'" % (self.__name__, name))
+
+    def __setattr__(self, name, value):
+        # the import system binds a submodule to its package after loading it
+        if isinstance(value, types.ModuleType) and name in self.__dict__.get('exchanges', []):
+            value = getattr(value, name)
+        super(LazyExchangesModule, self).__setattr__(name, value)
+
+    def __dir__(self):
+        return sorted(set(self.__dict__) | set(self.__dict__.get('exchanges', [])))
+
+
+def lazy_exchanges(module_name):
+    """Make the exchange classes of the package module_name load lazily
+
+    Module classes cannot be changed before Python 3.5, the exchanges are
+    imported right away there.
+    """
+    module = sys.modules[module_name]
+    try:
+        module.__class__ = LazyExchangesModule
+    except TypeError:
+        for id in module.exchanges:
+            setattr(module, id, getattr(importlib.import_module(module_name + '.' + id), id))
@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+
+"""List of raw exchange items parsed on first access"""
+
+# -----------------------------------------------------------------------------
+
+__all__ = [
+    'LazyList',
+]
+
+# -----------------------------------------------------------------------------
+
+
+class LazyList(list):
+    """List holding raw items (e.g. trades as returned by the exchange) until read
+
+    Indexing, slicing and iteration parse the items they reach with parse(item)
+    and keep the result, so callers reading the last few trades of a long
+    history only pay for those. Any other list operation parses every item
+    first, after which the list behaves as a plain list. Code reading the list
+    through the C API (json.dumps) sees the raw items: call resolve() first.
+    """
+
+    __slots__ = ['parse', 'parsed']
+
+    def __init__(self, items, parse):
+        super(LazyList, self).__init__(items)
+        self.parse = parse
+        self.parsed = bytearray(len(self))
+
+    def item(self, index):
+        if self.parse is not None and not self.parsed[index]:
+            list.__setitem__(self, index, self.parse(list.__getitem__(self, index)))
+            self.parsed[index] = 1
+        return list.__getitem__(self, index)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self.item(i) for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('list index out of range')
+        return self.item(index)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self.item(i)
+
+    def __reduce__(self):
+        return (list, (list(self),))
+
+    def resolve(self):
+        """Parse all the items left, returns the list"""
+        if self.parse is not None:
+            for i in range(len(self)):
+                self.item(i)
+            self.parse = None
+        return self
+
+
+def resolving(name):
+    method = getattr(list, name)
+
+    def wrapper(self, *args, **kwargs):
+        self.resolve()
+        return method(self, *args, **kwargs)
+    wrapper.__name__ = name
+    return wrapper
+
+
+for name in [
+    'append', 'extend', 'insert', 'remove', 'pop', 'sort', 'reverse', 'index', 'count',
+    '__setitem__', '__delitem__', '__iadd__', '__imul__', '__add__', '__mul__', '__rmul__',
+    '__contains__', '__reversed__', '__eq__', '__ne__', '__lt__', '__le__', '__gt__', '__ge__',
+    '__repr__', '__str__',
+]:
+    setattr(LazyList, name, resolving(name))
+for name in ['clear', 'copy', '__setslice__', '__delslice__', '__getslice__']:  # Python 2 or 3 only
+    if hasattr(list, name):
+        setattr(LazyList, name, resolving(name))
@@ -0,0 +1,204 @@
+# -*- coding: utf-8 -*-
+
+"""Compact order book side backed by contiguous float64 columns"""
+
+# -----------------------------------------------------------------------------
+
+from array import array
+from operator import itemgetter
+
+try:
+    import numpy  # optional, vectorizes the depth queries below
+except ImportError:
+    numpy = None
+
+# -----------------------------------------------------------------------------
+
+__all__ = [
+    'OrderBookSide',
+    'LazyOrderBookSide',
+]
+
+# -----------------------------------------------------------------------------
+
+
+class OrderBookSide(object):
+    """Bids or asks of an order book stored as two float64 columns
+
+    Indexing, slicing and iteration yield [price, amount] levels like the
+    lists returned by parse_bids_asks, so existing consumers keep working,
+    while best(), depth() and vwap() are answered from the columns without
+    building a list per level.
+    """
+
+    __slots__ = ['prices', 'amounts']
+
+    def __init__(self, bidasks=None, price_key=0, amount_key=1):
+        bidasks = bidasks or []
+        self.prices = array('d', map(float, map(itemgetter(price_key), bidasks)))
+        self.amounts = array('d', map(float, map(itemgetter(amount_key), bidasks)))
+
+    @classmethod
+    def from_columns(cls, prices, amounts):
+        side = cls()
+        side.prices = array('d', prices)
+        side.amounts = array('d', amounts)
+        return side
+
+    def __len__(self):
+        return len(self.prices)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [[price, amount] for price, amount in zip(self.prices[index], self.amounts[index])]
+        return [self.prices[index], self.amounts[index]]
+
+    def __iter__(self):
+        for price, amount in zip(self.prices, self.amounts):
+            yield [price, amount]
+
+    def __eq__(self, other):
+        return list(self) == list(other)
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+    def __repr__(self):
+        return 'OrderBookSide(' + repr(self[:]) + ')'
+
+    def columns(self):
+        """Returns (prices, amounts), as zero-copy numpy arrays if numpy is installed"""
+        if numpy is None:
+            return self.prices, self.amounts
+        return numpy.frombuffer(self.prices), numpy.frombuffer(self.amounts)
+
+    def best(self):
+        """Returns the top [price, amount] level, None if the side is empty"""
+        return self[0] if len(self.prices) else None
+
+    def cumulative_amounts(self):
+        if numpy is not None:
+            return numpy.cumsum(self.columns()[1])
+        total = 0.0
+        result = array('d')
+        for amount in self.amounts:
+            total += amount
+            result.append(total)
+        return result
+
+    def first_level(self, amount):
+        """Returns the index of the first level holding at least amount, len(self) if none does"""
+        if numpy is not None:
+            above = self.columns()[1] >= amount
+            return int(numpy.argmax(above)) if above.any() else len(self)
+        for i, level_amount in enumerate(self.amounts):
+            if level_amount >= amount:
+                return i
+        return len(self)
+
+    def fill_level(self, amount):
+        """Returns the index of the level completing a fill of amount, None if the side is too thin"""
+        if numpy is not None:
+            i = int(numpy.searchsorted(self.cumulative_amounts(), amount))
+        else:
+            i = 0
+            total = 0.0
+            for level_amount in self.amounts:
+                total += level_amount
+                if total >= amount:
+                    break
+                i += 1
+        return i if i < len(self) else None
+
+    def depth(self, amount):
+        """Returns the worst price reached when filling amount, None if the side is too thin"""
+        i = self.fill_level(amount)
+        return None if i is None else self.prices[i]
+
+    def vwap(self, amount):
+        """Returns the average price paid when filling amount, None if the side is too thin"""
+        i = self.fill_level(amount)
+        if i is None:
+            return None
+        if amount <= 0:
+            return self.prices[0]
+        if numpy is not None:
+            prices, amounts = self.columns()
+            cost = float(numpy.dot(prices[:i], amounts[:i]))
+            filled = float(amounts[:i].sum())
+        else:
+            cost = sum(price * level_amount for price, level_amount in zip(self.prices[:i], self.amounts[:i]))
+            filled = sum(self.amounts[:i])
+        return (cost + (amount - filled) * self.prices[i]) / amount
+
+    def aggregate(self, descending=False):
+        """Returns a new side with amounts summed by price and sorted, empty levels dropped"""
+        if numpy is not None:
+            prices, amounts = self.columns()
+            positive = amounts > 0
+            unique, inverse = numpy.unique(prices[positive], return_inverse=True)
+            totals = numpy.bincount(inverse.ravel(), weights=amounts[positive], minlength=len(unique))
+            if descending:
+                unique, totals = unique[::-1], totals[::-1]
+            return OrderBookSide.from_columns(unique, totals)
+        totals = {}
+        for price, amount in zip(self.prices, self.amounts):
+            if amount > 0:
+                totals[price] = totals.get(price, 0.0) + amount
+        prices = sorted(totals, reverse=descending)
+        return OrderBookSide.from_columns(prices, [totals[price] for price in prices])
+
+
+class LazyOrderBookSide(OrderBookSide):
+    """OrderBookSide keeping the exchange's raw levels until they are read
+
+    The levels are converted to float columns all at once the first time the
+    columns are needed, best() and len() only read the raw levels, so sides
+    fetched but never read, or only read at the top, skip the conversion.
+    """
+
+    __slots__ = ['raw', 'price_key', 'amount_key', '_prices', '_amounts']
+
+    def __init__(self, bidasks=None, price_key=0, amount_key=1):
+        self.raw = bidasks or []
+        self.price_key = price_key
+        self.amount_key = amount_key
+
+    def convert(self):
+        raw, self.raw = self.raw, None
+        self._prices = array('d', map(float, map(itemgetter(self.price_key), raw)))
+        self._amounts = array('d', map(float, map(itemgetter(self.amount_key), raw)))
+
+    @property
+    def prices(self):
+        if self.raw is not None:
+            self.convert()
+        return self._prices
+
+    @prices.setter
+    def prices(self, prices):
+        if self.raw is not None:
+            self.convert()
+        self._prices = prices
+
+    @property
+    def amounts(self):
+        if self.raw is not None:
+            self.convert()
+        return self._amounts
+
+    @amounts.setter
+    def amounts(self, amounts):
+        if self.raw is not None:
+            self.convert()
+        self._amounts = amounts
+
+    def __len__(self):
+        return len(self.raw) if self.raw is not None else len(self._prices)
+
+    def best(self):
+        if self.raw is None:
+            return super(LazyOrderBookSide, self).best()
+        if not self.raw:
+            return None
+        return [float(self.raw[0][self.price_key]), float(self.raw[0][self.amount_key])]
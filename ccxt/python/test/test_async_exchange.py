@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+
+import asyncio
+import os
+import sys
+
+import pytest
+
+# ------------------------------------------------------------------------------
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, root)
+
+# ------------------------------------------------------------------------------
+
+import ccxt.async as ccxt  # noqa: E402
+
+# ------------------------------------------------------------------------------
+
+
+@pytest.fixture
+def loop():
+    loop = asyncio.new_event_loop()
+    yield loop
+    loop.close()
+
+
+def test_del_after_failed_init():
+    exchange = ccxt.bittrex.__new__(ccxt.bittrex)
+    exchange.__del__()  # no attribute set, nothing to close
+
+
+def test_del_warns_without_running_loop(loop):
+    exchange = ccxt.bittrex({'asyncio_loop': loop})
+    with pytest.warns(ResourceWarning):
+        exchange.__del__()
+    assert not exchange.aiohttp_session.closed
+    loop.run_until_complete(exchange.close())
+    exchange.__del__()  # closed, nothing to do
+
+
+def test_del_schedules_close_on_running_loop(loop):
+    exchange = ccxt.bittrex({'asyncio_loop': loop})
+    session = exchange.aiohttp_session
+
+    async def finalize():
+        exchange.__del__()
+        for _ in range(3):
+            await asyncio.sleep(0)
+
+    loop.run_until_complete(finalize())
+    assert session.closed
+    assert exchange.aiohttp_session is None
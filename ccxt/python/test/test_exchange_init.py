@@ -0,0 +1,136 @@
+# -*- coding: utf-8 -*-
+
+import os
+import sys
+
+# ------------------------------------------------------------------------------
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, root)
+
+# ------------------------------------------------------------------------------
+
+import ccxt  # noqa: E402
+
+# ------------------------------------------------------------------------------
+
+
+class Exchange(ccxt.Exchange):
+
+    describes = 0
+
+    def describe(self):
+        Exchange.describes += 1
+        return self.deep_extend(super(Exchange, self).describe(), {
+            'id': 'stub',
+            'countries': ['JP', 'US'],
+            'rateLimit': 500,
+            'has': {
+                'fetchTickers': True,
+            },
+            'urls': {
+                'api': 'https://api.stub.com',
+                'doc': ['https://docs.stub.com'],
+            },
+            'api': {
+                'public': {
+                    'get': ['depth', 'ticker/price'],
+                },
+                'private': {
+                    'post': ['order'],
+                },
+            },
+            'fees': {
+                'trading': {
+                    'maker': 0.001,
+                    'taker': 0.002,
+                },
+            },
+            'tokenBucket': {
+                'capacity': 5,
+            },
+            'market_data_limit': 100,
+        })
+
+    def request(self, path, api='public', method='GET', params={}, headers=None, body=None):
+        return (self, path, api, method, params)
+
+
+# ------------------------------------------------------------------------------
+
+
+def test_describe_is_cached_per_class():
+    Exchange()
+    describes = Exchange.describes
+    Exchange({'apiKey': 'key'})
+    assert Exchange.describes == describes
+
+
+def test_instances_do_not_share_mutable_state():
+    first = Exchange()
+    second = Exchange({'countries': ['GB'], 'urls': {'api': 'https://eu.stub.com'}})
+    first.countries.append('CN')
+    first.urls['doc'].append('https://wiki.stub.com')
+    first.urls['www'] = 'https://stub.com'
+    first.fees['trading']['maker'] = 0
+    first.has['fetchTickers'] = False
+    first.api['public']['get'].append('trades')
+    first.tokenBucket['capacity'] = 1
+    third = Exchange()
+    for exchange in (second, third):
+        assert exchange.urls['doc'] == ['https://docs.stub.com']
+        assert 'www' not in exchange.urls
+        assert exchange.fees['trading']['maker'] == 0.001
+        assert exchange.has['fetchTickers'] is True
+        assert exchange.api['public']['get'] == ['depth', 'ticker/price']
+        assert exchange.tokenBucket['capacity'] == 5
+    assert second.countries == ['GB']
+    assert third.countries == ['JP', 'US']
+    description = first.class_cache('describe', first.describe)
+    assert description['countries'] == ['JP', 'US']
+    assert description['urls'] == {'api': 'https://api.stub.com', 'doc': ['https://docs.stub.com']}
+
+
+def test_config_overrides_cached_defaults():
+    exchange = Exchange({
+        'rateLimit': 2000,
+        'urls': {'api': 'https://eu.stub.com'},
+        'fees': {'trading': {'taker': 0.003}},
+        'tokenBucket': {'capacity': 2},
+    })
+    assert exchange.rateLimit == 2000
+    assert exchange.tokenBucket['refillRate'] == 1.0 / 2000
+    assert exchange.tokenBucket['capacity'] == 2
+    assert exchange.urls == {'api': 'https://eu.stub.com', 'doc': ['https://docs.stub.com']}
+    assert exchange.fees['trading'] == {'maker': 0.001, 'taker': 0.003}
+    assert Exchange().rateLimit == 500
+
+
+def test_api_methods_are_bound_to_each_instance():
+    first = Exchange()
+    second = Exchange()
+    assert first.publicGetDepth({'limit': 5}) == (first, 'depth', 'public', 'GET', {'limit': 5})
+    assert first.public_get_depth() == (first, 'depth', 'public', 'GET', {})
+    assert first.publicGetTickerPrice()[1] == 'ticker/price'
+    assert first.privatePostOrder()[1:4] == ('order', 'private', 'POST')
+    assert second.publicGetDepth()[0] is second
+
+
+def test_config_api_is_bound_per_instance():
+    custom = Exchange({'api': {'public': {'get': ['time']}}})
+    assert custom.publicGetTime() == (custom, 'time', 'public', 'GET', {})
+    assert custom.privatePostOrder()[1] == 'order'  # the config api is deep extended over the description
+    assert not hasattr(custom, 'publicGetDepth')
+    assert not hasattr(Exchange(), 'publicGetTime')
+
+
+def test_camelcase_aliases():
+    assert Exchange.camelcase_name('fetch_order_book') == 'fetchOrderBook'
+    assert Exchange.camelcase_name('_private_name') is None
+    assert Exchange.camelcase_name('trailing_') is None
+    assert Exchange.camelcase_name('id') is None
+    exchange = Exchange({'custom_option': 1})
+    assert exchange.marketDataLimit == 100
+    assert exchange.customOption == 1
+    assert exchange.fetchL2OrderBook == exchange.fetch_l2_order_book
+    assert exchange.loadMarkets == exchange.load_markets
@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+
+import importlib
+import json
+import math
+import os
+import sys
+
+import pytest
+
+# ------------------------------------------------------------------------------
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, root)
+
+# ------------------------------------------------------------------------------
+
+import ccxt  # noqa: E402
+
+base = importlib.import_module('ccxt.base.exchange')
+
+# ------------------------------------------------------------------------------
+
+documents = [
+    '{"symbol": "ETH/BTC", "bids": [[0.1, 2], [0.09, 1.5]], "info": null, "ok": true}',
+    '[1, -2.5e-8, "\\u00e9t\\u00e9", "été", {}]',
+    '"text"',
+    '12345678901234567',
+]
+
+
+@pytest.fixture(params=['orjson', 'json'])
+def decoder(request, monkeypatch):
+    if request.param == 'orjson':
+        if base.orjson is None:
+            pytest.skip('orjson is not installed')
+    else:
+        monkeypatch.setattr(base, 'orjson', None)
+    return request.param
+
+
+@pytest.mark.parametrize('document', documents)
+def test_json_decode(decoder, document):
+    expected = json.loads(document)
+    assert base.json_decode(document) == expected
+    assert base.json_decode(document.encode('utf-8')) == expected
+
+
+def test_json_decode_nan(decoder):
+    # orjson rejects NaN and Infinity, decoded by json
+    decoded = base.json_decode(b'{"price": NaN, "amount": Infinity}')
+    assert math.isnan(decoded['price']) and decoded['amount'] == float('inf')
+
+
+@pytest.mark.parametrize('document', ['', '{"a": 1', 'offline', b'\xff{}'])
+def test_json_decode_invalid(decoder, document):
+    with pytest.raises(ValueError):
+        base.json_decode(document)
+
+
+def test_decode_body():
+    assert ccxt.Exchange.decode_body('été'.encode('utf-8')) == 'été'
+    assert ccxt.Exchange.decode_body('été'.encode('latin-1'), 'latin-1') == 'été'
+    assert ccxt.Exchange.decode_body(b'{}', 'x-unknown-charset') == '{}'
+    assert ccxt.Exchange.decode_body(b'{"a": "\xff"}') == '{"a": "\ufffd"}'
+
+
+def test_handle_rest_response(decoder):
+    exchange = ccxt.Exchange({'id': 'stub'})
+    assert exchange.handle_rest_response('{"a": [1, 2]}', 'https://api.stub.com') == {'a': [1, 2]}
+    assert exchange.last_json_response == {'a': [1, 2]}
+    assert exchange.handle_rest_response(' ', 'https://api.stub.com') is None
+    with pytest.raises(ccxt.ExchangeError):
+        exchange.handle_rest_response('{"a": ', 'https://api.stub.com')
+    with pytest.raises(ccxt.ExchangeNotAvailable):
+        exchange.handle_rest_response('<html>down for maintenance</html>', 'https://api.stub.com')
+    with pytest.raises(ccxt.DDoSProtection):
+        exchange.handle_rest_response('<html>cloudflare</html>', 'https://api.stub.com')
+
+
+def test_json_decoder_config():
+    exchange = ccxt.Exchange({'id': 'stub', 'jsonDecoder': lambda data: {'decoded': data}})
+    assert exchange.handle_rest_response('{}', 'https://api.stub.com') == {'decoded': '{}'}
+    assert exchange.parse_json('[]') == {'decoded': '[]'}
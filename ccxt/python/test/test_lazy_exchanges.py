@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+
+import os
+import subprocess
+import sys
+import textwrap
+
+import pytest
+
+# ------------------------------------------------------------------------------
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# ------------------------------------------------------------------------------
+
+
+@pytest.fixture(params=['ccxt', 'ccxt.async'])
+def package(request):
+    return request.param
+
+
+def run(package, code):
+    """Runs code in a fresh interpreter, where no exchange is imported yet, with package imported as ccxt"""
+    header = 'import importlib, sys\nsys.path.insert(0, %r)\nccxt = importlib.import_module(%r)\n' % (root, package)
+    subprocess.check_call([sys.executable, '-c', header + textwrap.dedent(code)])
+
+
+def test_exchange_imported_on_access(package):
+    run(package, '''
+        assert ccxt.__name__ + '.binance' not in sys.modules
+        exchange = ccxt.binance
+        assert isinstance(exchange, type) and exchange.__name__ == 'binance'
+        assert ccxt.__name__ + '.binance' in sys.modules
+        assert ccxt.binance is exchange
+        try:
+            ccxt.notanexchange
+        except AttributeError:
+            pass
+        else:
+            raise AssertionError('notanexchange resolved')
+    ''')
+
+
+def test_derived_exchanges(package):
+    # okex derives from okcoinusd, whose module is imported by okex's
+    run(package, '''
+        assert issubclass(ccxt.okex, ccxt.okcoinusd)
+        assert isinstance(ccxt.okcoinusd, type)
+        assert ccxt.okcoinusd().id == 'okcoinusd'
+    ''')
+
+
+def test_listing(package):
+    run(package, '''
+        assert 'binance' in ccxt.exchanges and 'okex' in ccxt.exchanges
+        names = dir(ccxt)
+        assert set(ccxt.exchanges) <= set(names)
+        assert 'ExchangeError' in names and names == sorted(names)
+        assert ccxt.__name__ + '.kraken' not in sys.modules  # listing imports nothing
+        assert all(getattr(ccxt, id).__name__ == id for id in ccxt.exchanges)
+    ''')
+
+
+def test_star_import(package):
+    run(package, '''
+        namespace = {}
+        exec('from ' + ccxt.__name__ + ' import *', namespace)
+        assert namespace['kraken'] is ccxt.kraken
+        assert namespace['ExchangeError'] is ccxt.ExchangeError
+        assert set(ccxt.exchanges) <= set(namespace)
+    ''')
+
+
+def test_submodule_import_binds_class(package):
+    run(package, '''
+        importlib.import_module(ccxt.__name__ + '.binance')
+        assert isinstance(ccxt.binance, type)
+        module = sys.modules[ccxt.__name__ + '.binance']
+        assert ccxt.binance is module.binance
+    ''')
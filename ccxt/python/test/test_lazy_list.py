@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+
+import json
+import os
+import pickle
+import sys
+
+import pytest
+
+# ------------------------------------------------------------------------------
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, root)
+
+# ------------------------------------------------------------------------------
+
+import ccxt  # noqa: E402
+from ccxt.base.lazy_list import LazyList  # noqa: E402
+
+# ------------------------------------------------------------------------------
+
+
+class Parser(object):
+    """Counts the items parsed"""
+
+    def __init__(self):
+        self.parsed = []
+
+    def __call__(self, item):
+        self.parsed.append(item)
+        return {'id': item}
+
+
+def test_reads_parse_what_they_reach():
+    parse = Parser()
+    trades = LazyList(['1', '2', '3', '4'], parse)
+    assert len(trades) == 4
+    assert trades[-1] == {'id': '4'}
+    assert trades[1:3] == [{'id': '2'}, {'id': '3'}]
+    assert trades[-1] == {'id': '4'}
+    assert parse.parsed == ['4', '2', '3']
+    with pytest.raises(IndexError):
+        trades[4]
+    assert [trade['id'] for trade in trades] == ['1', '2', '3', '4']
+    assert parse.parsed == ['4', '2', '3', '1']
+
+
+def test_other_operations_resolve():
+    parse = Parser()
+    trades = LazyList(['1', '2'], parse)
+    assert trades == [{'id': '1'}, {'id': '2'}]
+    assert trades.parse is None
+    trades.append({'id': '3'})
+    assert trades[2] == {'id': '3'}
+    assert len(parse.parsed) == 2
+
+    trades = LazyList(['2', '1'], Parser())
+    trades.sort(key=lambda trade: trade['id'])
+    assert [trade['id'] for trade in trades] == ['1', '2']
+    assert {'id': '1'} in LazyList(['1'], Parser())
+
+
+def test_serialization():
+    trades = LazyList(['1', '2'], Parser())
+    # pickles as a plain list of parsed items, json.dumps needs resolve()
+    assert pickle.loads(pickle.dumps(trades)) == [{'id': '1'}, {'id': '2'}]
+    assert json.loads(json.dumps(LazyList(['1'], Parser()).resolve())) == [{'id': '1'}]
+
+
+def test_lazy_trades():
+    exchange = ccxt.Exchange({'id': 'mock', 'lazyParsing': True})
+    exchange.parse_trade = lambda trade, market=None: {'id': trade['i'], 'timestamp': trade['t']}
+    raw = [{'i': str(i), 't': 1000 * i} for i in range(1, 6)]
+    trades = exchange.parse_trades(raw, limit=3)
+    assert isinstance(trades, LazyList)
+    assert [trade['id'] for trade in trades] == ['1', '2', '3']
+    # a since filter parses every trade
+    assert [trade['id'] for trade in exchange.parse_trades(raw, since=3000)] == ['4', '5']
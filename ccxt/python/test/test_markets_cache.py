@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+
+import asyncio
+import json
+import os
+import sys
+
+# ------------------------------------------------------------------------------
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, root)
+
+# ------------------------------------------------------------------------------
+
+import ccxt  # noqa: E402
+import ccxt.async as ccxt_async  # noqa: E402
+
+# ------------------------------------------------------------------------------
+
+markets = [{'id': 'ETHBTC', 'symbol': 'ETH/BTC', 'base': 'ETH', 'quote': 'BTC'}]
+
+
+class Exchange(ccxt.Exchange):
+
+    fetches = 0
+    reads = 0
+
+    def fetch_markets(self):
+        self.fetches += 1
+        return markets
+
+    def read_markets_cache(self):
+        self.reads += 1
+        return super(Exchange, self).read_markets_cache()
+
+
+class AsyncExchange(ccxt_async.Exchange):
+
+    fetches = 0
+
+    async def fetch_markets(self):
+        self.fetches += 1
+        await asyncio.sleep(0.01)
+        return markets
+
+
+def exchange(tmpdir, **config):
+    return Exchange(dict({'id': 'mock', 'marketsCache': str(tmpdir)}, **config))
+
+
+def age_cache(tmpdir, seconds):
+    path = str(tmpdir.join('mock.json'))
+    with open(path) as f:
+        cache = json.load(f)
+    cache['timestamp'] -= seconds * 1000
+    with open(path, 'w') as f:
+        json.dump(cache, f)
+
+
+def test_load_markets_from_cache(tmpdir):
+    first = exchange(tmpdir)
+    first.load_markets()
+    assert (first.fetches, first.reads) == (1, 1)  # no cache yet, read once
+    assert tmpdir.join('mock.json').check()
+    second = exchange(tmpdir)
+    assert list(second.load_markets()) == ['ETH/BTC']
+    assert second.fetches == 0
+    assert second.reads == 1  # read once, also to check its age
+    assert second.markets_by_id['ETHBTC']['symbol'] == 'ETH/BTC'
+    second.load_markets(reload=True)
+    assert second.fetches == 1
+
+
+def test_stale_or_foreign_cache_is_refetched(tmpdir):
+    exchange(tmpdir).load_markets()
+    age_cache(tmpdir, 100)
+    stale = exchange(tmpdir, marketsCacheTTL=60)
+    assert stale.markets_cache_stale()
+    stale.reads = 0
+    stale.load_markets()
+    assert (stale.fetches, stale.reads) == (1, 1)
+    assert not stale.markets_cache_stale()  # rewritten
+    other = Exchange({'id': 'other', 'marketsCache': str(tmpdir)})
+    assert other.read_markets_cache() is None
+    assert exchange(tmpdir, marketsCache=None).markets_cache_stale()
+
+
+def test_failed_write_leaves_no_file(tmpdir):
+    unserializable = exchange(tmpdir)
+    unserializable.write_markets_cache([{'symbol': 'ETH/BTC', 'info': object()}])
+    assert tmpdir.listdir() == []
+    exchange(tmpdir.join('missing', 'file')).write_markets_cache(markets)  # no error
+
+
+def test_async_stale_cache_refreshed_in_background(tmpdir):
+    loop = asyncio.new_event_loop()
+    exchange(tmpdir).load_markets()
+    age_cache(tmpdir, 100)
+    stale = AsyncExchange({'id': 'mock', 'marketsCache': str(tmpdir), 'marketsCacheTTL': 60, 'asyncio_loop': loop})
+
+    async def load():
+        loaded = await stale.load_markets()
+        assert stale.fetches == 0
+        await stale.markets_refresh
+        return loaded
+
+    try:
+        assert list(loop.run_until_complete(load())) == ['ETH/BTC']
+        assert stale.fetches == 1
+        assert not stale.markets_cache_stale()
+        loop.run_until_complete(stale.close())
+    finally:
+        loop.close()
+
+
+def test_async_close_awaits_refresh(tmpdir):
+    loop = asyncio.new_event_loop()
+    exchange(tmpdir).load_markets()
+    age_cache(tmpdir, 100)
+    stale = AsyncExchange({'id': 'mock', 'marketsCache': str(tmpdir), 'marketsCacheTTL': 60, 'asyncio_loop': loop})
+
+    async def close():
+        await stale.load_markets()
+        refresh = stale.markets_refresh
+        await stale.close()
+        return refresh
+
+    try:
+        refresh = loop.run_until_complete(close())
+    finally:
+        loop.close()
+    assert refresh.cancelled()
+    assert stale.markets_refresh is None
@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+
+import os
+import sys
+
+import pytest
+
+# ------------------------------------------------------------------------------
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, root)
+
+# ------------------------------------------------------------------------------
+
+import ccxt  # noqa: E402
+from ccxt.base import order_book  # noqa: E402
+from ccxt.base.order_book import OrderBookSide, LazyOrderBookSide  # noqa: E402
+
+# ------------------------------------------------------------------------------
+
+asks = [['0.0101', '2'], ['0.0102', '3'], ['0.0104', '5']]
+
+
+@pytest.fixture(params=['numpy', 'python'])
+def vectorized(request, monkeypatch):
+    # every query has a numpy and a pure Python implementation
+    if request.param == 'python':
+        monkeypatch.setattr(order_book, 'numpy', None)
+    elif order_book.numpy is None:
+        pytest.skip('numpy not installed')
+    return request.param
+
+
+def test_levels():
+    side = OrderBookSide(asks)
+    assert len(side) == 3
+    assert side[0] == [0.0101, 2.0]
+    assert side[-1] == [0.0104, 5.0]
+    assert side[:2] == [[0.0101, 2.0], [0.0102, 3.0]]
+    assert list(side) == [[0.0101, 2.0], [0.0102, 3.0], [0.0104, 5.0]]
+    assert side == [[0.0101, 2.0], [0.0102, 3.0], [0.0104, 5.0]]
+    assert side.best() == [0.0101, 2.0]
+    assert OrderBookSide().best() is None
+
+
+def test_depth_queries(vectorized):
+    side = OrderBookSide(asks)
+    assert list(side.cumulative_amounts()) == [2.0, 5.0, 10.0]
+    assert side.first_level(3) == 1
+    assert side.first_level(6) == 3
+    assert side.fill_level(2) == 0
+    assert side.fill_level(4) == 1
+    assert side.fill_level(11) is None
+    assert side.depth(4) == 0.0102
+    assert side.depth(11) is None
+    assert side.vwap(4) == pytest.approx((2 * 0.0101 + 2 * 0.0102) / 4)
+    assert side.vwap(10) == pytest.approx((2 * 0.0101 + 3 * 0.0102 + 5 * 0.0104) / 10)
+    assert side.vwap(11) is None
+
+
+def test_aggregate(vectorized):
+    side = OrderBookSide([[2.0, 1.0], [1.0, 1.0], [2.0, 0.5], [3.0, 0.0]])
+    assert side.aggregate() == [[1.0, 1.0], [2.0, 1.5]]
+    assert side.aggregate(descending=True) == [[2.0, 1.5], [1.0, 1.0]]
+
+
+def test_compact_order_books():
+    exchange = ccxt.Exchange({'id': 'mock', 'compactOrderBooks': True})
+    book = exchange.parse_order_book({'bids': [['0.0100', '1']], 'asks': asks})
+    assert isinstance(book['asks'], OrderBookSide)
+    assert book['asks'] == OrderBookSide(asks)
+    assert book['bids'].best() == [0.01, 1.0]
+    plain = ccxt.Exchange({'id': 'mock'}).parse_order_book({'bids': [], 'asks': asks})
+    assert plain['asks'] == book['asks'][:]
+
+
+def test_lazy_side_reads_top_without_converting():
+    side = LazyOrderBookSide(asks)
+    assert len(side) == 3
+    assert side.best() == [0.0101, 2.0]
+    assert side.raw is not None
+    assert LazyOrderBookSide().best() is None
+    assert side == OrderBookSide(asks)  # reading the levels converts them
+    assert side.raw is None
+    assert len(side) == 3
+    assert side.best() == [0.0101, 2.0]
+
+
+def test_lazy_side_queries(vectorized):
+    side = LazyOrderBookSide([{'price': price, 'amount': amount} for price, amount in asks], 'price', 'amount')
+    assert side.depth(4) == 0.0102
+    assert side.vwap(4) == pytest.approx((2 * 0.0101 + 2 * 0.0102) / 4)
+    side = LazyOrderBookSide(asks)
+    side.amounts = side.amounts[:1]  # setting a column converts the other first
+    assert len(side.prices) == 3
+    assert list(side.amounts) == [2.0]
+
+
+def test_lazy_parsing():
+    exchange = ccxt.Exchange({'id': 'mock', 'lazyParsing': True})
+    book = exchange.parse_order_book({'bids': [['0.0100', '1']], 'asks': asks})
+    assert isinstance(book['asks'], LazyOrderBookSide)
+    assert book['asks'] == OrderBookSide(asks)
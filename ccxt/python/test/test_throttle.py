@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+
+import asyncio
+import os
+import sys
+
+import pytest
+
+# ------------------------------------------------------------------------------
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, root)
+
+# ------------------------------------------------------------------------------
+
+import ccxt as ccxt_sync  # noqa: E402
+import ccxt.async as ccxt  # noqa: E402
+from ccxt.async.base.throttle import Throttle  # noqa: E402
+
+# ------------------------------------------------------------------------------
+
+
+@pytest.fixture
+def loop():
+    loop = asyncio.new_event_loop()
+    yield loop
+    loop.close()
+
+
+def throttle(loop, **config):
+    return Throttle(dict(config, loop=loop))
+
+
+def test_burst_then_refill(loop):
+    bucket = throttle(loop, refillRate=0.1, capacity=3)  # a token per 10 ms
+
+    async def requests():
+        started = loop.time()
+        for _ in range(3):
+            await bucket()
+        burst = loop.time() - started
+        await bucket()
+        return burst, loop.time() - started
+
+    burst, total = loop.run_until_complete(requests())
+    assert burst < 0.005
+    assert 0.008 <= total < 0.05
+    metrics = bucket.metrics()
+    assert metrics['requests'] == 4
+    assert metrics['delayed'] == 1
+    assert metrics['queueDepth'] == 0
+
+
+def test_costs_and_debt(loop):
+    bucket = throttle(loop, refillRate=0.1, capacity=2)
+
+    async def requests():
+        started = loop.time()
+        await bucket(5)  # above capacity: a full bucket, the rest is debt
+        first = loop.time() - started
+        await bucket(1)  # waits for the 3 tokens of debt and its own
+        return first, loop.time() - started
+
+    first, total = loop.run_until_complete(requests())
+    assert first < 0.005
+    assert 0.035 <= total < 0.1
+
+
+def test_arrival_order(loop):
+    bucket = throttle(loop, refillRate=1, capacity=1)
+    done = []
+
+    async def request(i, cost):
+        await bucket(cost)
+        done.append(i)
+
+    async def requests():
+        await asyncio.gather(*[request(i, cost) for i, cost in enumerate([1, 1, 0.5, 1])])
+
+    loop.run_until_complete(requests())
+    assert done == [0, 1, 2, 3]
+
+
+def test_cancelled_waiter_takes_no_tokens(loop):
+    bucket = throttle(loop, refillRate=0.1, capacity=1)
+
+    async def requests():
+        await bucket()
+        waiting = bucket()
+        waiting.cancel()
+        started = loop.time()
+        await bucket()
+        return loop.time() - started
+
+    assert loop.run_until_complete(requests()) < 0.015
+    assert bucket.metrics()['delayed'] == 1
+
+
+def test_max_capacity(loop):
+    bucket = throttle(loop, refillRate=0.001, capacity=1, maxCapacity=2)
+    bucket()
+    bucket()
+    bucket()
+    with pytest.raises(RuntimeError):
+        bucket()
+
+
+def test_request_cost(loop):
+    exchange = ccxt.binance({'asyncio_loop': loop})
+    assert exchange.request_cost('depth', 'public', 'GET', {'symbol': 'ETHBTC', 'limit': 100}) == 1
+    assert exchange.request_cost('depth', 'public', 'GET', {'symbol': 'ETHBTC', 'limit': 500}) == 5
+    assert exchange.request_cost('ticker/24hr', 'public', 'GET', {'symbol': 'ETHBTC'}) == 1
+    assert exchange.request_cost('ticker/24hr', 'public', 'GET', {}) == 40
+    assert exchange.request_cost('account', 'private', 'GET', {}) == 5
+    assert exchange.request_cost('ping', 'web', 'GET', {}) is None  # default cost
+    assert exchange.throttle.config['refillRate'] == 0.02
+    bittrex = ccxt.bittrex({'asyncio_loop': loop})
+    assert bittrex.request_cost('getmarkets', 'public', 'GET', {}) is None
+    loop.run_until_complete(exchange.close())
+    loop.run_until_complete(bittrex.close())
+
+
+def test_sync_request_cost():
+    exchange = ccxt_sync.binance()
+    assert exchange.request_cost('depth', 'public', 'GET', {'limit': 1000}) == 10
+    assert exchange.request_cost('openOrders', 'private', 'GET', {}) == 40
+    assert exchange.request_cost('myTrades', 'private', 'GET', {'symbol': 'ETHBTC'}) == 5
+    assert exchange.tokenBucket['capacity'] == 20
+    assert ccxt_sync.Exchange({'id': 'mock', 'weights': {'public': {'depth': {'GET': 2}}}}).request_cost('depth', 'public', 'GET') == 2